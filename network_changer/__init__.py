@@ -1,5 +1,6 @@
 from network_changer.errors import NetworkChangerException
 from network_changer.interface import changer
+from network_changer.pool import ChangerPool
 from network_changer.version import VERSION
 
-__all__ = ["changer", "NetworkChangerException", "VERSION"]
+__all__ = ["changer", "ChangerPool", "NetworkChangerException", "VERSION"]
@@ -1,11 +1,34 @@
+from collections import deque
 import contextlib
 import asyncio
 import logging
+import weakref
+import heapq
+import math
 import time
 import sys
 
 log = logging.getLogger("network_changer.async_helpers")
 
+_PENDING = "PENDING"
+_CANCELLED = "CANCELLED"
+_FINISHED = "FINISHED"
+
+
+def format_name(name):
+    """
+    Names for futures and helpers are either a string or a tuple of a format
+    string and it's arguments, so that nothing is formatted unless the name is
+    actually looked at.
+
+    .. code-block:: python
+
+        format_name(("ATicker({})::tick[{}]", "retry", "ticker")) == "ATicker(retry)::tick[ticker]"
+    """
+    if isinstance(name, tuple):
+        return name[0].format(*(format_name(part) for part in name[1:]))
+    return name
+
 
 def create_future(*, name=None, loop=None):
     future = (loop or asyncio.get_event_loop()).create_future()
@@ -56,7 +79,7 @@ async def wait_for_all_futures(*futs, name=None):
     if not futs:
         return
 
-    waiter = create_future(name=f"||wait_for_all_futures({name})[waiter]")
+    waiter = create_future(name=("||wait_for_all_futures({})[waiter]", name))
 
     unique = {id(fut): fut for fut in futs}.values()
     complete = {}
@@ -83,7 +106,7 @@ async def wait_for_first_future(*futs, name=None):
     if not futs:
         return
 
-    waiter = create_future(name=f"||wait_for_first_future({name})[waiter]")
+    waiter = create_future(name=("||wait_for_first_future({})[waiter]", name))
     unique = {id(fut): fut for fut in futs}.values()
 
     def done(res):
@@ -121,7 +144,7 @@ def fut_to_string(f, with_name=True):
     else:
         s = ""
         if with_name:
-            s = f"<Future#{getattr(f, 'name', None)}"
+            s = f"<Future#{format_name(getattr(f, 'name', None))}"
         if not f.done():
             s = f"{s}(pending)"
         elif f.cancelled():
@@ -282,7 +305,7 @@ class ChildOfFuture:
 
     def __init__(self, original_fut, *, name=None):
         self.name = name
-        self.fut = create_future(name=f"ChildOfFuture({self.name})::__init__[fut]")
+        self.fut = create_future(name=("ChildOfFuture({})::__init__[fut]", self.name))
         self.original_fut = original_fut
 
         self.fut.add_done_callback(self.remove_parent_done)
@@ -381,7 +404,7 @@ class ChildOfFuture:
         self.fut.remove_done_callback(func)
 
     def __repr__(self):
-        return f"<ChildOfFuture#{self.name}({fut_to_string(self.fut, with_name=False)}){fut_to_string(self.original_fut)}>"
+        return f"<ChildOfFuture#{format_name(self.name)}({fut_to_string(self.fut, with_name=False)}){fut_to_string(self.original_fut)}>"
 
     def __await__(self):
         return (yield from self.fut)
@@ -389,6 +412,270 @@ class ChildOfFuture:
     __iter__ = __await__
 
 
+_root_scopes: "weakref.WeakKeyDictionary[asyncio.Future, CancelScope]" = weakref.WeakKeyDictionary()
+
+
+def _scope_for(fut):
+    """
+    Return a :class:`CancelScope` that follows a future that isn't a scope.
+
+    There is only one of these per future so that any number of scopes made
+    from it share a single done callback on that future.
+    """
+    if isinstance(fut, ResettableFuture):
+        # A reset replaces the future underneath, and scopes made after that
+        # follow the new one rather than the one that already finished
+        fut = fut.fut
+
+    scope = _root_scopes.get(fut)
+    if scope is None:
+        scope = _root_scopes[fut] = CancelScope(
+            name=("CancelScope({})::root", getattr(fut, "name", None))
+        )
+        if fut.done():
+            scope._follow(fut)
+        else:
+            fut.add_done_callback(scope._follow)
+    return scope
+
+
+class CancelScope:
+    """
+    A lighter replacement for :class:`ChildOfFuture`.
+
+    The scope is resolved when it is cancelled, given a result or exception,
+    when it's deadline passes, or when it's parent is resolved. As with
+    ``ChildOfFuture`` a parent that is cancelled or gets a result will cancel
+    the scope and a parent that gets an exception gives that exception to the
+    scope.
+
+    .. code-block:: python
+
+        from network_changer import async_helpers as hp
+
+
+        with hp.CancelScope(final_future, name="connect", timeout=30) as scope:
+            await hp.wait_for_first_future(scope, something)
+
+    The differences from ``ChildOfFuture`` are:
+
+    * Scopes keep their children in a set. Attaching and detaching is O(1)
+      and resolving a scope resolves all it's descendants straight away rather
+      than one iteration of the event loop per level.
+    * Many scopes made from the same plain future share one done callback on
+      that future.
+    * No asyncio future is created unless the scope is awaited.
+    * ``name`` may be a tuple as understood by :func:`format_name`.
+    * ``timeout`` or ``deadline`` (in terms of ``loop.time()``) will cancel
+      the scope when they pass.
+
+    The ``parent`` may be a ``CancelScope``, any future like object or ``None``.
+    """
+
+    _asyncio_future_blocking = False
+
+    def __init__(self, parent=None, *, name=None, timeout=None, deadline=None):
+        self._name = name
+
+        self._state = _PENDING
+        self._result = None
+        self._exception = None
+
+        self._fut = None
+        self._loop = None
+        self._handle = None
+        self._callbacks = []
+
+        self.parent = None
+        self.children = set()
+        self.deadline = None
+
+        if parent is not None:
+            if not isinstance(parent, CancelScope):
+                parent = _scope_for(parent)
+
+            if parent.done():
+                self._parent_done(parent)
+            else:
+                self.parent = parent
+                parent.children.add(self)
+
+        if timeout is not None:
+            deadline = self.loop.time() + timeout
+        if deadline is not None:
+            self.set_deadline(deadline)
+
+    @property
+    def name(self):
+        return format_name(self._name)
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        return self._loop
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_typ, exc, tb):
+        self.cancel()
+
+    def set_deadline(self, deadline):
+        """Cancel this scope at ``deadline``, in terms of ``loop.time()``"""
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+        self.deadline = deadline
+        if self._state is _PENDING:
+            self._handle = self.loop.call_at(deadline, self.cancel)
+
+    @property
+    def remaining(self):
+        """
+        Seconds till the closest deadline of this scope or any parent, or
+        ``None`` if there are no deadlines.
+        """
+        deadlines = []
+        scope = self
+        while scope is not None:
+            if scope.deadline is not None:
+                deadlines.append(scope.deadline)
+            scope = scope.parent
+
+        if not deadlines:
+            return None
+        return max([0, min(deadlines) - self.loop.time()])
+
+    def _follow(self, res):
+        if res.cancelled():
+            self.cancel()
+            return
+
+        exc = res.exception()
+        if exc:
+            self.set_exception(exc)
+        else:
+            self.set_result(res.result())
+
+    def _parent_done(self, parent):
+        if parent._state is _CANCELLED or parent._exception is None:
+            self.cancel()
+        else:
+            self.set_exception(parent._exception)
+
+    def _resolve(self, state, result=None, exception=None):
+        if self._state is not _PENDING:
+            return False
+
+        self._state = state
+        self._result = result
+        self._exception = exception
+
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+        if self.parent is not None:
+            self.parent.children.discard(self)
+            self.parent = None
+
+        children, self.children = self.children, set()
+        for child in children:
+            child.parent = None
+            child._parent_done(self)
+
+        if self._fut is not None and not self._fut.done():
+            self._copy_to(self._fut)
+
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self.loop.call_soon(callback, self)
+
+        return True
+
+    def _copy_to(self, fut):
+        if self._state is _CANCELLED:
+            fut.cancel()
+        elif self._exception is not None:
+            fut.set_exception(self._exception)
+        else:
+            fut.set_result(self._result)
+
+    def set_result(self, data):
+        if self._state is not _PENDING:
+            raise asyncio.InvalidStateError(f"{self!r} is already done")
+        self._resolve(_FINISHED, result=data)
+
+    def set_exception(self, exc):
+        if self._state is not _PENDING:
+            raise asyncio.InvalidStateError(f"{self!r} is already done")
+        self._resolve(_FINISHED, exception=exc)
+
+    def cancel(self, msg=None):
+        return self._resolve(_CANCELLED)
+
+    def cancel_parent(self):
+        if self.parent is not None:
+            self.parent.cancel_parent()
+        else:
+            self.cancel()
+
+    def done(self):
+        return self._state is not _PENDING
+
+    def cancelled(self):
+        return self._state is _CANCELLED
+
+    def result(self):
+        if self._state is _PENDING:
+            raise asyncio.InvalidStateError("Result is not ready.")
+        if self._state is _CANCELLED:
+            raise asyncio.CancelledError()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        if self._state is _PENDING:
+            raise asyncio.InvalidStateError("Exception is not set.")
+        if self._state is _CANCELLED:
+            raise asyncio.CancelledError()
+        return self._exception
+
+    def add_done_callback(self, func, *, context=None):
+        if self._state is _PENDING:
+            self._callbacks.append(func)
+        else:
+            self.loop.call_soon(func, self)
+
+    def remove_done_callback(self, func):
+        before = len(self._callbacks)
+        self._callbacks = [cb for cb in self._callbacks if cb != func]
+        return before - len(self._callbacks)
+
+    def __repr__(self):
+        if self._state is _PENDING:
+            state = "pending"
+        elif self._state is _CANCELLED:
+            state = "cancelled"
+        elif self._exception is not None:
+            state = f"exception:{type(self._exception).__name__}:{self._exception}"
+        else:
+            state = "result"
+        return f"<CancelScope#{self.name}({state})>"
+
+    def __await__(self):
+        if self._fut is None:
+            self._fut = create_future(loop=self.loop)
+            if self._state is not _PENDING:
+                self._copy_to(self._fut)
+        return (yield from self._fut)
+
+    __iter__ = __await__
+
+
 class ResettableFuture:
     """
     A future object with a ``reset()`` function that resets it
@@ -415,7 +702,7 @@ class ResettableFuture:
 
     def __init__(self, name=None):
         self.name = name
-        self.fut = create_future(name=f"ResettableFuture({self.name})::__init__[fut]")
+        self.fut = create_future(name=("ResettableFuture({})::__init__[fut]", self.name))
 
     def reset(self, force=False):
         if force:
@@ -424,7 +711,7 @@ class ResettableFuture:
         if not self.fut.done():
             return
 
-        self.fut = create_future(name=f"ResettableFuture({self.name})::reset[fut]")
+        self.fut = create_future(name=("ResettableFuture({})::reset[fut]", self.name))
 
     @property
     def _callbacks(self):
@@ -458,7 +745,7 @@ class ResettableFuture:
         self.fut.remove_done_callback(func)
 
     def __repr__(self):
-        return f"<ResettableFuture#{self.name}({fut_to_string(self.fut, with_name=False)})>"
+        return f"<ResettableFuture#{format_name(self.name)}({fut_to_string(self.fut, with_name=False)})>"
 
     def __await__(self):
         return (yield from self.fut)
@@ -522,49 +809,100 @@ class TaskHolder(AsyncCMMixin):
     If you already have a task object, you can give it to the holder with
     ``ts.add_task(my_task)``.
 
+    If the holder is made with ``limit=<number>`` then ``await ts.add_bounded(coro)``
+    will wait until fewer than that many tasks are pending before adding the
+    coroutine. ``ts.add`` and ``ts.add_task`` ignore the limit.
+
+    Finished tasks are removed from the holder as they complete.
+
     .. automethod:: add
 
+    .. automethod:: add_bounded
+
     .. automethod:: add_task
 
     .. automethod:: finish
     """
 
-    def __init__(self, final_future, *, name=None):
+    def __init__(self, final_future, *, name=None, limit=None):
         self.name = name
+        self.limit = limit
 
-        self.ts = []
-        self.final_future = ChildOfFuture(
-            final_future, name=f"TaskHolder({self.name})::__init__[final_future]"
+        self.ts = set()
+        self.final_future = CancelScope(
+            final_future, name=("TaskHolder({})::__init__[final_future]", self.name)
         )
 
-        self._cleaner = None
-        self._cleaner_waiter = ResettableFuture(
-            name=f"TaskHolder({self.name})::__init__[cleaner_waiter]"
-        )
+        self._pending = 0
+        self._slot_waiters = deque()
+        self._emptied = ResettableFuture(name=("TaskHolder({})::__init__[emptied]", self.name))
+        self._emptied.set_result(True)
 
     def add(self, coro, *, silent=False):
         return self.add_task(async_as_background(coro, silent=silent))
 
-    def _set_cleaner_waiter(self, res):
-        self._cleaner_waiter.reset()
-        self._cleaner_waiter.set_result(True)
+    async def add_bounded(self, coro, *, silent=False):
+        """
+        Like ``add`` but if the holder was made with a ``limit`` then wait for
+        fewer than ``limit`` tasks to be pending before starting this one.
 
-    def add_task(self, task):
-        if not self._cleaner:
-            self._cleaner = async_as_background(self.cleaner())
+        If the ``final_future`` is resolved, or we are cancelled, while waiting
+        then the coroutine is closed without being run and
+        ``asyncio.CancelledError`` is raised.
+        """
+        while self.limit is not None and self._pending >= self.limit:
+            if self.final_future.done():
+                coro.close()
+                raise asyncio.CancelledError()
 
-            t = self._cleaner
+            waiter = create_future(name=("TaskHolder({})::add_bounded[waiter]", self.name))
+            self._slot_waiters.append(waiter)
+            try:
+                await wait_for_first_future(
+                    self.final_future,
+                    waiter,
+                    name=("TaskHolder({})::add_bounded[wait_for_slot]", self.name),
+                )
+            except asyncio.CancelledError:
+                coro.close()
+                if waiter.done() and not waiter.cancelled():
+                    # We were woken for a free slot we won't use, so pass it on
+                    self._wake_slot_waiter()
+                raise
+            finally:
+                waiter.cancel()
 
-            def remove_cleaner(res):
-                if self._cleaner is t:
-                    self._cleaner = None
+        return self.add(coro, silent=silent)
 
-            t.add_done_callback(remove_cleaner)
+    def add_task(self, task):
+        if task in self.ts:
+            return task
 
-        task.add_done_callback(self._set_cleaner_waiter)
-        self.ts.append(task)
+        self.ts.add(task)
+        self._pending += 1
+        self._emptied.reset()
+        task.add_done_callback(lambda res: self._task_done(task))
         return task
 
+    def _task_done(self, task):
+        if task not in self.ts:
+            return
+
+        self.ts.discard(task)
+        self._pending -= 1
+
+        if not self.ts and not self._emptied.done():
+            self._emptied.set_result(True)
+
+        self._wake_slot_waiter()
+
+    def _wake_slot_waiter(self):
+        while self._slot_waiters:
+            waiter = self._slot_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                break
+
     async def start(self):
         return self
 
@@ -573,73 +911,155 @@ class TaskHolder(AsyncCMMixin):
             self.final_future.set_exception(exc)
 
         try:
-            while any(not t.done() for t in self.ts):
-                for t in self.ts:
-                    if self.final_future.done():
+            while self.ts:
+                if self.final_future.done():
+                    ts = list(self.ts)
+                    for t in ts:
                         t.cancel()
 
-                if self.ts:
-                    if self.final_future.done():
-                        await wait_for_all_futures(
-                            self.final_future,
-                            *self.ts,
-                            name=f"TaskHolder({self.name})::finish[wait_for_all_tasks]",
-                        )
-                    else:
-                        await wait_for_first_future(
-                            self.final_future,
-                            *self.ts,
-                            name=f"TaskHolder({self.name})::finish[wait_for_another_task]",
-                        )
+                    await wait_for_all_futures(
+                        *ts, name=("TaskHolder({})::finish[wait_for_all_tasks]", self.name)
+                    )
+                else:
+                    await wait_for_first_future(
+                        self.final_future,
+                        self._emptied,
+                        name=("TaskHolder({})::finish[wait_for_tasks]", self.name),
+                    )
 
-                    self.ts = [t for t in self.ts if not t.done()]
+                await self.clean()
         finally:
-            try:
-                await self._final()
-            finally:
-                self.final_future.cancel()
-
-    async def _final(self):
-        if self._cleaner:
-            self._cleaner.cancel()
-            await wait_for_all_futures(
-                self._cleaner, name=f"TaskHolder({self.name})::finish[finally_wait_for_cleaner]"
-            )
-
-        await wait_for_all_futures(
-            async_as_background(self.clean()),
-            name=f"TaskHolder({self.name})::finish[finally_wait_for_clean]",
-        )
+            self.final_future.cancel()
 
     @property
     def pending(self):
-        return sum(1 for t in self.ts if not t.done())
+        return self._pending
 
     def __contains__(self, task):
         return task in self.ts
 
     def __iter__(self):
-        return iter(self.ts)
-
-    async def cleaner(self):
-        while True:
-            await self._cleaner_waiter
-            self._cleaner_waiter.reset()
-            await self.clean()
+        return iter(list(self.ts))
 
     async def clean(self):
-        destroyed = []
-        remaining = []
-        for t in self.ts:
-            if t.done():
-                destroyed.append(t)
-            else:
-                remaining.append(t)
+        destroyed = [t for t in self.ts if t.done()]
+        for t in destroyed:
+            self._task_done(t)
 
         await wait_for_all_futures(
-            *destroyed, name=f"TaskHolder({self.name})::clean[wait_for_destroyed]"
+            *destroyed, name=("TaskHolder({})::clean[wait_for_destroyed]", self.name)
         )
-        self.ts = remaining
+
+
+class TimerWheel:
+    """
+    A shared timer that batches callbacks due in the same ``resolution`` sized
+    slot into a single wakeup of the event loop.
+
+    .. code-block:: python
+
+        from network_changer import async_helpers as hp
+
+
+        wheel = hp.TimerWheel(resolution=0.05)
+        entry = wheel.call_later(2, callback)
+
+        # Like an asyncio.TimerHandle
+        entry.cancel()
+
+    Callbacks are never called before they are due, but may be called up to
+    ``resolution`` seconds after. Only one ``loop.call_at`` handle exists at any
+    time, for the earliest slot that has callbacks in it.
+
+    Use :func:`timer_wheel` to get the wheel shared by everything on a loop.
+    """
+
+    class Entry:
+        __slots__ = ("callback",)
+
+        def __init__(self, callback):
+            self.callback = callback
+
+        def cancel(self):
+            self.callback = None
+
+        def cancelled(self):
+            return self.callback is None
+
+    def __init__(self, resolution=0.05, *, loop=None):
+        # A weak reference so that the wheel in _wheels doesn't keep it's loop alive
+        self._loop = weakref.ref(loop or asyncio.get_event_loop())
+        self.resolution = resolution
+
+        self.slots = {}
+        self.order = []
+        self.handle = None
+        self.handle_slot = None
+
+    @property
+    def loop(self):
+        loop = self._loop()
+        if loop is None:
+            raise RuntimeError("The loop for this TimerWheel no longer exists")
+        return loop
+
+    def call_later(self, delay, callback):
+        return self.call_at(self.loop.time() + delay, callback)
+
+    def call_at(self, when, callback):
+        slot = math.ceil(when / self.resolution)
+        entry = self.Entry(callback)
+
+        bucket = self.slots.get(slot)
+        if bucket is None:
+            bucket = self.slots[slot] = []
+            heapq.heappush(self.order, slot)
+        bucket.append(entry)
+
+        if self.handle_slot is None or slot < self.handle_slot:
+            self._arm(slot)
+
+        return entry
+
+    def _arm(self, slot):
+        if self.handle:
+            self.handle.cancel()
+        self.handle_slot = slot
+        self.handle = self.loop.call_at(slot * self.resolution, self._fire)
+
+    def _fire(self):
+        limit = max(self.handle_slot, math.floor(self.loop.time() / self.resolution))
+        self.handle = None
+        self.handle_slot = None
+
+        while self.order and self.order[0] <= limit:
+            for entry in self.slots.pop(heapq.heappop(self.order)):
+                callback = entry.callback
+                if callback is not None:
+                    entry.callback = None
+                    try:
+                        callback()
+                    except Exception as error:
+                        log.exception(error)
+
+        if self.order:
+            self._arm(self.order[0])
+
+
+_wheels: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TimerWheel]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def timer_wheel(loop=None):
+    """
+    Return the :class:`TimerWheel` shared by everything on this loop
+    """
+    loop = loop or asyncio.get_event_loop()
+    wheel = _wheels.get(loop)
+    if wheel is None:
+        wheel = _wheels[loop] = TimerWheel(loop=loop)
+    return wheel
 
 
 class ATicker(AsyncCMMixin):
@@ -719,6 +1139,11 @@ class ATicker(AsyncCMMixin):
 
     pauser
         If not None, we use this as a semaphore in an async with to pause the ticks
+
+    wheel
+        If not None, schedule ticks on this :class:`TimerWheel` instead of
+        creating a ``loop.call_later`` handle for every tick. Use ``True`` for the
+        wheel shared by the current loop.
     """
 
     class Stop(Exception):
@@ -733,6 +1158,7 @@ class ATicker(AsyncCMMixin):
         max_time=None,
         min_wait=0.1,
         pauser=None,
+        wheel=None,
         name=None,
     ):
         self.name = name
@@ -750,11 +1176,13 @@ class ATicker(AsyncCMMixin):
         self.handle = None
         self.expected = None
 
-        self.waiter = ResettableFuture(name=f"ATicker({self.name})::__init__[waiter]")
-        self.final_future = ChildOfFuture(
-            final_future
-            or create_future(name=f"ATicker({self.name})::__init__[owned_final_future]"),
-            name=f"ATicker({self.name})::__init__[final_future]",
+        if wheel is True:
+            wheel = timer_wheel()
+        self.wheel = wheel
+
+        self.waiter = ResettableFuture(name=("ATicker({})::__init__[waiter]", self.name))
+        self.final_future = CancelScope(
+            final_future, name=("ATicker({})::__init__[final_future]", self.name)
         )
 
     async def start(self):
@@ -772,7 +1200,9 @@ class ATicker(AsyncCMMixin):
         if hasattr(self, "gen"):
             try:
                 await stop_async_generator(
-                    self.gen, exc=exc or self.Stop(), name=f"ATicker({self.name})::stop[stop_gen]"
+                    self.gen,
+                    exc=exc or self.Stop(),
+                    name=("ATicker({})::stop[stop_gen]", self.name),
                 )
             except self.Stop:
                 pass
@@ -782,9 +1212,7 @@ class ATicker(AsyncCMMixin):
     async def tick(self):
         final_handle = None
         if self.max_time:
-            final_handle = asyncio.get_event_loop().call_later(
-                self.max_time, self.final_future.cancel
-            )
+            final_handle = self._call_later(self.max_time, self.final_future.cancel)
 
         try:
             async for info in self._tick():
@@ -816,7 +1244,12 @@ class ATicker(AsyncCMMixin):
             self.waiter.reset()
             self.waiter.set_result(True)
         else:
-            self._change_handle(asyncio.get_event_loop().call_later(diff, self._waited))
+            self._change_handle(self._call_later(diff, self._waited))
+
+    def _call_later(self, delay, callback):
+        if self.wheel is None:
+            return asyncio.get_event_loop().call_later(delay, callback)
+        return self.wheel.call_later(delay, callback)
 
     def _change_handle(self, handle=None):
         if self.handle:
@@ -832,15 +1265,15 @@ class ATicker(AsyncCMMixin):
             return await wait_for_first_future(
                 self.final_future,
                 self.waiter,
-                name=f"ATicker({self.name})::_wait_for_next[without_pause]",
+                name=("ATicker({})::_wait_for_next[without_pause]", self.name),
             )
 
         async def pause():
             async with self.pauser:
                 pass
 
-        ts_final_future = ChildOfFuture(
-            self.final_future, name=f"ATicker({self.name})::_wait_for_next[with_pause]"
+        ts_final_future = CancelScope(
+            self.final_future, name=("ATicker({})::_wait_for_next[with_pause]", self.name)
         )
 
         async with TaskHolder(ts_final_future) as ts:
@@ -890,7 +1323,7 @@ class ATicker(AsyncCMMixin):
             if diff == 0:
                 diff = self.expected - now
 
-            self._change_handle(asyncio.get_event_loop().call_later(diff, self._waited))
+            self._change_handle(self._call_later(diff, self._waited))
 
             if self.min_wait is not False or diff > 0:
                 iteration += 1
@@ -913,7 +1346,7 @@ class RetryTicker:
             final_future=final_future,
             max_time=timeout,
             min_wait=min_wait,
-            name=f"RetryTicker({self.name})::tick[ticker]",
+            name=("RetryTicker({})::tick[ticker]", self.name),
         )
 
         start = time.time()
@@ -0,0 +1,118 @@
+from network_changer.files import read_ours, write_ours
+
+from pathlib import Path
+import platform
+import logging
+import shutil
+import json
+import os
+
+log = logging.getLogger("network_changer.capabilities")
+
+
+def boot_id():
+    """Return an identifier that changes every time the machine boots, or None"""
+    try:
+        return Path("/proc/sys/kernel/random/boot_id").read_text().strip()
+    except OSError:
+        return None
+
+
+class Capabilities:
+    """
+    Remembers what this machine and it's interfaces can do so that we only
+    probe for it once.
+
+    Everything is memoised in process. If ``path`` is given (by default it
+    comes from the ``NETWORK_CHANGER_CAPABILITIES`` environment variable) then
+    results are also stored in that file and reused by other processes until
+    the machine reboots. A file that isn't ours (see
+    :func:`network_changer.files.read_ours`) is ignored.
+
+    .. code-block:: python
+
+        from network_changer.capabilities import capabilities
+
+
+        capabilities.backend()
+        capabilities.remember("wlan0", "we_version", 22)
+        capabilities.lookup("wlan0", "we_version") == 22
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.loaded = False
+        self.data = {"boot_id": None, "system": {}, "interfaces": {}}
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+
+        current = boot_id()
+        self.data["boot_id"] = current
+
+        if not self.path or current is None:
+            return
+
+        try:
+            data = json.loads(read_ours(self.path))
+        except (OSError, ValueError) as error:
+            log.debug(f"Not using capabilities from {self.path}: {error}")
+            return
+
+        if isinstance(data, dict) and data.get("boot_id") == current:
+            self.data["system"].update(data.get("system") or {})
+            self.data["interfaces"].update(data.get("interfaces") or {})
+
+    def save(self):
+        if not self.path or self.data["boot_id"] is None:
+            return
+
+        try:
+            write_ours(self.path, json.dumps(self.data).encode())
+        except OSError as error:
+            log.debug(f"Failed to save capabilities to {self.path}: {error}")
+
+    def system(self, key, probe):
+        """Return the value for ``key``, using ``probe()`` the first time"""
+        self.load()
+        system = self.data["system"]
+        if key not in system:
+            system[key] = probe()
+            self.save()
+        return system[key]
+
+    def lookup(self, interface, key, default=None):
+        self.load()
+        return self.data["interfaces"].get(interface, {}).get(key, default)
+
+    def remember(self, interface, key, value):
+        self.load()
+        self.data["interfaces"].setdefault(interface, {})[key] = value
+        self.save()
+
+    def forget(self, interface=None):
+        """Forget what we know about an interface, or everything if no interface"""
+        self.load()
+        if interface is None:
+            self.data["system"].clear()
+            self.data["interfaces"].clear()
+        else:
+            self.data["interfaces"].pop(interface, None)
+        self.save()
+
+    def backend(self, name=None):
+        """Return the name of the platform in network_changer.platforms to use"""
+        system = self.system("platform", platform.system)
+        if system == "Darwin":
+            return "Airport"
+        elif system == "Windows":
+            return "Windows"
+        elif name != "<iw>" and self.system("nmcli", lambda: bool(shutil.which("nmcli"))):
+            return "DBus"
+        else:
+            return "IW"
+
+
+capabilities = Capabilities(os.environ.get("NETWORK_CHANGER_CAPABILITIES"))
@@ -0,0 +1,284 @@
+from network_changer.interface import changer, platform_kls
+from network_changer.errors import NetworkChangerException
+from network_changer.info import NetworkInfo, ScanInfo
+from network_changer import async_helpers as hp
+from network_changer.pool import ChangerPool
+
+import tempfile
+import asyncio
+import logging
+import socket
+import struct
+import stat
+import json
+import sys
+import os
+
+log = logging.getLogger("network_changer.daemon")
+
+LENGTH = struct.Struct(">I")
+MAX_MESSAGE = 16 * 1024 * 1024
+
+
+class DaemonUnavailable(NetworkChangerException):
+    pass
+
+
+class DaemonError(NetworkChangerException):
+    def __init__(self, kind, message):
+        super().__init__()
+        self.kind = kind
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def default_socket_path():
+    if "NETWORK_CHANGER_SOCKET" in os.environ:
+        return os.environ["NETWORK_CHANGER_SOCKET"]
+    if os.path.isdir("/run") and os.access("/run", os.W_OK):
+        return "/run/network_changer.sock"
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    return os.path.join(tempfile.gettempdir(), f"network_changer-{user}.sock")
+
+
+async def read_message(reader):
+    """Read one length prefixed JSON message, or return None at EOF"""
+    try:
+        header = await reader.readexactly(LENGTH.size)
+    except asyncio.IncompleteReadError:
+        return None
+
+    (length,) = LENGTH.unpack(header)
+    if length > MAX_MESSAGE:
+        raise DaemonError("TooLarge", f"Message of {length} bytes is too large")
+
+    return json.loads((await reader.readexactly(length)).decode())
+
+
+async def write_message(writer, message):
+    data = json.dumps(message).encode()
+    writer.write(LENGTH.pack(len(data)) + data)
+    await writer.drain()
+
+
+def error_to_json(error):
+    return {"error": {"kind": type(error).__name__, "message": str(error)}}
+
+
+def network_to_json(network):
+    return {
+        "bssid": network.bssid,
+        "ssid": network.ssid,
+        "last_seen": network.last_seen,
+        "freq": network.freq,
+        "interfaces": sorted(network.interfaces),
+    }
+
+
+class Client:
+    """
+    Talks to a running ``network_changer serve``
+
+    .. code-block:: python
+
+        client = Client()
+        if client.available():
+            info = await client.info(interface="wlan0")
+
+    ``DaemonUnavailable`` is raised if we can't connect to the daemon, in
+    which case the caller can do the work itself. Once a request is sent the
+    daemon may be doing it, so no answer within ``timeout`` seconds raises
+    ``DaemonError`` instead.
+    """
+
+    def __init__(self, path=None, *, timeout=180):
+        self.timeout = timeout
+        self.path = path or default_socket_path()
+
+    def available(self):
+        return hasattr(socket, "AF_UNIX") and os.path.exists(self.path)
+
+    async def request(self, command, **args):
+        reader, writer = await self.open_connection()
+        try:
+            await write_message(writer, {"command": command, "args": args})
+            response = await asyncio.wait_for(read_message(reader), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise DaemonError(
+                "NoAnswer", f"The daemon at {self.path} didn't answer within {self.timeout} seconds"
+            )
+        except (ConnectionError, asyncio.IncompleteReadError) as error:
+            raise DaemonError("NoAnswer", f"Lost the daemon at {self.path}: {error}")
+        finally:
+            writer.close()
+
+        if response is None:
+            raise DaemonError("NoAnswer", f"The daemon at {self.path} closed the connection")
+
+        if "error" in response:
+            raise DaemonError(response["error"]["kind"], response["error"]["message"])
+
+        return response.get("result")
+
+    async def open_connection(self):
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_unix_connection(self.path), timeout=self.timeout
+            )
+        except (OSError, NotImplementedError, asyncio.TimeoutError) as error:
+            raise DaemonUnavailable(f"Couldn't connect to {self.path}: {error!r}")
+
+    async def info(self, interface=None, fields=None):
+        if fields is not None:
+            fields = sorted(fields)
+        return NetworkInfo.create(await self.request("info", interface=interface, fields=fields))
+
+    async def scan(self, interface=None, request_scan=True):
+        return ScanInfo.create(
+            await self.request("scan", interface=interface, request_scan=request_scan)
+        )
+
+    async def scan_all(self, request_scan=True):
+        result = await self.request("scan_all", request_scan=request_scan)
+        return ScanInfo.create(result["found"]), result["errors"]
+
+    async def connect(self, ssid, interface=None, bssid=None, freq=None):
+        await self.request("connect", interface=interface, ssid=ssid, bssid=bssid, freq=freq)
+
+    async def disconnect(self, interface=None):
+        await self.request("disconnect", interface=interface)
+
+
+class Server:
+    """
+    Answers requests from :class:`Client` over a unix socket, keeping a
+    Changer per interface alive between requests so that bus connections and
+    caches stay warm.
+
+    If ``background_scan`` is a number of seconds then each of those Changers
+    also scans that often while it's idle.
+
+    ``serve`` refuses to start if another daemon is already answering on
+    ``path``.
+    """
+
+    def __init__(self, final_future, path=None, *, kls=None, background_scan=None):
+        self.kls = kls
+        self.path = path or default_socket_path()
+        self.final_future = final_future
+        self.background_scan = background_scan
+
+        self.pool = None
+        self.changers = {}
+
+    def changer(self, interface):
+        if interface not in self.changers:
+            ch = self.changers[interface] = changer(self.final_future, interface, kls=self.kls)
+            if self.background_scan:
+                ch.background_scan(every=self.background_scan)
+        return self.changers[interface]
+
+    async def pool_of_changers(self):
+        """Return a ChangerPool of the Changers for every interface we can find"""
+        if self.pool is None:
+            kls = self.kls or platform_kls()
+            pool = ChangerPool(self.final_future, kls=kls)
+            for name in await kls.discover(self.final_future):
+                pool.changers[name] = self.changer(name)
+            self.pool = pool
+        return self.pool
+
+    async def remove_stale_socket(self):
+        try:
+            mode = os.lstat(self.path).st_mode
+        except FileNotFoundError:
+            return
+
+        if not stat.S_ISSOCK(mode):
+            raise DaemonError("NotASocket", f"{self.path} exists and isn't a socket")
+
+        try:
+            _, writer = await asyncio.open_unix_connection(self.path)
+        except OSError:
+            os.remove(self.path)
+        else:
+            writer.close()
+            raise DaemonError("AlreadyRunning", f"A daemon is already listening on {self.path}")
+
+    async def serve(self):
+        await self.remove_stale_socket()
+
+        # Only we may connect, from the moment the socket exists
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=self.path)
+        finally:
+            os.umask(umask)
+
+        log.info(f"Listening on {self.path}")
+
+        try:
+            await hp.wait_for_first_future(self.final_future, name="Server::serve[wait]")
+        finally:
+            server.close()
+            await server.wait_closed()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_message(reader)
+                except (DaemonError, ValueError) as error:
+                    # We don't know where the next message starts, so give up on this client
+                    await write_message(writer, error_to_json(error))
+                    break
+
+                if request is None:
+                    break
+
+                try:
+                    result = await self.execute(request.get("command"), request.get("args") or {})
+                    response = {"result": result}
+                except (KeyboardInterrupt, asyncio.CancelledError):
+                    raise
+                except:
+                    response = error_to_json(sys.exc_info()[1])
+
+                await write_message(writer, response)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def execute(self, command, args):
+        interface = args.get("interface")
+
+        if command == "info":
+            return network_to_json(await self.changer(interface).info(fields=args.get("fields")))
+
+        elif command == "scan":
+            found = await self.changer(interface).scan(request_scan=args.get("request_scan", True))
+            return [network_to_json(network) for network in found]
+
+        elif command == "scan_all":
+            pool = await self.pool_of_changers()
+            found, errors = await pool.scan_all(request_scan=args.get("request_scan", True))
+            return {
+                "found": [network_to_json(network) for network in found],
+                "errors": {name: str(error) for name, error in errors.items()},
+            }
+
+        elif command == "connect":
+            await self.changer(interface).connect(
+                args["ssid"], bssid=args.get("bssid"), freq=args.get("freq")
+            )
+
+        elif command == "disconnect":
+            await self.changer(interface).disconnect()
+
+        else:
+            raise DaemonError("UnknownCommand", f"Unknown command: {command}")
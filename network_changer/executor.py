@@ -1,5 +1,7 @@
+from network_changer.daemon import Client, DaemonUnavailable, Server
 from network_changer.errors import NetworkChangerException
 from network_changer.interface import changer
+from network_changer.pool import ChangerPool
 
 import traceback
 import argparse
@@ -11,6 +13,10 @@ import sys
 commands = {}
 
 
+class NoDaemon:
+    pass
+
+
 class register:
     def __init__(self, name):
         self.name = name
@@ -24,6 +30,8 @@ class Task:
     def run(self, argv=None):
         parser = argparse.ArgumentParser()
         parser.add_argument("--debug", action="store_true")
+        parser.add_argument("--socket", default=None, type=str)
+        parser.add_argument("--no-daemon", action="store_true")
         parser = self.change_parser(parser) or parser
         args = parser.parse_args(argv)
         self.setup_logging(args)
@@ -48,6 +56,23 @@ class Task:
     async def execute_task(self, args):
         raise NotImplementedError()
 
+    async def from_daemon(self, args, request):
+        """
+        Return ``await request(client)`` using a running ``network_changer serve``
+        or ``NoDaemon`` if there isn't one
+        """
+        if args.no_daemon:
+            return NoDaemon
+
+        client = Client(args.socket)
+        if not client.available():
+            return NoDaemon
+
+        try:
+            return await request(client)
+        except DaemonUnavailable:
+            return NoDaemon
+
     def change_parser(self, parser):
         parser.add_argument("--interface", default=None, type=str)
         return parser
@@ -61,17 +86,32 @@ class Task:
 @register("info")
 class Info(Task):
     async def execute_task(self, args):
-        ch = changer(self.final_future, args.interface)
-        for line in (await ch.info()).present():
+        info = await self.from_daemon(args, lambda client: client.info(args.interface))
+        if info is NoDaemon:
+            info = await changer(self.final_future, args.interface).info()
+
+        for line in info.present():
             print(line)
 
 
 @register("scan")
 class Scan(Task):
     async def execute_task(self, args):
-        ch = changer(self.final_future, args.interface)
+        if args.all_interfaces:
+            result = await self.from_daemon(args, lambda client: client.scan_all())
+            if result is NoDaemon:
+                pool = ChangerPool(self.final_future)
+                result = await pool.scan_all(progress={"debug": args.debug})
+
+            found, errors = result
+            for interface, error in sorted(errors.items()):
+                print(f"# {interface}: {error}")
+        else:
+            found = await self.from_daemon(args, lambda client: client.scan(args.interface))
+            if found is NoDaemon:
+                ch = changer(self.final_future, args.interface)
+                found = await ch.scan(progress={"debug": args.debug})
 
-        found = await ch.scan(progress={"debug": args.debug})
         for network in found:
             if args.filter_bssid and args.filter_bssid not in network.bssid:
                 continue
@@ -86,27 +126,73 @@ class Scan(Task):
         parser = super().change_parser(parser)
         parser.add_argument("--filter-bssid", default=None, type=str)
         parser.add_argument("--filter-ssid", default=None, type=str)
+        parser.add_argument("--all-interfaces", action="store_true")
         return parser
 
 
 @register("connect")
 class Connect(Task):
     async def execute_task(self, args):
-        ch = changer(self.final_future, args.interface)
-        await ch.connect(args.ssid)
+        pin = {"bssid": args.bssid, "freq": args.freq}
+        result = await self.from_daemon(
+            args, lambda client: client.connect(args.ssid, interface=args.interface, **pin)
+        )
+        if result is NoDaemon:
+            ch = changer(self.final_future, args.interface)
+            await ch.connect(args.ssid, **pin)
         print(f"Connected to {args.ssid}")
 
     def change_parser(self, parser):
         parser = super().change_parser(parser)
         parser.add_argument("--ssid", required=True, type=str)
+        parser.add_argument("--bssid", default=None, type=str)
+        parser.add_argument("--freq", default=None, type=int)
         return parser
 
 
 @register("disconnect")
 class Disconnect(Task):
+    async def execute_task(self, args):
+        result = await self.from_daemon(args, lambda client: client.disconnect(args.interface))
+        if result is NoDaemon:
+            ch = changer(self.final_future, args.interface)
+            await ch.disconnect()
+
+
+@register("supervise")
+class Supervise(Task):
+    async def execute_task(self, args):
+        ch = changer(self.final_future, args.interface)
+        supervisor = ch.supervise(args.ssid, bssid=args.bssid, progress={"debug": args.debug})
+        try:
+            await supervisor.task
+        finally:
+            await supervisor.stop()
+
+    def change_parser(self, parser):
+        parser = super().change_parser(parser)
+        parser.add_argument("--ssid", required=True, type=str)
+        parser.add_argument("--bssid", default=None, type=str)
+        return parser
+
+
+@register("watch")
+class Watch(Task):
     async def execute_task(self, args):
         ch = changer(self.final_future, args.interface)
-        await ch.disconnect()
+        async with ch.watch() as events:
+            async for event in events:
+                print(event)
+
+
+@register("serve")
+class Serve(Task):
+    async def execute_task(self, args):
+        await Server(self.final_future, args.socket, background_scan=args.background_scan).serve()
+
+    def change_parser(self, parser):
+        parser.add_argument("--background-scan", default=None, type=float)
+        return parser
 
 
 def make_command_parser():
@@ -0,0 +1,83 @@
+import stat
+import os
+
+NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+
+
+class NotOurs(OSError):
+    pass
+
+
+def check_ours(st, path, kind=stat.S_ISREG):
+    """
+    Raise :class:`NotOurs` unless ``st`` is the right kind of file, belongs to
+    us and nobody else can write to it
+    """
+    if not kind(st.st_mode):
+        raise NotOurs(f"{path} isn't what we expected")
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise NotOurs(f"{path} belongs to someone else")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise NotOurs(f"{path} can be changed by other users")
+
+
+def open_ours(path, mode=0o600):
+    """
+    Open ``path`` for reading and writing, making it with ``mode`` if it
+    doesn't exist yet.
+
+    Symlinks aren't followed and :class:`NotOurs` is raised if the file is
+    someone else's, so another user can't point us at their data.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | NOFOLLOW, mode)
+    try:
+        check_ours(os.fstat(fd), path)
+    except:
+        os.close(fd)
+        raise
+    return fd
+
+
+def private_folder(folder):
+    """
+    Make ``folder`` so that only we can use it, or raise OSError if it
+    already exists and isn't ours
+    """
+    try:
+        folder.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+
+    st = os.lstat(folder)
+    check_ours(st, folder, kind=stat.S_ISDIR)
+    if st.st_mode & 0o077:
+        raise NotOurs(f"{folder} can be used by other users")
+    return folder
+
+
+def read_ours(path):
+    """Return the bytes in ``path``, raising OSError if it isn't ours"""
+    fd = os.open(path, os.O_RDONLY | NOFOLLOW)
+    try:
+        check_ours(os.fstat(fd), path)
+        with os.fdopen(fd, "rb", closefd=False) as f:
+            return f.read()
+    finally:
+        os.close(fd)
+
+
+def write_ours(path, data, mode=0o600):
+    """Replace ``path`` with a new file of ``data`` that only we can change"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | NOFOLLOW, mode)
+    try:
+        with os.fdopen(fd, "wb", closefd=False) as f:
+            f.write(data)
+    finally:
+        os.close(fd)
+
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        os.remove(tmp)
+        raise
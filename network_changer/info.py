@@ -2,6 +2,24 @@ import fnmatch
 import time
 
 
+def channel_to_freq(channel):
+    """Return the centre frequency in MHz of a 2.4GHz or 5GHz wifi channel"""
+    if channel == 14:
+        return 2484
+    elif channel < 14:
+        return 2407 + channel * 5
+    return 5000 + channel * 5
+
+
+def freq_to_channel(freq):
+    """Return ``(channel, band)`` for a frequency in MHz, where band is "bg" or "a"""
+    if freq == 2484:
+        return 14, "bg"
+    elif freq < 5000:
+        return (freq - 2407) // 5, "bg"
+    return (freq - 5000) // 5, "a"
+
+
 class ScanInfo:
     @classmethod
     def create(self, info):
@@ -16,6 +34,38 @@ class ScanInfo:
 
         return ScanInfo(final)
 
+    @classmethod
+    def merge(kls, scans):
+        """
+        Combine ``{interface: scan}`` into one ScanInfo with one entry per
+        bssid. Each entry keeps the freshest ``last_seen`` and records every
+        interface that saw it in ``interfaces``.
+        """
+        merged = {}
+        for interface, scan in scans.items():
+            for network in ScanInfo.create(scan):
+                key = network.bssid or f"ssid:{network.ssid}"
+                seen_by = {interface, *network.interfaces}
+
+                existing = merged.get(key)
+                if existing is None:
+                    merged[key] = NetworkInfo(
+                        network.bssid,
+                        network.ssid,
+                        network.last_seen,
+                        interfaces=seen_by,
+                        freq=network.freq,
+                    )
+                    continue
+
+                existing.interfaces.update(seen_by)
+                if network.last_seen > existing.last_seen:
+                    existing.ssid = network.ssid
+                    existing.last_seen = network.last_seen
+                    existing.freq = network.freq or existing.freq
+
+        return ScanInfo(list(merged.values()))
+
     def __init__(self, info):
         self.info = info
 
@@ -45,11 +95,19 @@ class NetworkInfo:
     def create(self, info):
         if isinstance(info, NetworkInfo):
             return info
-        return NetworkInfo(info.get("bssid", ""), info.get("ssid", ""), info.get("last_seen", -1))
+        return NetworkInfo(
+            info.get("bssid", ""),
+            info.get("ssid", ""),
+            info.get("last_seen", -1),
+            interfaces=info.get("interfaces"),
+            freq=info.get("freq"),
+        )
 
-    def __init__(self, bssid, ssid, last_seen=-1):
+    def __init__(self, bssid, ssid, last_seen=-1, interfaces=None, freq=None):
         self.ssid = ssid
+        self.freq = freq
         self.last_seen = last_seen
+        self.interfaces = set(interfaces or ())
         if bssid:
             self.bssid = ":".join(f"{int(part or 0, 16):02x}" for part in bssid.split(":"))
         else:
@@ -66,3 +124,7 @@ class NetworkInfo:
         yield f"  BSSID: {self.bssid}"
         yield f"   SSID: {self.ssid}"
         yield f"    AGE: {self.age} seconds"
+        if self.freq:
+            yield f"   FREQ: {self.freq} MHz"
+        if self.interfaces:
+            yield f"   SEEN: {', '.join(sorted(self.interfaces))}"
@@ -1,20 +1,13 @@
-from network_changer.platforms import Airport, Windows, DBus, IW
+from network_changer.capabilities import capabilities
+from network_changer import platforms
 
-import platform
-import shutil
+
+def platform_kls(name=None):
+    return getattr(platforms, capabilities.backend(name))
 
 
 def changer(final_future, name=None, kls=None):
     if kls is None:
-        p = platform.system()
-        if p == "Darwin":
-            kls = Airport
-        elif p == "Windows":
-            kls = Windows
-        else:
-            if name != "<iw>" and shutil.which("nmcli"):
-                kls = DBus
-            else:
-                kls = IW
+        kls = platform_kls(name)
 
     return kls(final_future, name)
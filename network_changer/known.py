@@ -0,0 +1,301 @@
+from network_changer.files import open_ours
+
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Optional
+import logging
+import struct
+import mmap
+import time
+import os
+
+fcntl: Optional[ModuleType]
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger("network_changer.known")
+
+MAGIC = b"NCKN"
+VERSION = 1
+
+# magic, version, slot size, capacity, generation
+HEADER = struct.Struct("=4sHHII")
+
+# used, ssid length, ssid, bssid, freq, last_seen, connect latency
+SLOT = struct.Struct("=BB32s6sHdf2x")
+
+NO_LATENCY = -1.0
+
+
+class KnownNetwork:
+    def __init__(self, ssid, bssid, freq, last_seen, latency):
+        self.ssid = ssid
+        self.freq = freq
+        self.bssid = bssid
+        self.latency = latency
+        self.last_seen = last_seen
+
+    @property
+    def age(self):
+        return time.time() - self.last_seen
+
+    def __repr__(self):
+        latency = "?" if self.latency is None else f"{self.latency:.2f}s"
+        return f"<KnownNetwork {self.ssid} {self.bssid} {self.freq}MHz {latency}>"
+
+
+class KnownNetworks:
+    """
+    Remembers the access points we've seen for each ssid, what frequency they
+    were on, when we last saw them and how long it took to join them the last
+    time we did.
+
+    .. code-block:: python
+
+        from network_changer.known import known_networks
+
+
+        known_networks.saw(changer.recently_seen())
+        known_networks.connected("my-network", "aa:bb:cc:dd:ee:ff", 2412, 1.5)
+        known_networks.best("my-network")
+
+    The records live in fixed size slots in a memory mapped file at ``path``
+    (by default from the ``NETWORK_CHANGER_KNOWN_NETWORKS`` environment
+    variable) so that each update only touches one slot and every process
+    using the same file shares what's known. Without a path, or if the file
+    isn't ours (see :func:`network_changer.files.open_ours`), the map is
+    anonymous and only lasts as long as the process.
+
+    At most ``per_ssid`` access points are kept for each ssid and
+    ``capacity`` in total, forgetting the ones seen longest ago.
+    """
+
+    def __init__(self, path=None, *, capacity=1024, per_ssid=4):
+        self.path = path
+        self.capacity = capacity
+        self.per_ssid = per_ssid
+
+        self.map = None
+        self.fd = None
+        self.generation = None
+        self.slots = {}
+        self.free = []
+
+    @property
+    def size(self):
+        return HEADER.size + SLOT.size * self.capacity
+
+    def open(self):
+        if self.map is not None:
+            return
+
+        if self.path:
+            try:
+                self.fd = open_ours(self.path, 0o644)
+                with self.locked(exclusive=True):
+                    if os.fstat(self.fd).st_size != self.size or not self.valid():
+                        os.ftruncate(self.fd, 0)
+                        os.ftruncate(self.fd, self.size)
+                    self.map = mmap.mmap(self.fd, self.size)
+                    if not self.valid():
+                        self.initialise()
+                return
+            except OSError as error:
+                log.debug(f"Failed to open known networks at {self.path}: {error}")
+                self.close()
+
+        self.map = mmap.mmap(-1, self.size)
+        self.initialise()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.generation = None
+
+    def valid(self):
+        if self.map is not None:
+            header = self.map[: HEADER.size]
+        else:
+            header = os.pread(self.fd, HEADER.size, 0)
+
+        if len(header) != HEADER.size:
+            return False
+        magic, version, slot_size, capacity, _ = HEADER.unpack(header)
+        return (magic, version, slot_size, capacity) == (
+            MAGIC,
+            VERSION,
+            SLOT.size,
+            self.capacity,
+        )
+
+    def initialise(self):
+        self.map[:] = b"\0" * self.size
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, SLOT.size, self.capacity, 0)
+
+    @contextmanager
+    def locked(self, exclusive=False):
+        if self.fd is None or fcntl is None:
+            yield
+            return
+
+        fcntl.flock(self.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def read(self, index):
+        used, length, ssid, bssid, freq, last_seen, latency = SLOT.unpack_from(
+            self.map, HEADER.size + SLOT.size * index
+        )
+        if not used:
+            return None
+        return KnownNetwork(
+            ssid[:length].decode(errors="replace"),
+            ":".join(f"{octet:02x}" for octet in bssid),
+            freq or None,
+            last_seen,
+            None if latency == NO_LATENCY else latency,
+        )
+
+    def refresh(self):
+        """Rebuild our view of the slots if anything has written to them since we looked"""
+        generation = HEADER.unpack_from(self.map)[-1]
+        if generation == self.generation:
+            return
+
+        self.slots = {}
+        self.free = []
+        for index in range(self.capacity):
+            network = self.read(index)
+            if network is None:
+                self.free.append(index)
+            else:
+                self.slots.setdefault(network.ssid, {})[network.bssid] = index
+        self.generation = generation
+
+    def best(self, ssid):
+        """
+        Return what we know about the access points for ``ssid``, those we've
+        joined before first and then most recently seen first
+        """
+        self.open()
+        with self.locked():
+            self.refresh()
+            found = [self.read(index) for index in self.slots.get(ssid, {}).values()]
+
+        return sorted(
+            [network for network in found if network is not None],
+            key=lambda network: (network.latency is not None, network.last_seen),
+            reverse=True,
+        )
+
+    def saw(self, networks):
+        """Remember the networks from a scan"""
+        found = []
+        for network in networks:
+            last_seen = network.last_seen if network.last_seen > 0 else time.time()
+            found.append((network.ssid, network.bssid, network.freq, last_seen, None))
+        self.update(found)
+
+    def connected(self, ssid, bssid, freq, latency):
+        """Remember that joining ``bssid`` took ``latency`` seconds"""
+        self.update([(ssid, bssid, freq, time.time(), latency)])
+
+    def update(self, records):
+        self.open()
+        with self.locked(exclusive=True):
+            self.refresh()
+
+            changed = False
+            for ssid, bssid, freq, last_seen, latency in records:
+                changed = self.write(ssid, bssid, freq, last_seen, latency) or changed
+
+            if changed:
+                self.generation = (self.generation + 1) & 0xFFFFFFFF
+                struct.pack_into("=I", self.map, HEADER.size - 4, self.generation)
+
+    def write(self, ssid, bssid, freq, last_seen, latency):
+        encoded = ssid.encode()
+        try:
+            octets = bytes.fromhex(bssid.replace(":", ""))
+        except ValueError:
+            return False
+        if not encoded or len(encoded) > 32 or len(octets) != 6:
+            return False
+
+        existing = self.slots.setdefault(ssid, {})
+        index = existing.get(bssid)
+
+        if index is not None:
+            previous = self.read(index)
+            if latency is None and previous is not None:
+                latency = previous.latency
+            if freq is None and previous is not None:
+                freq = previous.freq
+        else:
+            index = self.claim(ssid, last_seen)
+            if index is None:
+                return False
+            existing[bssid] = index
+
+        SLOT.pack_into(
+            self.map,
+            HEADER.size + SLOT.size * index,
+            1,
+            len(encoded),
+            encoded,
+            octets,
+            int(freq) if freq and freq < 0x10000 else 0,
+            last_seen,
+            NO_LATENCY if latency is None else latency,
+        )
+        return True
+
+    def claim(self, ssid, last_seen):
+        """Return a slot for a new access point on ``ssid``, or None if it's too old to keep"""
+        if len(self.slots.get(ssid, {})) < self.per_ssid and self.free:
+            return self.free.pop()
+
+        candidates = [
+            (self.read(index).last_seen, name, bssid, index)
+            for name, indexes in self.slots.items()
+            for bssid, index in indexes.items()
+            if name == ssid or len(self.slots.get(ssid, {})) < self.per_ssid
+        ]
+        if not candidates:
+            return None
+
+        seen, name, bssid, index = min(candidates)
+        if seen > last_seen:
+            return None
+
+        del self.slots[name][bssid]
+        return index
+
+    def forget(self, ssid=None):
+        """Forget the access points for ``ssid``, or everything if no ssid"""
+        self.open()
+        with self.locked(exclusive=True):
+            self.refresh()
+            for name, indexes in list(self.slots.items()):
+                if ssid is not None and name != ssid:
+                    continue
+                for index in indexes.values():
+                    SLOT.pack_into(
+                        self.map, HEADER.size + SLOT.size * index, 0, 0, b"", b"", 0, 0, 0
+                    )
+                    self.free.append(index)
+                del self.slots[name]
+
+            self.generation = (self.generation + 1) & 0xFFFFFFFF
+            struct.pack_into("=I", self.map, HEADER.size - 4, self.generation)
+
+
+known_networks = KnownNetworks(os.environ.get("NETWORK_CHANGER_KNOWN_NETWORKS"))
@@ -0,0 +1,275 @@
+from network_changer.files import open_ours, private_folder
+from network_changer import async_helpers as hp
+
+from typing import Dict, Optional, Tuple
+from types import ModuleType
+from pathlib import Path
+import itertools
+import tempfile
+import logging
+import asyncio
+import heapq
+import os
+
+fcntl: Optional[ModuleType]
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger("network_changer.lock")
+
+# Lower goes first
+CONNECT = 0
+SCAN = 1
+
+
+def lock_folder():
+    """Return a folder only we can use to make lock files in, preferring /run"""
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    for folder in (
+        Path("/run/network_changer"),
+        Path(tempfile.gettempdir()) / f"network_changer-{user}",
+    ):
+        try:
+            return private_folder(folder)
+        except OSError as error:
+            log.debug(f"Not making interface locks in {folder}: {error}")
+    return None
+
+
+class Request:
+    def __init__(self, priority, order, make, key, preemptible):
+        self.key = key
+        self.make = make
+        self.order = order
+        self.priority = priority
+        self.preemptible = preemptible
+
+        self.task = None
+        self.waiters = 0
+        self.preempted = False
+        self.future = hp.create_future(name=("Request({})::future", key))
+
+    def __lt__(self, other):
+        return (self.priority, self.order) < (other.priority, other.order)
+
+
+class InterfaceLock:
+    """
+    Makes operations that change what an interface is doing take turns, both
+    within this process and, if ``across_processes``, with every other
+    process on the machine.
+
+    .. code-block:: python
+
+        from network_changer import lock
+
+
+        interface_lock = lock.for_interface("wlan0")
+        await interface_lock.run(lock.CONNECT, lambda: join(), key=("connect", ssid))
+
+    Waiting operations go in a priority queue so a connect or disconnect
+    (``CONNECT``) goes before any waiting scans (``SCAN``), and a
+    ``preemptible`` operation that's running is cancelled and put back in the
+    queue when something more important arrives. Operations with the same
+    ``key`` that are waiting at the same time only happen once and every
+    caller gets that result.
+
+    Other processes are kept out with ``flock`` on a file in
+    ``/run/network_changer``, or a folder of our own in the temporary
+    directory if we can't write there. A connect waiting in any process also
+    holds a shared lock on an intent file, and scans wait until nothing does.
+    Only processes of the same user take turns with each other this way.
+    """
+
+    def __init__(self, interface, *, across_processes=True, poll=0.05):
+        self.poll = poll
+        self.interface = interface
+        self.across_processes = across_processes and fcntl is not None
+
+        self.queue = []
+        self.order = itertools.count()
+        self.current = None
+        self.dispatcher = None
+        self.loop = asyncio.get_event_loop()
+
+        self.fd = None
+        self.intent_fd = None
+        self.opened = False
+
+    async def run(self, priority, make, key=None, preemptible=False):
+        """Return ``await make()`` once it's our turn to use the interface"""
+        request = None
+        if key is not None:
+            for waiting in self.queue:
+                if waiting.key == key and not waiting.future.done():
+                    request = waiting
+                    break
+
+        if request is None:
+            request = Request(priority, next(self.order), make, key, preemptible)
+            heapq.heappush(self.queue, request)
+            self.preempt(request)
+            if self.dispatcher is None:
+                self.dispatcher = hp.async_as_background(self.dispatch(), silent=True)
+
+        request.waiters += 1
+        try:
+            return await asyncio.shield(request.future)
+        except asyncio.CancelledError:
+            request.waiters -= 1
+            if request.waiters == 0:
+                request.future.cancel()
+                if request.task is not None:
+                    request.task.cancel()
+            raise
+
+    def preempt(self, request):
+        current = self.current
+        if current is None or not current.preemptible or current.task is None:
+            return
+        if request.priority < current.priority and not current.preempted:
+            log.debug(f"Preempting {current.key} on {self.interface} for {request.key}")
+            current.preempted = True
+            current.task.cancel()
+
+    async def dispatch(self):
+        request = None
+        try:
+            while self.queue:
+                request = heapq.heappop(self.queue)
+                if request.future.done():
+                    continue
+
+                if not await self.acquire(request):
+                    heapq.heappush(self.queue, request)
+                    continue
+
+                if request.future.done():
+                    # Everyone waiting for this gave up while we waited for the lock
+                    self.release()
+                    continue
+
+                self.current = request
+                try:
+                    request.task = hp.async_as_background(request.make(), silent=True)
+                    await asyncio.wait([request.task])
+                finally:
+                    self.current = None
+                    self.release()
+
+                task, request.task = request.task, None
+                if request.preempted and not request.future.done():
+                    request.preempted = False
+                    heapq.heappush(self.queue, request)
+                    continue
+
+                if request.future.done():
+                    continue
+                if task.cancelled():
+                    request.future.cancel()
+                elif task.exception() is not None:
+                    request.future.set_exception(task.exception())
+                else:
+                    request.future.set_result(task.result())
+        finally:
+            self.dispatcher = None
+            if request is not None:
+                request.future.cancel()
+            for waiting in self.queue:
+                waiting.future.cancel()
+            self.queue = []
+
+    def open(self):
+        if self.opened:
+            return
+        self.opened = True
+
+        if not self.across_processes:
+            return
+
+        folder = lock_folder()
+        if folder is None:
+            log.debug("Nowhere to put interface locks, only locking within this process")
+            return
+
+        try:
+            self.fd = open_ours(folder / f"{self.interface}.lock")
+            self.intent_fd = open_ours(folder / f"{self.interface}.intent")
+        except OSError as error:
+            log.debug(f"Failed to open the lock for {self.interface}: {error}")
+            self.close()
+
+    def close(self):
+        for fd in (self.fd, self.intent_fd):
+            if fd is not None:
+                os.close(fd)
+        self.fd = None
+        self.intent_fd = None
+        self.opened = False
+
+    def try_lock(self, fd, operation):
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    async def acquire(self, request):
+        """
+        Wait until no other process is using the interface. Return False if a
+        more important request arrived or everyone waiting for ``request``
+        gave up while we waited.
+        """
+        self.open()
+        if self.fd is None:
+            return True
+
+        intent = False
+        try:
+            while True:
+                if request.future.done():
+                    return False
+                if self.queue and self.queue[0] < request:
+                    return False
+
+                if request.priority == CONNECT:
+                    if not intent:
+                        intent = self.try_lock(self.intent_fd, fcntl.LOCK_SH)
+                elif self.try_lock(self.intent_fd, fcntl.LOCK_EX):
+                    fcntl.flock(self.intent_fd, fcntl.LOCK_UN)
+                else:
+                    # A connect is waiting somewhere
+                    await asyncio.sleep(self.poll)
+                    continue
+
+                if self.try_lock(self.fd, fcntl.LOCK_EX):
+                    return True
+
+                await asyncio.sleep(self.poll)
+        finally:
+            if intent:
+                fcntl.flock(self.intent_fd, fcntl.LOCK_UN)
+
+    def release(self):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+locks: Dict[Tuple[str, bool], InterfaceLock] = {}
+
+
+def for_interface(interface, *, across_processes=True):
+    """Return the :class:`InterfaceLock` this process uses for ``interface``"""
+    if interface is None:
+        raise ValueError("Need to know the interface before it can be locked")
+
+    key = (interface, across_processes)
+    loop = asyncio.get_event_loop()
+    found = locks.get(key)
+    if found is None or found.loop is not loop or found.loop.is_closed():
+        if found is not None:
+            found.close()
+        found = locks[key] = InterfaceLock(interface, across_processes=across_processes)
+    return found
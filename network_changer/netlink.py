@@ -0,0 +1,459 @@
+from network_changer.errors import NetworkChangerException
+
+import asyncio
+import logging
+import socket
+import struct
+import os
+
+log = logging.getLogger("network_changer.netlink")
+
+NETLINK_ROUTE = 0
+NETLINK_GENERIC = 16
+
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+IFF_UP = 0x1
+IFF_LOWER_UP = 0x10000
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+
+NL80211_ATTR_IFINDEX = 3
+
+NL80211_CMD_AUTHENTICATE = 37
+NL80211_CMD_ASSOCIATE = 38
+NL80211_CMD_DEAUTHENTICATE = 39
+NL80211_CMD_DISASSOCIATE = 40
+NL80211_CMD_CONNECT = 46
+NL80211_CMD_ROAM = 47
+NL80211_CMD_DISCONNECT = 48
+
+NLMSG_HEADER = struct.Struct("=IHHII")
+NETLINK_HEADER_SIZE = NLMSG_HEADER.size
+IFADDRMSG = struct.Struct("=BBBBI")
+IFINFOMSG = struct.Struct("=BxHiII")
+RTATTR = struct.Struct("=HH")
+NLMSGERR = struct.Struct("=i")
+GENLMSGHDR = struct.Struct("=BBH")
+U16 = struct.Struct("=H")
+U32 = struct.Struct("=I")
+
+
+class NetlinkProblem(NetworkChangerException):
+    pass
+
+
+def available():
+    """Netlink only exists on Linux"""
+    return hasattr(socket, "AF_NETLINK")
+
+
+def align(length):
+    return (length + 3) & ~3
+
+
+def parse_messages(data):
+    """Yield ``(msg_type, flags, seq, payload)`` for each message in data"""
+    offset = 0
+    while offset + NETLINK_HEADER_SIZE <= len(data):
+        length, msg_type, flags, seq, _ = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NETLINK_HEADER_SIZE:
+            break
+        yield msg_type, flags, seq, data[offset + NETLINK_HEADER_SIZE : offset + length]
+        offset += align(length)
+
+
+def parse_attributes(data, offset=0):
+    """Return a dictionary of ``{attribute_type: value_bytes}``"""
+    attrs = {}
+    while offset + RTATTR.size <= len(data):
+        length, attr_type = RTATTR.unpack_from(data, offset)
+        if length < RTATTR.size:
+            break
+        attrs[attr_type] = data[offset + RTATTR.size : offset + length]
+        offset += align(length)
+    return attrs
+
+
+def parse_address(payload):
+    """
+    Return ``(index, family, prefixlen, address)`` for an ``RTM_NEWADDR`` or
+    ``RTM_DELADDR`` payload.
+    """
+    family, prefixlen, _, _, index = IFADDRMSG.unpack_from(payload)
+    attrs = parse_attributes(payload, IFADDRMSG.size)
+    raw = attrs.get(IFA_LOCAL, attrs.get(IFA_ADDRESS))
+
+    address = None
+    if raw is not None:
+        address = socket.inet_ntop(family, raw)
+
+    return index, family, prefixlen, address
+
+
+def parse_link(payload):
+    """
+    Return ``(index, flags)`` for an ``RTM_NEWLINK`` or ``RTM_DELLINK`` payload
+    """
+    _, _, index, flags, _ = IFINFOMSG.unpack_from(payload)
+    return index, flags
+
+
+def pack_attribute(attr_type, value):
+    data = RTATTR.pack(RTATTR.size + len(value), attr_type) + value
+    return data + b"\0" * (align(len(data)) - len(data))
+
+
+class RTNetlink:
+    """
+    A non blocking rtnetlink socket subscribed to the given multicast
+    ``groups``. Other netlink families can be used with ``protocol``.
+
+    .. code-block:: python
+
+        from network_changer import netlink
+
+
+        def changed(msg_type, payload):
+            ...
+
+        with netlink.RTNetlink(netlink.RTMGRP_IPV4_IFADDR) as nl:
+            nl.listen(changed)
+            ...
+    """
+
+    def __init__(self, groups=0, protocol=NETLINK_ROUTE):
+        self.seq = 0
+        self.sock = None
+        self.groups = groups
+        self.protocol = protocol
+        self.listening = None
+
+        # Called with the error if reading fails while listening, for example
+        # when the kernel drops messages because we fell behind
+        self.on_error = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_typ, exc, tb):
+        self.close()
+
+    def open(self):
+        if not available():
+            raise NetlinkProblem("Netlink is not available on this platform")
+
+        try:
+            self.sock = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_RAW | socket.SOCK_NONBLOCK, self.protocol
+            )
+            self.sock.bind((0, self.groups))
+        except OSError as error:
+            self.close()
+            raise NetlinkProblem(f"Failed to open a netlink socket: {error}")
+
+    def close(self):
+        if self.listening is not None:
+            self.listening.remove_reader(self.sock.fileno())
+            self.listening = None
+
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def send(self, msg_type, payload, flags=NLM_F_REQUEST | NLM_F_ACK):
+        """Send a request to the kernel and return it's sequence number"""
+        self.seq += 1
+        header = NLMSG_HEADER.pack(NETLINK_HEADER_SIZE + len(payload), msg_type, flags, self.seq, 0)
+        try:
+            self.sock.send(header + payload)
+        except OSError as error:
+            raise NetlinkProblem(f"Failed to send to netlink: {error}")
+        return self.seq
+
+    async def messages(self):
+        """Yield ``(msg_type, seq, payload)`` for messages as they arrive"""
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                data = await loop.sock_recv(self.sock, 65536)
+            except OSError as error:
+                raise NetlinkProblem(f"Failed to read from netlink: {error}")
+
+            for msg_type, _, seq, payload in parse_messages(data):
+                yield msg_type, seq, payload
+
+    def listen(self, callback):
+        """
+        Call ``callback(msg_type, payload)`` from the event loop for every
+        message received on this socket
+        """
+
+        def readable():
+            # A callback may close this socket, so we stop as soon as that happens
+            while self.sock is not None:
+                try:
+                    data = self.sock.recv(65536)
+                except BlockingIOError:
+                    return
+                except OSError as error:
+                    log.error(f"Failed to read from netlink: {error}")
+                    if self.on_error is not None:
+                        self.on_error(error)
+                    return
+
+                for msg_type, _, _, payload in parse_messages(data):
+                    if self.sock is None:
+                        return
+                    try:
+                        callback(msg_type, payload)
+                    except Exception as error:
+                        log.exception(error)
+
+        self.listening = asyncio.get_event_loop()
+        self.listening.add_reader(self.sock.fileno(), readable)
+
+
+def check_ack(payload):
+    """Raise NetlinkProblem if an ``NLMSG_ERROR`` payload is an error"""
+    (error,) = NLMSGERR.unpack_from(payload)
+    if error < 0:
+        raise NetlinkProblem(os.strerror(-error))
+
+
+def interface_index(interface):
+    try:
+        return socket.if_nametoindex(interface)
+    except (OSError, TypeError) as error:
+        raise NetlinkProblem(f"Unknown interface {interface}: {error}")
+
+
+async def set_link(interface, up, timeout=5):
+    """
+    Bring ``interface`` up or down and wait until the kernel says it has done
+    so. This is what ``ip link set <interface> up|down`` does, without
+    starting a process.
+
+    Raises :class:`NetlinkProblem` if netlink isn't available, we don't have
+    permission or the change doesn't happen within ``timeout`` seconds.
+
+    We wait for ``IFF_UP`` rather than ``IFLA_OPERSTATE`` because a wireless
+    interface has no carrier until it associates, so its operstate stays down
+    or dormant after it's brought up. ``IFF_UP`` is the part we change and is
+    all that's needed before asking it to connect.
+    """
+    index = interface_index(interface)
+
+    with RTNetlink(RTMGRP_LINK) as nl:
+        change = IFINFOMSG.pack(socket.AF_UNSPEC, 0, index, IFF_UP if up else 0, IFF_UP)
+        sent = nl.send(RTM_NEWLINK, change)
+
+        async def changed():
+            acked = False
+            done = False
+            async for msg_type, seq, payload in nl.messages():
+                if msg_type == NLMSG_ERROR and seq == sent:
+                    check_ack(payload)
+                    acked = True
+                    # Ask for the state in case it didn't need to change
+                    nl.send(RTM_GETLINK, IFINFOMSG.pack(socket.AF_UNSPEC, 0, index, 0, 0))
+                elif msg_type == RTM_NEWLINK:
+                    idx, flags = parse_link(payload)
+                    if idx == index and bool(flags & IFF_UP) == up:
+                        done = True
+
+                if acked and done:
+                    return
+
+        try:
+            await asyncio.wait_for(changed(), timeout)
+        except asyncio.TimeoutError:
+            state = "up" if up else "down"
+            raise NetlinkProblem(f"Timed out waiting for {interface} to go {state}")
+
+
+def resolve_family(nl, name, timeout=1):
+    """
+    Return ``(family_id, {group_name: group_id})`` for the generic netlink
+    family called ``name`` using the open generic netlink socket ``nl``.
+
+    The kernel answers straight away so this blocks for the reply.
+    """
+    request = GENLMSGHDR.pack(CTRL_CMD_GETFAMILY, 1, 0)
+    request += pack_attribute(CTRL_ATTR_FAMILY_NAME, name.encode() + b"\0")
+    sent = nl.send(GENL_ID_CTRL, request, flags=NLM_F_REQUEST)
+
+    nl.sock.settimeout(timeout)
+    try:
+        while True:
+            try:
+                data = nl.sock.recv(65536)
+            except OSError as error:
+                raise NetlinkProblem(f"Failed to find the {name} netlink family: {error}")
+
+            for msg_type, _, seq, payload in parse_messages(data):
+                if seq != sent:
+                    continue
+                if msg_type == NLMSG_ERROR:
+                    check_ack(payload)
+                    raise NetlinkProblem(f"No {name} netlink family")
+
+                attrs = parse_attributes(payload, GENLMSGHDR.size)
+                (family,) = U16.unpack_from(attrs[CTRL_ATTR_FAMILY_ID])
+
+                groups = {}
+                for group in parse_attributes(attrs.get(CTRL_ATTR_MCAST_GROUPS, b"")).values():
+                    group = parse_attributes(group)
+                    group_name = group[CTRL_ATTR_MCAST_GRP_NAME].rstrip(b"\0").decode()
+                    (groups[group_name],) = U32.unpack_from(group[CTRL_ATTR_MCAST_GRP_ID])
+
+                return family, groups
+    finally:
+        nl.sock.setblocking(False)
+
+
+def mlme_listener(interface, on_event):
+    """
+    Return an open netlink socket that calls ``on_event(cmd)`` for every
+    nl80211 MLME event on ``interface``. These include ``NL80211_CMD_CONNECT``,
+    ``NL80211_CMD_ROAM`` and ``NL80211_CMD_DISCONNECT``.
+
+    Return ``None`` if nl80211 isn't available so the caller can use
+    :func:`link_listener` or polling instead.
+    """
+    if not available():
+        return None
+
+    try:
+        index = socket.if_nametoindex(interface)
+    except (OSError, TypeError):
+        return None
+
+    nl = RTNetlink(protocol=NETLINK_GENERIC)
+    try:
+        nl.open()
+        family, groups = resolve_family(nl, "nl80211")
+        if "mlme" not in groups:
+            raise NetlinkProblem("nl80211 has no mlme multicast group")
+        nl.sock.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, groups["mlme"])
+    except (NetlinkProblem, OSError) as error:
+        log.debug(error)
+        nl.close()
+        return None
+
+    def changed(msg_type, payload):
+        if msg_type != family or len(payload) < GENLMSGHDR.size:
+            return
+
+        cmd, _, _ = GENLMSGHDR.unpack_from(payload)
+        attrs = parse_attributes(payload, GENLMSGHDR.size)
+        if (
+            NL80211_ATTR_IFINDEX in attrs
+            and U32.unpack_from(attrs[NL80211_ATTR_IFINDEX])[0] == index
+        ):
+            on_event(cmd)
+
+    nl.listen(changed)
+    return nl
+
+
+def _open_listener(interface, groups, make_changed):
+    if not available():
+        return None
+
+    try:
+        index = socket.if_nametoindex(interface)
+    except (OSError, TypeError):
+        return None
+
+    nl = RTNetlink(groups)
+    try:
+        nl.open()
+    except NetlinkProblem as error:
+        log.debug(error)
+        return None
+
+    nl.listen(make_changed(index))
+    return nl
+
+
+def link_listener(interface, on_link):
+    """
+    Return an open :class:`RTNetlink` that calls ``on_link(up)`` whenever the
+    carrier on ``interface`` changes. For a wireless interface that's whenever
+    it associates with or loses an access point.
+
+    Return ``None`` if netlink isn't available so the caller can fall back to
+    polling.
+    """
+
+    def make_changed(index):
+        state = {"up": None}
+
+        def changed(msg_type, payload):
+            if msg_type not in (RTM_NEWLINK, RTM_DELLINK):
+                return
+
+            idx, flags = parse_link(payload)
+            if idx != index:
+                return
+
+            up = msg_type == RTM_NEWLINK and bool(flags & IFF_UP) and bool(flags & IFF_LOWER_UP)
+            if up != state["up"]:
+                state["up"] = up
+                on_link(up)
+
+        return changed
+
+    return _open_listener(interface, RTMGRP_LINK, make_changed)
+
+
+def address_listener(interface, on_address):
+    """
+    Return an open :class:`RTNetlink` that calls ``on_address(address)`` for
+    every IPv4 address added to ``interface``.
+
+    Return ``None`` if netlink isn't available so the caller can fall back to
+    polling.
+    """
+
+    def make_changed(index):
+        def changed(msg_type, payload):
+            if msg_type != RTM_NEWADDR:
+                return
+
+            idx, _, _, address = parse_address(payload)
+            if idx == index and address is not None:
+                on_address(address)
+
+        return changed
+
+    return _open_listener(interface, RTMGRP_IPV4_IFADDR, make_changed)
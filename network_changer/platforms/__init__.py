@@ -20,38 +20,63 @@ class Unsupported:
         check_after=True,
         expected_subnet=None,
         retrier=None,
+        bssid=None,
+        freq=None,
     ):
         raise UnsupportedPlatform(self.reason)
 
     async def disconnect(self, progress=None):
         raise UnsupportedPlatform(self.reason)
 
-    async def scan(self, request_scan=True, progress=None):
+    async def scan(self, request_scan=True, progress=None, channels=None):
         raise UnsupportedPlatform(self.reason)
 
-    async def info(self, progress=None):
+    async def info(self, progress=None, fields=None):
         raise UnsupportedPlatform(self.reason)
 
+    @classmethod
+    async def discover(kls, final_future):
+        raise UnsupportedPlatform(kls.reason)
 
-platforms = []
 
 available = [
     (None, "Windows"),
     ("network_changer.platforms.airport", "Airport"),
     ("network_changer.platforms.dbus", "DBus"),
     ("network_changer.platforms.iw", "IW"),
+    ("network_changer.platforms.simulated", "Simulated"),
 ]
 
-for impt, name in available:
-    platforms.append(name)
+platforms = [name for _, name in available]
+
+
+def load(name):
+    """
+    Import the platform called ``name``, or make an ``Unsupported`` class that
+    explains why it couldn't be imported.
+
+    Platforms are only imported when they are first used, so that importing
+    network_changer doesn't load libraries for backends that won't be used.
+    """
+    impt = dict((n, i) for i, n in available)[name]
 
     try:
         if impt is None:
             raise ImportError(f"No implementation for {name}")
         mod = importlib.import_module(impt)
     except ImportError as error:
-        locals()[name] = type(name, (Unsupported,), {"reason": str(error)})
+        kls = type(name, (Unsupported,), {"reason": str(error)})
     else:
-        locals()[name] = getattr(mod, name)
+        kls = getattr(mod, name)
+
+    globals()[name] = kls
+    return kls
+
+
+def __getattr__(name):
+    if name in platforms:
+        return load(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = platforms + ["Unsupported"]
@@ -41,7 +41,21 @@ class Airport(Changer):
         if self.airport is None:
             raise CouldntFindAirport()
 
-    async def do_connect(self, ssid, *, check_connected, progress=None):
+    @classmethod
+    async def discover(kls, final_future):
+        output = await Commands.run_command(["networksetup", "-listallhardwareports"])
+
+        found = []
+        port = None
+        for line in output.split("\n"):
+            if line.startswith("Hardware Port:"):
+                port = line.split(":", 1)[1].strip()
+            elif line.startswith("Device:") and port in ("Wi-Fi", "AirPort"):
+                found.append(line.split(":", 1)[1].strip())
+        return found
+
+    async def do_connect(self, ssid, *, check_connected, progress=None, bssid=None, freq=None):
+        # networksetup has no way of choosing the access point
         await Commands.run_command(
             ["networksetup", "-setairportnetwork", self.name, ssid],
             error_kls=lambda error, stde, stdo: FailedToConnect(
@@ -53,7 +67,7 @@ class Airport(Changer):
         # Note this does nothing unless you're root sigh
         return await Commands.run_command([self.airport, "-z"])
 
-    async def do_scan(self, request_scan=True, progress=None):
+    async def do_scan(self, request_scan=True, progress=None, channels=None):
         output = await Commands.run_command([self.airport, "-s"])
         lines = output.split("\n")
 
@@ -82,7 +96,8 @@ class Airport(Changer):
 
         return result
 
-    async def do_info(self, progress=None):
+    async def do_info(self, progress=None, fields=None):
+        # airport -I gives us everything at once so fields makes no difference
         ssid = ""
         bssid = ""
 
@@ -1,16 +1,27 @@
 from network_changer.errors import FailedToConnect, NetworkChangerException
-from network_changer.info import NetworkInfo, ScanInfo
+from network_changer.info import NetworkInfo, ScanInfo, freq_to_channel
+from network_changer.known import known_networks
 from network_changer.retrier import ConnectionRetrier
+from network_changer.scheduler import BackgroundScanner, ScanScheduler
+from network_changer.supervisor import Supervisor
+from network_changer.watcher import StateWatcher
 from network_changer import async_helpers as hp
+from network_changer import scancache
+from network_changer import lock
+from network_changer import netlink
 from network_changer.progress import Progress
 
 from functools import partial
+from pathlib import Path
 import netifaces
 import ipaddress
 import logging
+import inspect
 import asyncio
 import sys
 
+log = logging.getLogger("network_changer.platforms.base")
+
 
 class NoIPInRange(NetworkChangerException):
     def __init__(self, *, available, expected):
@@ -33,27 +44,196 @@ class CouldntFindSSID(NetworkChangerException):
         return "Couldn't find ssid"
 
 
+# The fields of NetworkInfo that info(fields=...) can ask for
+INFO_FIELDS = frozenset(["ssid", "bssid"])
+
+
+def takes(method, name):
+    """
+    Say if ``method`` can be given the keyword argument ``name``. Backends
+    written before ``fields``, ``channels``, ``bssid`` and ``freq`` existed
+    don't take them.
+    """
+    try:
+        parameters = inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+    if name in parameters:
+        return True
+    return any(parameter.kind is parameter.VAR_KEYWORD for parameter in parameters.values())
+
+
 class Changer:
+    # Seconds that the result of info() may be reused for when the backend can't
+    # tell us about changes. Zero, the default, means concurrent calls share one
+    # request to the backend but are never answered from cache
+    info_freshness = 0
+
+    # Where access points we've seen before are remembered, and how many seconds
+    # one may be joined for without scanning for it first
+    known = known_networks
+    known_for = 600
+
+    # Seconds that a scan of this interface by another process may be used for
+    # when NETWORK_CHANGER_SHARE_SCANS is set
+    shared_scan_for = 5
+
+    # Whether connects, disconnects and scans take turns with other processes
+    # as well as within this one
+    lock_across_processes = True
+
+    # Seconds between the end of one hardware scan and the start of the next
+    min_scan_interval = 1
+
+    # Seconds that networks found by a scan are kept for recently_seen()
+    seen_for = 120
+
+    # Seconds check_connected waits for an address in the expected subnet
+    address_wait = 40
+
     def __init__(self, final_future, name):
         self.name = name
+        self.retriers = set()
         self.final_future = final_future
+
+        self._info_flights = {}
+        self._info_cached = None
+        self._info_events = None
+        self._info_events_started = False
+        self._state_watcher = None
+        self._shared_scans = None
+        self._info_generation = 0
+
+        self.busy = 0
+        self.scanned_at = None
+        self.supervisor = None
+        self.background_scanner = None
+
+        self._seen = {}
+        self._scan_scheduler = None
+
         self.setup()
+        final_future.add_done_callback(lambda res: self.close())
 
     def setup(self):
         pass
 
+    def close(self):
+        """
+        Release anything the backend holds open. This is called when
+        ``final_future`` is done
+        """
+        self._info_events_stopped()
+        if self._shared_scans is not None:
+            self._shared_scans.close()
+
+    def listen_for_changes(self, changed, stopped):
+        """
+        Arrange for ``changed()`` to be called whenever the network this
+        interface is on may have changed and return an object with a
+        ``close()`` method that stops that. ``stopped()`` is called if the
+        backend can no longer tell us about changes.
+
+        Returns None when the backend can't tell us about changes, which is
+        the default.
+        """
+        return None
+
+    def listening(self):
+        """
+        Start listening for changes if we haven't yet and return whether the
+        backend is telling us about them
+        """
+        if not self._info_events_started and not self.final_future.done():
+            self._info_events_started = True
+            try:
+                self._info_events = self.listen_for_changes(
+                    self._info_changed, self._info_events_stopped
+                )
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                raise
+            except:
+                exc_info = sys.exc_info()
+                log.debug(f"Couldn't listen for changes on {self.interface}: {exc_info[1]}")
+        return self._info_events is not None
+
+    def _info_changed(self):
+        self.forget_info()
+        if self._state_watcher is not None:
+            self._state_watcher.wake()
+
+    def _info_events_stopped(self):
+        events, self._info_events = self._info_events, None
+        if events is not None:
+            events.close()
+            self._info_changed()
+
+    def watch(self):
+        """
+        Return an async iterator of the events in ``network_changer.watcher``
+        for this interface. Every call shares one subscription to the backend.
+
+        .. code-block:: python
+
+            async with changer.watch() as events:
+                async for event in events:
+                    print(event.kind, event)
+        """
+        if self._state_watcher is None:
+            self._state_watcher = StateWatcher(self)
+        return self._state_watcher.subscribe()
+
+    def addresses(self):
+        """Return the IPv4 addresses the interface has"""
+        if self.interface not in netifaces.interfaces():
+            return []
+        addresses = netifaces.ifaddresses(self.interface)
+        return [info["addr"] for info in addresses.get(netifaces.AF_INET, [])]
+
+    def wake(self):
+        """
+        Used by backends when something happens that means any retries in
+        progress on this interface should try again straight away
+        """
+        for retrier in list(self.retriers):
+            retrier.wake()
+
+    async def retry(self, retrier, name, determine, final_future, timeout, progress=None):
+        retrier = ConnectionRetrier.create(retrier, name=("{}::{}", self.__class__.__name__, name))
+        self.retriers.add(retrier)
+        try:
+            return await retrier.retry(determine, final_future, timeout, progress=progress)
+        finally:
+            self.retriers.discard(retrier)
+
+    @classmethod
+    async def discover(kls, final_future):
+        """Return the names of the wireless interfaces this platform can use"""
+        found = []
+        for path in Path("/sys/class/net").glob("*"):
+            if (path / "wireless").exists() or (path / "phy80211").exists():
+                found.append(path.name)
+        return sorted(found)
+
     @property
     def interface(self):
         if hasattr(self, "_interface"):
             return self._interface
         return self.name
 
+    async def resolve_interface(self):
+        """
+        Return the name of the interface, for backends that have to ask
+        something before they know it
+        """
+        return self.interface
+
     async def ssid_from(self, ssid, progress=None, retrier=None, timeout=60):
         if callable(ssid):
             if retrier is None:
                 retrier = [(1, 10), (5, 30)]
 
-            final_future = hp.ChildOfFuture(
+            final_future = hp.CancelScope(
                 self.final_future, name="Changer::ssid_from[final_future]"
             )
             try:
@@ -65,16 +245,34 @@ class Changer:
                     else:
                         return ss
 
-                return await ConnectionRetrier.create(
-                    retrier, name=f"{self.__class__.__name__}::ssid_from"
-                ).retry(determine, final_future, timeout, progress=progress)
+                return await self.retry(
+                    retrier, "ssid_from", determine, final_future, timeout, progress=progress
+                )
             finally:
                 final_future.cancel()
         else:
             return ssid
 
+    async def interface_lock(self):
+        """
+        Return the :class:`network_changer.lock.InterfaceLock` that connects,
+        disconnects and scans of this interface take turns with
+        """
+        interface = await self.resolve_interface()
+        return lock.for_interface(interface, across_processes=self.lock_across_processes)
+
     async def disconnect(self, progress=None):
-        return await self.do_disconnect(progress=progress)
+        self.busy += 1
+        try:
+            interface_lock = await self.interface_lock()
+            return await interface_lock.run(
+                lock.CONNECT,
+                lambda: self.do_disconnect(progress=progress),
+                key=("disconnect",),
+            )
+        finally:
+            self.busy -= 1
+            self.forget_info()
 
     async def do_disconnect(self, progress=None):
         raise NotImplementedError()
@@ -89,7 +287,23 @@ class Changer:
         check_after=True,
         expected_subnet=None,
         retrier=None,
+        bssid=None,
+        freq=None,
     ):
+        """
+        Connect to ``ssid``, retrying with ``retrier`` for up to ``timeout``
+        seconds.
+
+        ``bssid`` and ``freq`` tell the backend which access point to join so it
+        doesn't have to scan for one first. If they aren't given they come from
+        :meth:`pin` on the first attempt, falling back to letting the backend
+        choose if joining that access point fails.
+
+        How long each successful join took is remembered in ``known``.
+        """
+        if bssid is not None and check_bssid is None:
+            check_bssid = bssid
+
         check_connected = partial(
             self.check_connected,
             ssid,
@@ -102,18 +316,65 @@ class Changer:
             if await check_connected():
                 return
 
-        final_future = hp.ChildOfFuture(
-            self.final_future, name=f"{self.__class__.__name__}::connect[connection_final_future]"
+        self.busy += 1
+        final_future = hp.CancelScope(
+            self.final_future,
+            name=("{}::connect[connection_final_future]", self.__class__.__name__),
         )
         try:
 
+            state = {"pin": bssid is None and freq is None and takes(self.do_connect, "bssid")}
+
+            async def join(ss, bssid, freq):
+                pinned = {}
+                if bssid is not None:
+                    pinned["bssid"] = bssid
+                if freq is not None:
+                    pinned["freq"] = freq
+
+                try:
+                    interface_lock = await self.interface_lock()
+                    await interface_lock.run(
+                        lock.CONNECT,
+                        lambda: self.do_connect(
+                            ssid=ss, check_connected=check_connected, progress=None, **pinned
+                        ),
+                        key=("connect", ss, bssid, freq),
+                    )
+                finally:
+                    self.forget_info()
+
             async def determine(*args):
                 try:
                     ss = await self.ssid_from(ssid)
-                    await self.do_connect(ssid=ss, check_connected=check_connected, progress=None)
-                    if check_after is False:
-                        return
-                    if await check_connected():
+
+                    pinned = (None, None)
+                    if state["pin"]:
+                        state["pin"] = False
+                        pinned = await self.pin(ss, progress=progress)
+
+                    started = asyncio.get_event_loop().time()
+
+                    if pinned[0] is None:
+                        await join(ss, bssid, freq)
+                    else:
+                        try:
+                            await join(ss, *pinned)
+                        except (KeyboardInterrupt, asyncio.CancelledError):
+                            raise
+                        except:
+                            Progress.add_to_progress(
+                                progress,
+                                logging.INFO,
+                                "Couldn't join the access point we saw, letting the backend choose",
+                                bssid=pinned[0],
+                            )
+                            started = asyncio.get_event_loop().time()
+                            await join(ss, None, None)
+
+                    if check_after is False or await check_connected():
+                        took = asyncio.get_event_loop().time() - started
+                        await self.remember_join(ss, took, pinned, (bssid, freq))
                         return
                 except (KeyboardInterrupt, asyncio.CancelledError):
                     raise
@@ -123,14 +384,99 @@ class Changer:
                     exc_info = sys.exc_info()
                     raise FailedToConnect(ssid, self.name, self.__class__, error=exc_info[1])
 
-            return await ConnectionRetrier.create(
-                retrier, name=f"{self.__class__.__name__}::connect"
-            ).retry(determine, final_future, timeout, progress=progress)
+            return await self.retry(
+                retrier, "connect", determine, final_future, timeout, progress=progress
+            )
         finally:
+            self.busy -= 1
             final_future.cancel()
 
+    async def remember_join(self, ssid, took, *choices):
+        """Tell ``known`` that joining ``ssid`` took ``took`` seconds"""
+        try:
+            info = await self.info()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            raise
+        except:
+            return
+
+        if not info.bssid or info.ssid != ssid:
+            return
+
+        freq = info.freq
+        for bssid, f in choices:
+            if freq is None and bssid == info.bssid:
+                freq = f
+        self.known.connected(ssid, info.bssid, freq, took)
+
+    def supervise(self, ssid, **kwargs):
+        """
+        Start a :class:`network_changer.supervisor.Supervisor` that keeps this
+        interface connected to ``ssid`` and return it. Any supervisor already
+        running on this changer is stopped.
+        """
+        if self.supervisor is not None:
+            self.supervisor.final_future.cancel()
+
+        self.supervisor = Supervisor(self, ssid, **kwargs).start()
+        return self.supervisor
+
+    def background_scan(self, **kwargs):
+        """
+        Start a :class:`network_changer.scheduler.BackgroundScanner` that keeps
+        :meth:`recently_seen` up to date while this interface is idle and
+        return it. Any background scanner already running is stopped.
+        """
+        if self.background_scanner is not None:
+            self.background_scanner.final_future.cancel()
+
+        self.background_scanner = BackgroundScanner(self, **kwargs).start()
+        return self.background_scanner
+
+    async def pin(self, ssid, progress=None):
+        """
+        Return ``(bssid, freq)`` of the access point to join for ``ssid``, or
+        ``(None, None)`` to let the backend choose.
+
+        * If :meth:`recently_seen` knows of access points for ``ssid`` we use
+          the one there is, or the one of them we've joined before
+        * Otherwise if ``known`` saw an access point in the last ``known_for``
+          seconds we use that without scanning
+        * Otherwise we scan only the channels ``known`` says the network was
+          on and look at what we saw again
+
+        We don't know the signal strength of each access point, so if we can't
+        tell which of several to use the backend is left to choose.
+        """
+        if not self.recently_seen(ssid):
+            known = self.known.best(ssid)
+            if known and known[0].age < self.known_for:
+                return known[0].bssid, known[0].freq
+
+            channels = sorted(
+                set(freq_to_channel(network.freq)[0] for network in known if network.freq)
+            )
+            if not channels:
+                return None, None
+
+            Progress.add_to_progress(
+                progress, logging.INFO, "Looking for a known network", ssid=ssid, channels=channels
+            )
+            await self.scan(progress=progress, channels=channels)
+
+        found = {network.bssid: network for network in self.recently_seen(ssid) if network.bssid}
+        if len(found) > 1:
+            joined = [network.bssid for network in self.known.best(ssid) if network.latency]
+            found = {bssid: found[bssid] for bssid in joined[:1] if bssid in found}
+
+        if len(found) != 1:
+            return None, None
+
+        network = list(found.values())[0]
+        return network.bssid, network.freq
+
     async def check_connected(self, ssid, bssid=None, progress=None, expected_subnet=None):
-        info = await self.info(progress=progress)
+        info = await self.info(progress=progress, fields=["ssid" if bssid is None else "bssid"])
         if bssid is not None:
             found = info.bssid == bssid
         else:
@@ -143,8 +489,19 @@ class Changer:
             return True
 
         first = {"val": True}
-        retrier = [(3, 40)]
-        final_future = hp.ChildOfFuture(
+        retrier = ConnectionRetrier.create(
+            [(3, 40)], name=("{}::check_connected", self.__class__.__name__)
+        )
+
+        # Netifaces polling is the fallback, netlink lets us look again as soon
+        # as an address is added
+        def address_added(address):
+            if ipaddress.ip_address(address) in expected_subnet:
+                retrier.wake()
+
+        listener = netlink.address_listener(self.interface, address_added)
+
+        final_future = hp.CancelScope(
             self.final_future, name="Changer::check_connected[look_for_ip]"
         )
         try:
@@ -162,48 +519,219 @@ class Changer:
                     if ipaddress.ip_address(addr) in expected_subnet:
                         return True
 
-                return NoIPInRange(available=addresses, expected=expected_subnet)
+                raise NoIPInRange(available=addresses, expected=expected_subnet)
 
-            return await ConnectionRetrier.create(
-                retrier, name=f"{self.__class__.__name__}::check_connected"
-            ).retry(determine, final_future, 40, progress=progress)
+            return await self.retry(
+                retrier,
+                "check_connected",
+                determine,
+                final_future,
+                self.address_wait,
+                progress=progress,
+            )
+        except NoIPInRange as error:
+            Progress.add_to_progress(
+                progress, logging.INFO, "No IP in the expected subnet", error=error
+            )
+            return False
         finally:
             final_future.cancel()
+            if listener is not None:
+                listener.close()
 
-        return False
-
-    async def do_connect(self, ssid, check_connected=None, progress=None):
+    async def do_connect(self, ssid, check_connected=None, progress=None, bssid=None, freq=None):
         raise NotImplementedError()
 
-    async def scan(self, request_scan=True, progress=None):
+    async def scan(self, request_scan=True, progress=None, channels=None):
+        """
+        Return a ScanInfo of the networks the interface can see.
+
+        Scans that request a scan go through ``self.scan_scheduler`` so that
+        concurrent callers share hardware scans. ``channels`` may be a list of
+        channel numbers to limit the scan to, on backends that support it.
+        """
         if self.final_future.done():
             await self.final_future
 
+        if not request_scan:
+            return await self._scan(None, progress, request_scan=False)
+        return await self.scan_scheduler.scan(channels, progress=progress)
+
+    @property
+    def scan_scheduler(self):
+        if self._scan_scheduler is None:
+            self._scan_scheduler = ScanScheduler(
+                self._scan,
+                min_interval=self.min_scan_interval,
+                name=("{}({})", self.__class__.__name__, self.name),
+            )
+        return self._scan_scheduler
+
+    async def shared_scans(self):
+        """
+        Return the :class:`network_changer.scancache.SharedScanCache` for this
+        interface, or None if ``NETWORK_CHANGER_SHARE_SCANS`` isn't set or we
+        can't tell what the interface is
+        """
+        if self._shared_scans is None and scancache.enabled():
+            try:
+                interface = await self.resolve_interface()
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                raise
+            except:
+                exc_info = sys.exc_info()
+                log.debug(f"Not sharing scans, couldn't find the interface: {exc_info[1]}")
+                return None
+
+            if self._shared_scans is None:
+                self._shared_scans = scancache.SharedScanCache(interface)
+        return self._shared_scans
+
+    async def _scan(self, channels, progress, request_scan=True):
+        if channels is not None and not takes(self.do_scan, "channels"):
+            # Backends that can't scan only some channels scan all of them
+            channels = None
+
+        shared = await self.shared_scans() if request_scan else None
+        if shared is not None:
+            info = shared.latest(self.shared_scan_for, channels=channels)
+            if info is not None:
+                Progress.add_to_progress(
+                    progress, logging.DEBUG, "Using a scan from another process"
+                )
+                self.saw(info)
+                return info
+
+        async def scan():
+            if channels is None:
+                return await self.do_scan(request_scan=request_scan, progress=progress)
+            return await self.do_scan(
+                request_scan=request_scan, progress=progress, channels=channels
+            )
+
         try:
-            info = await self.do_scan(request_scan=request_scan, progress=progress)
+            if request_scan:
+                # Scans give way to connects and disconnects
+                key = ("scan", None if channels is None else tuple(channels))
+                interface_lock = await self.interface_lock()
+                info = await interface_lock.run(lock.SCAN, scan, key=key, preemptible=True)
+            else:
+                info = await scan()
         except (KeyboardInterrupt, asyncio.CancelledError):
             raise
         except:
             exc_info = sys.exc_info()
             Progress.no_scan(progress, exc_info[1])
             info = []
-
-        return ScanInfo.create(info)
-
-    async def do_scan(self, request_scan=True, progress=None):
+        else:
+            info = ScanInfo.create(info)
+            if shared is not None:
+                shared.publish(info, channels=channels)
+
+        info = ScanInfo.create(info)
+        if request_scan:
+            self.saw(info)
+        return info
+
+    def saw(self, found):
+        now = asyncio.get_event_loop().time()
+        self.scanned_at = now
+        for network in found:
+            self._seen[network.bssid] = (now, network)
+
+        self.known.saw(found)
+        if self._state_watcher is not None:
+            self._state_watcher.scanned(found)
+
+    def recently_seen(self, ssid=None, within=None):
+        """
+        Return the networks found by scans in the last ``within`` seconds,
+        which defaults to ``seen_for``, most recently seen first.
+        """
+        if within is None:
+            within = self.seen_for
+
+        now = asyncio.get_event_loop().time()
+        for bssid, (at, _) in list(self._seen.items()):
+            if now - at > self.seen_for:
+                del self._seen[bssid]
+
+        found = [
+            (at, network)
+            for at, network in self._seen.values()
+            if now - at <= within and (ssid is None or network.ssid == ssid)
+        ]
+        return [network for _, network in sorted(found, key=lambda item: item[0], reverse=True)]
+
+    async def do_scan(self, request_scan=True, progress=None, channels=None):
         raise NotImplementedError()
 
-    async def info(self, progress=None):
-        try:
-            info = await self.do_info(progress=progress)
-        except (KeyboardInterrupt, asyncio.CancelledError):
-            raise
-        except:
-            exc_info = sys.exc_info()
-            Progress.no_info(progress, exc_info[1])
-            info = {"bssid": "", "ssid": ""}
+    def forget_info(self):
+        """Make sure the next call to info() asks the backend"""
+        self._info_generation += 1
+        self._info_flights = {}
+        self._info_cached = None
+
+    async def info(self, progress=None, fields=None):
+        """
+        Return the NetworkInfo for the interface.
+
+        ``fields`` may be a collection of names from ``INFO_FIELDS`` so that the
+        backend only fetches those. The other fields on the result are empty.
+
+        Concurrent calls share one request to the backend. If the backend can
+        tell us when things change (see :meth:`listen_for_changes`) the result
+        is reused until they do, otherwise it's reused for ``info_freshness``
+        seconds.
+        """
+        listening = self.listening()
+
+        if fields is not None:
+            fields = frozenset(fields)
+            # Everything is fetched when it can be cached until something changes
+            if fields >= INFO_FIELDS or listening or not takes(self.do_info, "fields"):
+                fields = None
+
+        if self._info_cached is not None:
+            at, info = self._info_cached
+            if listening:
+                return info
+            if self.info_freshness and asyncio.get_event_loop().time() - at < self.info_freshness:
+                return info
+
+        # A request for everything answers a request for some fields
+        flight = self._info_flights.get(None)
+        if flight is None:
+            flight = self._info_flights.get(fields)
+
+        if flight is None:
+            flight = self._info_flights[fields] = hp.async_as_background(
+                self._fetch_info(progress, fields), silent=True
+            )
+        return await asyncio.shield(flight)
 
-        return NetworkInfo.create(info)
+    async def _fetch_info(self, progress, fields):
+        generation = self._info_generation
+        try:
+            try:
+                if fields is None:
+                    info = await self.do_info(progress=progress)
+                else:
+                    info = await self.do_info(progress=progress, fields=fields)
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                raise
+            except:
+                exc_info = sys.exc_info()
+                Progress.no_info(progress, exc_info[1])
+                return NetworkInfo.create({"bssid": "", "ssid": ""})
+
+            info = NetworkInfo.create(info)
+            if fields is None and generation == self._info_generation:
+                self._info_cached = (asyncio.get_event_loop().time(), info)
+            return info
+        finally:
+            if generation == self._info_generation:
+                self._info_flights.pop(fields, None)
 
-    async def do_info(self, progress=None):
+    async def do_info(self, progress=None, fields=None):
         raise NotImplementedError()
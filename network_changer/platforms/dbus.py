@@ -1,5 +1,6 @@
 from network_changer.errors import NetworkChangerException
 from network_changer.platforms.base import Changer
+from network_changer.info import freq_to_channel
 from network_changer import async_helpers as hp
 from network_changer.progress import Progress
 
@@ -15,7 +16,11 @@ from sdbus_async.networkmanager import (
 )
 from sdbus import sd_bus_open_system
 import logging
+import asyncio
 import uuid
+import sys
+
+log = logging.getLogger("network_changer.platforms.dbus")
 
 
 def boot_time():
@@ -55,6 +60,60 @@ class memoized_property:
         setattr(instance, self.cache_name, value)
 
 
+class DBusListener:
+    """
+    Calls ``changed()`` whenever NetworkManager says the state, active access
+    point or IPv4 configuration of the device has changed, and ``stopped()``
+    if we stop hearing about that.
+    """
+
+    def __init__(self, changer, changed, stopped):
+        self.changer = changer
+        self.changed = changed
+        self.stopped = stopped
+        self.task = hp.async_as_background(self.run(), silent=True)
+
+    def close(self):
+        self.task.cancel()
+
+    async def run(self):
+        listeners = []
+        try:
+            device = await self.changer.device()
+            listeners.append(hp.async_as_background(self.states(device), silent=True))
+            listeners.append(hp.async_as_background(self.properties(device), silent=True))
+
+            # Anything cached before we were subscribed can't be trusted
+            await asyncio.sleep(0)
+            self.changed()
+
+            await hp.wait_for_first_future(
+                *listeners, name=("DBusListener({})::run", self.changer.name)
+            )
+            for listener in listeners:
+                if listener.done() and not listener.cancelled() and listener.exception():
+                    raise listener.exception()
+        except asyncio.CancelledError:
+            raise
+        except:
+            exc_info = sys.exc_info()
+            log.debug(f"Stopped listening to NetworkManager: {exc_info[1]}")
+        finally:
+            for listener in listeners:
+                listener.cancel()
+
+        self.stopped()
+
+    async def states(self, device):
+        async for _ in device.state_changed:
+            self.changed()
+
+    async def properties(self, device):
+        async for _, changed, _ in device.properties_changed:
+            if "ActiveAccessPoint" in changed or "State" in changed or "Ip4Config" in changed:
+                self.changed()
+
+
 class DBus(Changer):
     @memoized_property
     def system_bus(self):
@@ -68,6 +127,22 @@ class DBus(Changer):
     def settings(self):
         return NetworkManagerSettings(self.system_bus)
 
+    @classmethod
+    async def discover(kls, final_future):
+        changer = kls(final_future, None)
+
+        found = []
+        for device_path in await changer.nm.get_devices():
+            generic_device = NetworkDeviceGeneric(device_path, changer.system_bus)
+            if await generic_device.device_type == DeviceType.WIFI:
+                found.append(await generic_device.interface)
+        return sorted(found)
+
+    async def resolve_interface(self):
+        if not hasattr(self, "_interface"):
+            await self.device()
+        return self._interface
+
     async def device(self):
         device = None
         devices_paths = await self.nm.get_devices()
@@ -96,9 +171,17 @@ class DBus(Changer):
 
         return device
 
-    async def do_connect(self, ssid, *, check_connected, progress=None):
+    async def do_connect(self, ssid, *, check_connected, progress=None, bssid=None, freq=None):
         await self.do_disconnect(progress=progress)
 
+        wireless = {"ssid": ("ay", ssid.encode()), "mode": ("s", "infrastructure")}
+        if bssid is not None:
+            wireless["bssid"] = ("ay", bytes(int(part, 16) for part in bssid.split(":")))
+        if freq is not None:
+            channel, band = freq_to_channel(freq)
+            wireless["band"] = ("s", band)
+            wireless["channel"] = ("u", channel)
+
         device = await self.device()
         connection = await self.settings.add_connection_unsaved(
             {
@@ -109,7 +192,7 @@ class DBus(Changer):
                     "interface-name": ("s", self._interface),
                     "autoconnect": ("b", False),
                 },
-                "802-11-wireless": {"ssid": ("ay", ssid.encode()), "mode": ("s", "infrastructure")},
+                "802-11-wireless": wireless,
                 "ipv4": {"method": ("s", "auto")},
                 "ipv6": {"method": ("s", "ignore")},
             }
@@ -124,7 +207,9 @@ class DBus(Changer):
             connection=connection._remote_object_path, device=device._remote_object_path
         )
 
-        async with hp.ATicker(0.5, final_future=self.final_future, max_time=60) as ticker:
+        async with hp.ATicker(
+            0.5, final_future=self.final_future, max_time=60, wheel=True
+        ) as ticker:
             async for _ in ticker:
                 state = await device.state
                 if state == DeviceState.ACTIVATED:
@@ -142,12 +227,14 @@ class DBus(Changer):
             connection = NetworkConnectionSettings(conn, self.system_bus)
             await connection.delete()
 
-    async def do_scan(self, request_scan=True, progress=None):
+    async def do_scan(self, request_scan=True, progress=None, channels=None):
         device = await self.device()
 
         last_scan = await device.last_scan
         await device.request_scan({})
-        async with hp.ATicker(0.5, final_future=self.final_future, max_time=5) as ticker:
+        async with hp.ATicker(
+            0.5, final_future=self.final_future, max_time=5, wheel=True
+        ) as ticker:
             async for _ in ticker:
                 nxt = await device.last_scan
                 if nxt != last_scan:
@@ -161,19 +248,34 @@ class DBus(Changer):
             ssid = (await ap.ssid).decode()
             bssid = (await ap.hw_address).lower()
             last_seen = BOOT_TIME + await ap.last_seen
-            results.append({"bssid": bssid, "ssid": ssid, "last_seen": last_seen})
+            freq = await ap.frequency
+            results.append({"bssid": bssid, "ssid": ssid, "last_seen": last_seen, "freq": freq})
 
         return results
 
-    async def do_info(self, progress=None):
+    def listen_for_changes(self, changed, stopped):
+        return DBusListener(self, changed, stopped)
+
+    async def do_info(self, progress=None, fields=None):
         device = await self.device()
+        info = {"bssid": "", "ssid": ""}
 
+        if fields is not None and not {"ssid", "bssid"} & set(fields):
+            return info
+
+        # NetworkManager has an active access point while it's still
+        # associating, so only believe it once the device is activated
         state = await device.state
         if state != DeviceState.ACTIVATED:
-            return {"bssid": "", "ssid": ""}
+            return info
 
         ap = await device.active_access_point
+        if ap == "/":
+            return info
+
         ap = AccessPoint(ap, self.system_bus)
-        ssid = (await ap.ssid).decode()
-        bssid = (await ap.hw_address).lower()
-        return {"bssid": bssid, "ssid": ssid}
+        if fields is None or "ssid" in fields:
+            info["ssid"] = (await ap.ssid).decode()
+        if fields is None or "bssid" in fields:
+            info["bssid"] = (await ap.hw_address).lower()
+        return info
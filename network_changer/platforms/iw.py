@@ -1,27 +1,28 @@
 from network_changer.errors import FailedToConnect, NetworkChangerException
+from network_changer.capabilities import capabilities
 from network_changer.platforms.base import Changer
-from network_changer.platforms import iwlib
+from network_changer.info import channel_to_freq
+from network_changer.platforms import iwlib, wext
+from network_changer.progress import Progress
 from network_changer.shell import Commands
+from network_changer import netlink
 
-from ctypes import cdll, byref, create_string_buffer, cast, POINTER, string_at
-from contextlib import contextmanager
-from ctypes import c_ubyte, c_double
+from ctypes import create_string_buffer, addressof, memmove, sizeof, cast, POINTER
+from ctypes import c_ubyte
 from errno import EAGAIN, EPERM
+import logging
 import asyncio
 import shutil
 import fcntl
 import time
 import os
 
-try:
-    iw = cdll.LoadLibrary("libiw.so")
-except OSError:
-    raise ImportError("No libiw.so found")
-
 SIOCGIWAP = 0x8B15
+SIOCGIWFREQ = 0x8B05
 SIOCSIWSCAN = 0x8B18
 SIOCGIWSCAN = 0x8B19
 SIOCGIWNAME = 0x8B01
+SIOCGIWRANGE = 0x8B0B
 SIOCGIWESSID = 0x8B1B
 
 IW_SCAN_MAX_DATA = 4096
@@ -41,15 +42,152 @@ class IWProblem(NetworkChangerException):
     pass
 
 
+class IWContext:
+    """
+    What we need to make wireless extensions ioctls for one interface.
+
+    It owns one socket, opened when first needed and kept until :meth:`close`,
+    a request with the interface name already filled in that other requests are
+    copied from, and the buffers used to read scan results and the essid so
+    they aren't created for every call.
+    """
+
+    def __init__(self, interface):
+        self.socket = None
+        self.interface = interface
+        self.encoded = interface.encode()
+
+        self.template = iwlib.struct_iwreq()
+        self.template.ifr_ifrn.ifrn_name = (c_ubyte * 16)(*bytearray(self.encoded[:15]))
+
+        self.scratch = iwlib.struct_iwreq()
+
+        self.buflen = 0xFFFF
+        self.buffer = create_string_buffer(self.buflen)
+        self.essid_buffer = create_string_buffer(wext.IW_ESSID_MAX_SIZE + 2)
+
+    @property
+    def sock(self):
+        if self.socket is None:
+            try:
+                self.socket = wext.open_socket()
+            except OSError as error:
+                raise IWProblem(f"Failed to open iw sockets: {error}")
+        return self.socket.fileno()
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def request(self, reuse=False):
+        """
+        Return a struct_iwreq for this interface. With ``reuse`` the same object
+        is returned every time, so it's only valid until the next call
+        """
+        if not reuse:
+            return iwlib.struct_iwreq.from_buffer_copy(self.template)
+
+        memmove(addressof(self.scratch), addressof(self.template), sizeof(self.template))
+        return self.scratch
+
+    def ioctl(self, request, wrq=None):
+        """Return ``(ret, errno, wrq)`` from the ioctl"""
+        if wrq is None:
+            wrq = self.request(reuse=True)
+
+        try:
+            ret = fcntl.ioctl(self.sock, request, wrq)
+            errno = 0
+        except OSError as error:
+            ret = -1
+            errno = error.errno
+        return ret, errno, wrq
+
+    def essid(self):
+        """Return the essid the interface is using as bytes, or None"""
+        wrq = self.request(reuse=True)
+        wrq.u.essid.pointer = cast(self.essid_buffer, POINTER(None))
+        wrq.u.essid.length = sizeof(self.essid_buffer)
+        wrq.u.essid.flags = 0
+
+        ret, _, wrq = self.ioctl(SIOCGIWESSID, wrq)
+        if ret != 0:
+            return None
+        return self.essid_buffer.raw[: wrq.u.essid.length]
+
+    def range_info(self):
+        """Return the struct_iw_range for the interface, or None"""
+        rng = iwlib.struct_iw_range()
+        buffer = create_string_buffer(sizeof(rng) * 2)
+
+        wrq = self.request(reuse=True)
+        wrq.u.data.pointer = cast(buffer, POINTER(None))
+        wrq.u.data.length = sizeof(buffer)
+        wrq.u.data.flags = 0
+
+        ret, _, wrq = self.ioctl(SIOCGIWRANGE, wrq)
+        if ret < 0:
+            return None
+
+        memmove(addressof(rng), buffer, sizeof(rng))
+
+        # Like libiw, a short answer means a driver from before WE10
+        if wrq.u.data.length < 300:
+            rng.we_version_compiled = 9
+
+        return rng
+
+
+class IWListeners:
+    def __init__(self, listeners):
+        self.listeners = listeners
+
+    def close(self):
+        for listener in self.listeners:
+            listener.close()
+
+
 class IW(Changer):
     def setup(self):
         self.name = self.name or "wlan0"
-
-    async def do_connect(self, ssid, *, check_connected, progress=None):
+        self.context = IWContext(self.interface)
+
+    def close(self):
+        super().close()
+        self.context.close()
+
+    def listen_for_changes(self, changed, stopped):
+        """
+        Association changes, including roams, come from the nl80211 mlme group
+        and the carrier going up or down and new addresses come from rtnetlink.
+        """
+        listeners = [
+            netlink.mlme_listener(self.interface, lambda cmd: changed()),
+            netlink.link_listener(self.interface, lambda up: changed()),
+            netlink.address_listener(self.interface, lambda address: changed()),
+        ]
+        listeners = [listener for listener in listeners if listener is not None]
+        if not listeners:
+            return None
+
+        for listener in listeners:
+            # Messages may have been dropped so we can't know what changed
+            listener.on_error = lambda error: changed()
+
+        return IWListeners(listeners)
+
+    async def do_connect(self, ssid, *, check_connected, progress=None, bssid=None, freq=None):
         await self.do_disconnect(progress=progress)
 
+        cmd = ["iw", "dev", self.name, "connect", ssid]
+        if freq is not None:
+            cmd.append(str(freq))
+        if bssid is not None:
+            cmd.append(bssid)
+
         await Commands.run_command(
-            ["iw", "dev", self.name, "connect", ssid],
+            cmd,
             error_kls=lambda error, stde, stdo: FailedToConnect(
                 ssid, self.name, self.__class__, error=f"{error}: {stde}: {stdo}"
             ),
@@ -57,6 +195,16 @@ class IW(Changer):
 
     async def do_disconnect(self, progress=None):
         await Commands.run_command(["iw", "dev", self.name, "disconnect"], ignore_errors=True)
+
+        try:
+            await netlink.set_link(self.name, False)
+            await netlink.set_link(self.name, True)
+            return
+        except netlink.NetlinkProblem as error:
+            Progress.add_to_progress(
+                progress, logging.DEBUG, "Couldn't bounce the interface with netlink", error=error
+            )
+
         if shutil.which("ip"):
             await Commands.run_all(
                 ["ip", "link", "set", self.name, "down"],
@@ -70,149 +218,137 @@ class IW(Changer):
                 ignore_errors=True,
             )
 
-    async def do_scan(self, request_scan=True, progress=None):
-        with self.iw_sock() as skfd:
-            rng = iwlib.struct_iw_range()
-            has_range = iw.iw_get_range_info(skfd, self.interface.encode(), byref(rng)) >= 0
+    async def do_scan(self, request_scan=True, progress=None, channels=None):
+        context = self.context
+        scan_range = self.scan_range()
 
-            if not has_range or rng.we_version_compiled < 14:
-                await self.do_disconnect(progress=progress)
-                raise IWProblem("Interface doesn't support scanning.")
+        if scan_range is None or scan_range["we_version"] < 19:
+            await self.do_disconnect(progress=progress)
+            raise IWProblem("Interface doesn't support scanning.")
 
+        request = None
+        if channels:
             scanopt = iwlib.struct_iw_scan_req()
 
-            for i, ch in enumerate([1, 6, 11]):
-                freq = c_double()
-                ret = iw.iw_channel_to_freq(ch, byref(freq), byref(rng))
-                if ret < 0:
+            for i, ch in enumerate(channels[: len(scanopt.channel_list)]):
+                freq = scan_range["freqs"].get(str(ch))
+                if freq is None:
                     raise IWProblem(f"Unknown channel ({ch}) in range")
 
-                iw.iw_float2freq(freq, byref(scanopt.channel_list[i]))
-
-            scanopt.num_channels = 3
-
-            start = time.time()
-            while time.time() - start < 15:
-                ret, errno, wrq = self.iw_set_ext(skfd, SIOCSIWSCAN)
-                if ret < 0:
-                    if errno != EPERM:
-                        await self.do_disconnect(progress=progress)
-                        await asyncio.sleep(1)
-                    else:
-                        raise IWProblem(
-                            f"{self.interface} Interface doesn't support scanning: {os.strerror(errno)}"
-                        )
+                wext.float_to_freq(freq, scanopt.channel_list[i])
+                scanopt.num_channels = i + 1
+
+            request = context.request()
+            request.u.data.pointer = addressof(scanopt)
+            request.u.data.length = sizeof(scanopt)
+            request.u.data.flags = IW_SCAN_THIS_FREQ
+
+        start = time.time()
+        while time.time() - start < 15:
+            ret, errno, wrq = context.ioctl(SIOCSIWSCAN, wrq=request or context.request())
+            if ret < 0:
+                if errno != EPERM:
+                    await self.do_disconnect(progress=progress)
+                    await asyncio.sleep(1)
                 else:
-                    break
-
-            buflen = 0xFFFF
-            buffer = create_string_buffer(buflen)
-            start = time.time()
-            have_reply = False
-
-            while time.time() - start < 15:
-                buffer.value = b""
-
-                wrq.u.data.pointer = cast(buffer, POINTER(None))
-                wrq.u.data.flags = (
-                    IW_SCAN_ALL_ESSID | IW_SCAN_THIS_FREQ | IW_SCAN_ALL_MODE | IW_SCAN_ALL_RATE
-                )
-                wrq.u.data.length = buflen
-
-                ret, errno, _ = self.iw_get_ext(skfd, SIOCGIWSCAN, wrq=wrq)
-                if ret < 0 and errno != EAGAIN:
                     raise IWProblem(
-                        f"Failed to get scan info: {self.interface}: {os.strerror(errno)}"
+                        f"{self.interface} Interface doesn't support scanning: {os.strerror(errno)}"
                     )
+            else:
+                break
+
+        buflen = context.buflen
+        buffer = context.buffer
+        start = time.time()
+        have_reply = False
+
+        while time.time() - start < 15:
+            buffer.value = b""
 
-                if ret == 0:
-                    have_reply = True
-                    break
+            wrq.u.data.pointer = cast(buffer, POINTER(None))
+            wrq.u.data.flags = (
+                IW_SCAN_ALL_ESSID | IW_SCAN_THIS_FREQ | IW_SCAN_ALL_MODE | IW_SCAN_ALL_RATE
+            )
+            wrq.u.data.length = buflen
 
-                await asyncio.sleep(0.1)
+            ret, errno, _ = context.ioctl(SIOCGIWSCAN, wrq=wrq)
+            if ret < 0 and errno != EAGAIN:
+                raise IWProblem(f"Failed to get scan info: {self.interface}: {os.strerror(errno)}")
 
-            if not have_reply:
-                raise IWProblem(f"Timed out waiting for scan info: {self.interface}")
+            if ret == 0:
+                have_reply = True
+                break
 
-        iwe = iwlib.struct_iw_event()
-        stream = iwlib.struct_stream_descr()
+            await asyncio.sleep(0.1)
 
-        iw.iw_init_event_stream(byref(stream), buffer, wrq.u.data.length)
+        if not have_reply:
+            raise IWProblem(f"Timed out waiting for scan info: {self.interface}")
 
         results = []
-        nxt = {"bssid": None, "ssid": None}
-
-        while True:
-            ret = iw.iw_extract_event_stream(byref(stream), byref(iwe), rng.we_version_compiled)
-            if ret <= 0:
-                break
+        nxt = {"bssid": None, "ssid": None, "freq": None}
 
-            if iwe.cmd == SIOCGIWAP:
+        for cmd, payload in wext.events(buffer.raw[: wrq.u.data.length]):
+            if cmd == SIOCGIWAP:
                 if nxt["bssid"] is not None:
                     results.append(nxt)
-                    nxt = {"bssid": None, "ssid": None}
-
-                bssid = ""
-                if any(part != 0 for part in iwe.u.ap_addr.sa_data[:6]):
-                    bssid = ":".join([f"{part or 0:02x}" for part in iwe.u.ap_addr.sa_data[:6]])
-                nxt["bssid"] = bssid
-            elif iwe.cmd == SIOCGIWESSID:
-                nxt["ssid"] = string_at(iwe.u.essid.pointer, iwe.u.essid.length).decode(
-                    errors="ignore"
-                )
+                    nxt = {"bssid": None, "ssid": None, "freq": None}
+                nxt["bssid"] = wext.parse_bssid(payload)
+            elif cmd == SIOCGIWFREQ:
+                # Drivers report either a channel number or a frequency in Hz
+                value = wext.parse_freq(payload)
+                if value is not None:
+                    nxt["freq"] = channel_to_freq(value) if value < 1000 else value // 1000000
+            elif cmd == SIOCGIWESSID:
+                nxt["ssid"] = payload.decode(errors="ignore")
 
         if nxt["bssid"] is not None:
             results.append(nxt)
 
         return results
 
-    async def do_info(self, progress=None):
-        with self.iw_sock() as skfd:
-            ret, _, _ = self.iw_get_ext(skfd, SIOCGIWNAME)
+    async def do_info(self, progress=None, fields=None):
+        context = self.context
+        info = {"bssid": "", "ssid": ""}
+
+        if fields is None:
+            ret, _, _ = context.ioctl(SIOCGIWNAME)
             if ret != 0:
                 raise IWProblem(f"No wireless extensions for {self.interface}")
 
-            wc = iwlib.struct_wireless_config()
-            ret = iw.iw_get_basic_config(skfd, self.interface.encode(), byref(wc))
-            if ret != 0:
-                raise IWProblem(f"iw_get_basic_config failed for interface: {self.interface}")
+        if fields is None or "ssid" in fields:
+            essid = context.essid()
+            if essid is None:
+                raise IWProblem(f"Failed to get the essid for interface: {self.interface}")
+            info["ssid"] = essid.decode(errors="ignore").rstrip("\x00")
 
-            ret, _, wrq = self.iw_get_ext(skfd, SIOCGIWAP)
+        if fields is None or "bssid" in fields:
+            ret, _, wrq = context.ioctl(SIOCGIWAP)
             if ret != 0:
                 raise IWProblem(f"iw_get_ext failed for interface: {self.interface}")
 
-            bssid = ""
             if any(part != 0 for part in wrq.u.ap_addr.sa_data[:6]):
-                bssid = ":".join([f"{part or 0:02x}" for part in wrq.u.ap_addr.sa_data[:6]])
-
-            return {
-                "ssid": "".join([chr(i) for i in wc.essid]).rstrip("\x00"),
-                "bssid": bssid,
-            }
-
-    @contextmanager
-    def iw_sock(self):
-        skfd = iw.iw_sockets_open()
-        if skfd < 0:
-            raise IWProblem("Failed to open iw sockets")
-
-        try:
-            yield skfd
-        finally:
-            iw.close(skfd)
-
-    def iw_get_ext(self, skfd, request, wrq=None):
-        if wrq is None:
-            wrq = iwlib.struct_iwreq()
-            wrq.ifr_ifrn.ifrn_name = (c_ubyte * 16)(*list(bytearray(self.interface.encode())))
-
-        try:
-            ret = fcntl.ioctl(skfd, request, wrq)
-            errno = 0
-        except OSError as error:
-            ret = -1
-            errno = error.errno
-        return ret, errno, wrq
-
-    def iw_set_ext(self, skfd, request):
-        return self.iw_get_ext(skfd, request)
+                info["bssid"] = ":".join([f"{part or 0:02x}" for part in wrq.u.ap_addr.sa_data[:6]])
+
+        return info
+
+    def scan_range(self):
+        """
+        Return the wireless extensions version and the frequency of each channel
+        the interface supports, remembering them so the range is only asked for
+        once per interface.
+        """
+        found = capabilities.lookup(self.interface, "iw_range")
+        if found is not None:
+            return found
+
+        rng = self.context.range_info()
+        if rng is None:
+            return None
+
+        freqs = {}
+        for freq in rng.freq[: rng.num_frequency]:
+            freqs[str(freq.i)] = freq.m * 10**freq.e
+
+        found = {"we_version": rng.we_version_compiled, "freqs": freqs}
+        capabilities.remember(self.interface, "iw_range", found)
+        return found
@@ -0,0 +1,321 @@
+from network_changer.errors import FailedToConnect, NetworkChangerException
+from network_changer.platforms.base import Changer
+from network_changer.known import KnownNetworks
+from network_changer.info import channel_to_freq
+from network_changer.progress import Progress
+
+import logging
+import asyncio
+import random
+import time
+
+
+class SimulatedProblem(NetworkChangerException):
+    pass
+
+
+def sample(value, rand):
+    """
+    Turn a configured delay or rate into a number.
+
+    ``value`` may be a number, a ``(low, high)`` tuple for a uniform
+    distribution or a callable that takes a ``random.Random`` instance.
+    """
+    if value is None:
+        return 0
+    if callable(value):
+        return value(rand)
+    if isinstance(value, tuple):
+        low, high = value
+        return rand.uniform(low, high)
+    return value
+
+
+class SimulatedAP:
+    def __init__(self, bssid, ssid, *, signal=-50, freq=2412):
+        self.ssid = ssid
+        self.freq = freq
+        self.bssid = bssid.lower()
+        self.signal = signal
+        self.base_signal = signal
+        self.last_seen = -1
+
+    def __repr__(self):
+        return f"<SimulatedAP {self.bssid} {self.ssid} {self.signal:.1f}dBm {self.freq}MHz>"
+
+
+class SimulatedWorld:
+    """
+    The radio environment shared by every Simulated changer created from it.
+
+    Delays are in seconds on the asyncio clock and accept anything :func:`sample`
+    understands. Failure rates are probabilities between 0 and 1.
+
+    aps
+        A list of :class:`SimulatedAP` objects, see also :meth:`populate`
+
+    interfaces
+        The names of the radios in this world
+
+    scan_latency, association_delay, dhcp_delay
+        How long a scan, association and address acquisition take
+
+    connect_failure_rate, scan_failure_rate, info_failure_rate
+        Chance of the respective operation failing
+
+    drift
+        Standard deviation in dBm per second of the random walk applied to the
+        signal of every AP. APs weaker than ``min_signal`` can't be seen and
+        connections to them are dropped
+
+    Changers in this world remember networks in ``known`` rather than the
+    index shared by the rest of the process.
+    """
+
+    def __init__(
+        self,
+        aps=None,
+        *,
+        interfaces=("sim0",),
+        scan_latency=(0.5, 2.0),
+        association_delay=(0.2, 1.0),
+        dhcp_delay=(0.1, 2.0),
+        connect_failure_rate=0,
+        scan_failure_rate=0,
+        info_failure_rate=0,
+        drift=0,
+        min_signal=-90,
+        seed=None,
+    ):
+        self.aps = list(aps or [])
+        self.interfaces = list(interfaces)
+        self.drift = drift
+        self.min_signal = min_signal
+        self.dhcp_delay = dhcp_delay
+        self.scan_latency = scan_latency
+        self.association_delay = association_delay
+
+        self.info_failure_rate = info_failure_rate
+        self.scan_failure_rate = scan_failure_rate
+        self.connect_failure_rate = connect_failure_rate
+
+        self.rand = random.Random(seed)
+        self.known = KnownNetworks()
+        self.leases = {}
+        self.connections = {}
+        self.injected = {}
+        self.watchers = {}
+        self.drifted_at = None
+
+    def populate(self, count, *, ssids=None, freqs=(2412, 2437, 2462, 5180, 5240)):
+        """Add ``count`` randomly generated access points to the world"""
+        for i in range(count):
+            octets = [self.rand.randint(0, 255) for _ in range(3)]
+            bssid = ":".join(f"{o:02x}" for o in [2, 0, 0, *octets])
+            ssid = ssids[i % len(ssids)] if ssids else f"sim-{i}"
+            self.aps.append(
+                SimulatedAP(
+                    bssid,
+                    ssid,
+                    signal=self.rand.uniform(-85, -35),
+                    freq=self.rand.choice(freqs),
+                )
+            )
+        return self
+
+    def watch(self, interface, callback):
+        """
+        Call ``callback()`` whenever ``interface`` joins or leaves an access
+        point. Returns an object with a ``close()`` method that stops this.
+        """
+        return SimulatedWatch(self, interface, callback)
+
+    def notify(self, interface):
+        for callback in list(self.watchers.get(interface, [])):
+            callback()
+
+    def join(self, interface, ap):
+        self.connections[interface] = ap
+        self.leases[interface] = f"10.0.{self.rand.randint(0, 255)}.{self.rand.randint(2, 254)}"
+        self.notify(interface)
+
+    def drop(self, interface):
+        """Lose the connection ``interface`` has, if it has one"""
+        self.leases.pop(interface, None)
+        if self.connections.pop(interface, None) is not None:
+            self.notify(interface)
+
+    def inject(self, operation, error):
+        """Make the next ``operation`` (connect, scan or info) raise ``error``"""
+        self.injected.setdefault(operation, []).append(error)
+
+    def maybe_fail(self, operation, rate, make_error):
+        injected = self.injected.get(operation)
+        if injected:
+            raise injected.pop(0)
+
+        if rate and self.rand.random() < rate:
+            raise make_error()
+
+    async def delay(self, value):
+        amount = sample(value, self.rand)
+        if amount > 0:
+            await asyncio.sleep(amount)
+
+    def apply_drift(self):
+        now = asyncio.get_event_loop().time()
+        if self.drifted_at is None:
+            self.drifted_at = now
+            return
+
+        elapsed = now - self.drifted_at
+        self.drifted_at = now
+        if not self.drift or elapsed <= 0:
+            return
+
+        sigma = self.drift * elapsed**0.5
+        for ap in self.aps:
+            ap.signal = max(-100, min(-20, ap.signal + self.rand.gauss(0, sigma)))
+
+        for interface in list(self.connections):
+            self.connected(interface)
+
+    def visible(self):
+        self.apply_drift()
+        return [ap for ap in self.aps if ap.signal >= self.min_signal]
+
+    def connected(self, interface):
+        ap = self.connections.get(interface)
+        if ap is not None and (ap not in self.aps or ap.signal < self.min_signal):
+            self.drop(interface)
+            ap = None
+        return ap
+
+
+class SimulatedWatch:
+    def __init__(self, world, interface, callback):
+        self.world = world
+        self.callback = callback
+        self.interface = interface
+        world.watchers.setdefault(interface, []).append(callback)
+
+    def close(self):
+        watchers = self.world.watchers.get(self.interface, [])
+        if self.callback in watchers:
+            watchers.remove(self.callback)
+
+
+class Simulated(Changer):
+    """
+    A changer that talks to a :class:`SimulatedWorld` instead of a radio.
+
+    Use :meth:`using` to make a class bound to a particular world that can be
+    given to ``network_changer.interface.changer(final_future, name, kls=...)``.
+    Without one, a world with a handful of random access points is made.
+    """
+
+    world = None
+    min_scan_interval = 0
+    lock_across_processes = False
+
+    @classmethod
+    def using(kls, world):
+        return type(kls.__name__, (kls,), {"world": world})
+
+    @classmethod
+    async def discover(kls, final_future):
+        if kls.world is None:
+            return ["sim0"]
+        return list(kls.world.interfaces)
+
+    def setup(self):
+        self.name = self.name or "sim0"
+        if self.world is None:
+            self.world = SimulatedWorld().populate(5)
+        self.known = self.world.known
+
+    async def do_connect(self, ssid, *, check_connected, progress=None, bssid=None, freq=None):
+        await self.do_disconnect(progress=progress)
+
+        world = self.world
+        candidates = [ap for ap in world.visible() if ap.ssid == ssid]
+        if bssid is not None:
+            candidates = [ap for ap in candidates if ap.bssid == bssid]
+        if freq is not None:
+            candidates = [ap for ap in candidates if ap.freq == freq]
+
+        # Without a bssid the radio has to scan before it can associate
+        if bssid is None:
+            await world.delay(world.scan_latency)
+
+        await world.delay(world.association_delay)
+        world.maybe_fail(
+            "connect",
+            world.connect_failure_rate,
+            lambda: FailedToConnect(
+                ssid, self.name, self.__class__, error="Simulated association failure"
+            ),
+        )
+
+        if not candidates:
+            raise FailedToConnect(ssid, self.name, self.__class__, error="No such network")
+
+        ap = max(candidates, key=lambda ap: ap.signal)
+        Progress.add_to_progress(
+            progress, logging.INFO, f"Associated {self.interface} -> {ap.ssid} ({ap.bssid})"
+        )
+
+        await world.delay(world.dhcp_delay)
+        world.join(self.interface, ap)
+
+    async def do_disconnect(self, progress=None):
+        self.world.drop(self.interface)
+
+    def listen_for_changes(self, changed, stopped):
+        return self.world.watch(self.interface, changed)
+
+    def addresses(self):
+        if self.world.connected(self.interface) is None:
+            return []
+        return [self.world.leases[self.interface]]
+
+    async def do_scan(self, request_scan=True, progress=None, channels=None):
+        world = self.world
+        if request_scan:
+            await world.delay(world.scan_latency)
+
+        world.maybe_fail(
+            "scan", world.scan_failure_rate, lambda: SimulatedProblem("Simulated scan failure")
+        )
+
+        results = []
+        now = time.time()
+        freqs = None
+        if channels is not None:
+            freqs = [channel_to_freq(channel) for channel in channels]
+
+        for ap in world.visible():
+            if freqs is not None and ap.freq not in freqs:
+                continue
+
+            if request_scan:
+                ap.last_seen = now
+            elif ap.last_seen == -1:
+                continue
+            results.append(
+                {"bssid": ap.bssid, "ssid": ap.ssid, "last_seen": ap.last_seen, "freq": ap.freq}
+            )
+
+        return results
+
+    async def do_info(self, progress=None, fields=None):
+        world = self.world
+        world.maybe_fail(
+            "info", world.info_failure_rate, lambda: SimulatedProblem("Simulated info failure")
+        )
+
+        world.apply_drift()
+        ap = world.connected(self.interface)
+        if ap is None:
+            return {"bssid": "", "ssid": ""}
+        return {"bssid": ap.bssid, "ssid": ap.ssid, "freq": ap.freq}
@@ -0,0 +1,95 @@
+"""
+Pure python versions of the libiw functions the IW platform used to call.
+
+These understand the wireless extensions event stream from version 19, which
+is what every kernel since 2.6.19 produces.
+"""
+
+import socket
+import struct
+import math
+
+SIOCGIWAP = 0x8B15
+SIOCGIWFREQ = 0x8B05
+SIOCGIWESSID = 0x8B1B
+SIOCGIWENCODE = 0x8B2B
+IWEVGENIE = 0x8C05
+IWEVCUSTOM = 0x8C02
+
+IW_ESSID_MAX_SIZE = 32
+
+# Events that carry a variable amount of data after an iw_point
+POINT_EVENTS = (SIOCGIWESSID, SIOCGIWENCODE, IWEVGENIE, IWEVCUSTOM)
+
+EVENT = struct.Struct("=HH")
+POINT = struct.Struct("=HH")
+FREQ = struct.Struct("=ihBB")
+
+
+def open_socket():
+    """Return a socket that wireless extensions ioctls can be made on"""
+    error = None
+    for family in (socket.AF_INET, socket.AF_INET6, socket.AF_UNIX):
+        try:
+            return socket.socket(family, socket.SOCK_DGRAM)
+        except OSError as e:
+            error = e
+    raise error
+
+
+def float_to_freq(value, freq):
+    """Fill in the iw_freq ``freq`` from ``value`` the same way as iw_float2freq"""
+    exponent = int(math.floor(math.log10(value))) if value > 0 else 0
+    if exponent > 8:
+        freq.m = int(value // 10 ** (exponent - 6)) * 100
+        freq.e = exponent - 8
+    else:
+        freq.m = int(value)
+        freq.e = 0
+
+
+def freq_to_float(m, e):
+    return m * 10**e
+
+
+def events(data):
+    """
+    Yield ``(cmd, payload)`` for each event in the ``data`` from SIOCGIWSCAN.
+
+    For events that point at extra data, like the essid, payload is that data.
+    """
+    offset = 0
+    while offset + EVENT.size <= len(data):
+        length, cmd = EVENT.unpack_from(data, offset)
+        if length <= EVENT.size or offset + length > len(data):
+            break
+
+        payload = data[offset + EVENT.size : offset + length]
+        offset += length
+
+        if cmd in POINT_EVENTS:
+            if len(payload) < POINT.size:
+                continue
+            size, _ = POINT.unpack_from(payload)
+            payload = payload[POINT.size : POINT.size + size]
+
+        yield cmd, payload
+
+
+def parse_bssid(payload):
+    """Return the bssid from the sockaddr in a SIOCGIWAP event, or an empty string"""
+    octets = payload[2:8]
+    if len(octets) < 6 or not any(octets):
+        return ""
+    return ":".join(f"{part:02x}" for part in octets)
+
+
+def parse_freq(payload):
+    """
+    Return the frequency in Hz, or the channel number, from a SIOCGIWFREQ event,
+    or None if the event is too short
+    """
+    if len(payload) < FREQ.size:
+        return None
+    m, e, _, _ = FREQ.unpack_from(payload)
+    return freq_to_float(m, e)
@@ -0,0 +1,140 @@
+from network_changer.interface import changer, platform_kls
+from network_changer import async_helpers as hp
+from network_changer.info import ScanInfo
+
+import asyncio
+
+
+class ChangerPool:
+    """
+    Owns a Changer for each wireless interface, all sharing one
+    ``final_future``, and runs operations across them at the same time.
+
+    .. code-block:: python
+
+        from network_changer.pool import ChangerPool
+
+
+        pool = ChangerPool(final_future, limit=4, timeout=60)
+        await pool.discover()
+
+        results, errors = await pool.connect("my-network")
+        results, errors = await pool.info()
+
+    kls
+        The platform to use. By default it's chosen the same way as
+        ``network_changer.changer``
+
+    names
+        The interfaces to use. By default all wireless interfaces the platform
+        can find are used
+
+    limit
+        The most interfaces to operate on at once. By default there is no limit
+
+    timeout
+        Seconds before an operation on an interface is abandoned
+
+    Every operation returns ``(results, errors)`` which are dictionaries of
+    ``{interface: value}``. A failure or timeout on one interface is put in
+    ``errors`` and doesn't affect the others.
+    """
+
+    def __init__(self, final_future, *, kls=None, names=None, limit=None, timeout=None):
+        self.kls = kls
+        self.names = names
+        self.limit = limit
+        self.timeout = timeout
+        self.final_future = final_future
+
+        self.changers = {}
+
+    async def discover(self):
+        kls = self.kls or platform_kls()
+
+        names = self.names
+        if names is None:
+            names = await kls.discover(self.final_future)
+
+        for name in names:
+            if name not in self.changers:
+                self.changers[name] = changer(self.final_future, name, kls=kls)
+
+        return self.changers
+
+    async def run(self, action, *, timeout=None):
+        """
+        Call ``await action(name, changer)`` for each changer and return
+        ``(results, errors)``
+        """
+        if not self.changers:
+            await self.discover()
+
+        if timeout is None:
+            timeout = self.timeout
+
+        results = {}
+        errors = {}
+
+        async def run_one(name, ch):
+            try:
+                coro = action(name, ch)
+                if timeout is not None:
+                    coro = asyncio.wait_for(coro, timeout)
+                results[name] = await coro
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                errors[name] = error
+
+        async with hp.TaskHolder(
+            self.final_future, name="ChangerPool::run", limit=self.limit
+        ) as ts:
+            for name, ch in list(self.changers.items()):
+                await ts.add_bounded(run_one(name, ch), silent=True)
+
+        return results, errors
+
+    async def info(self, progress=None, timeout=None):
+        return await self.run(lambda name, ch: ch.info(progress=progress), timeout=timeout)
+
+    async def scan(self, request_scan=True, progress=None, timeout=None):
+        return await self.run(
+            lambda name, ch: ch.scan(request_scan=request_scan, progress=progress),
+            timeout=timeout,
+        )
+
+    async def scan_all(self, request_scan=True, progress=None, timeout=None):
+        """
+        Scan on every interface at the same time and return
+        ``(ScanInfo, errors)`` where the ScanInfo has one entry per bssid from
+        all the scans. See ``ScanInfo.merge``.
+        """
+        results, errors = await self.scan(
+            request_scan=request_scan, progress=progress, timeout=timeout
+        )
+        return ScanInfo.merge(results), errors
+
+    async def disconnect(self, progress=None, timeout=None):
+        return await self.run(lambda name, ch: ch.disconnect(progress=progress), timeout=timeout)
+
+    async def connect(self, ssid, *, timeout=None, **kwargs):
+        """
+        Connect every interface to ``ssid``. This may also be a dictionary of
+        ``{interface: ssid}`` in which case interfaces not in it are left alone.
+
+        ``kwargs`` are passed into each ``Changer.connect``, as is ``timeout``
+        if it is specified.
+        """
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        async def connect(name, ch):
+            target = ssid
+            if isinstance(ssid, dict):
+                if name not in ssid:
+                    return
+                target = ssid[name]
+            return await ch.connect(target, **kwargs)
+
+        return await self.run(connect, timeout=timeout)
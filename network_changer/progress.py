@@ -40,6 +40,38 @@ class Progress:
             progress, logging.WARNING, "Didn't find any wifi networks", stack_level=stack_level
         )
 
+    @classmethod
+    def attempt_finished(kls, progress, attempt, took, stack_level=0):
+        kls.add_to_progress(
+            progress,
+            logging.DEBUG,
+            "Attempt finished",
+            stack_level=stack_level + 1,
+            attempt=attempt,
+            took=round(took, 3),
+        )
+
+    @classmethod
+    def outage_started(kls, progress, ssid, stack_level=0):
+        kls.add_to_progress(
+            progress,
+            logging.WARNING,
+            "Lost connection to the network",
+            stack_level=stack_level + 1,
+            ssid=ssid,
+        )
+
+    @classmethod
+    def outage_finished(kls, progress, ssid, took, stack_level=0):
+        kls.add_to_progress(
+            progress,
+            logging.INFO,
+            "Reconnected to the network",
+            stack_level=stack_level + 1,
+            ssid=ssid,
+            outage=round(took, 3),
+        )
+
     @classmethod
     def add_to_progress(self, progress, level, msg=None, stack_level=0, at=None, **kwargs):
         if at is None:
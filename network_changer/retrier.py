@@ -3,10 +3,101 @@ from network_changer.progress import Progress
 
 import logging
 import asyncio
-import time
+import random
 import sys
 
 
+class RetryPolicy:
+    """
+    Decides how long :class:`ConnectionRetrier` waits between attempts.
+
+    budget_aware
+        When True, an attempt isn't started if the time remaining is less than
+        ``expected_attempt`` or, if that isn't specified, the average time
+        attempts have taken so far.
+    """
+
+    def __init__(self, *, budget_aware=True, expected_attempt=None):
+        self.budget_aware = budget_aware
+        self.expected_attempt = expected_attempt
+
+    def should_start(self, remaining, durations):
+        if not self.budget_aware:
+            return True
+
+        expected = self.expected_attempt
+        if expected is None:
+            if not durations:
+                return True
+            expected = sum(durations) / len(durations)
+
+        return remaining >= expected
+
+    def wait_after(self, attempt, elapsed, took):
+        """
+        Return how long to wait before the next attempt, given the number of
+        attempts so far, seconds since the retries started and how long the last
+        attempt took.
+        """
+        raise NotImplementedError()
+
+
+class Phased(RetryPolicy):
+    """
+    Start attempts every ``step`` seconds for each ``(step, end)`` in
+    ``timeouts`` until ``end`` seconds have passed. The last step continues
+    until the retries time out.
+
+    An attempt that takes longer than the step is followed by one attempt
+    straight away rather than several bunched together.
+
+    Unlike the other policies this isn't ``budget_aware`` unless asked to be,
+    so attempts keep starting until the retries time out.
+    """
+
+    def __init__(self, timeouts, *, budget_aware=False, **kwargs):
+        super().__init__(budget_aware=budget_aware, **kwargs)
+        self.timeouts = list(timeouts)
+
+    def wait_after(self, attempt, elapsed, took):
+        step = 0
+        for step, end in self.timeouts:
+            if not end or elapsed <= end:
+                break
+        return max([step - took, 0])
+
+
+class ExponentialBackoff(RetryPolicy):
+    """
+    Wait ``initial * factor ** (attempt - 1)`` seconds between attempts, up to
+    ``maximum``, give or take ``jitter`` as a fraction of the wait.
+    """
+
+    def __init__(self, initial=1, *, factor=2, maximum=30, jitter=0.1, seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.factor = factor
+        self.jitter = jitter
+        self.initial = initial
+        self.maximum = maximum
+        self.rand = random.Random(seed)
+
+    def wait_after(self, attempt, elapsed, took):
+        wait = min([self.maximum, self.initial * self.factor ** (attempt - 1)])
+        if self.jitter:
+            wait *= 1 + self.rand.uniform(-self.jitter, self.jitter)
+        return max([wait, 0])
+
+
+class Once(RetryPolicy):
+    """Make one attempt and don't retry"""
+
+    def should_start(self, remaining, durations):
+        return False
+
+    def wait_after(self, attempt, elapsed, took):
+        return 0
+
+
 class ConnectionRetrier:
     @classmethod
     def create(self, retrier, name=None):
@@ -15,54 +106,105 @@ class ConnectionRetrier:
 
         if isinstance(retrier, list):
             return ConnectionRetrier(timeouts=retrier, name=name)
+        elif isinstance(retrier, RetryPolicy):
+            return ConnectionRetrier(policy=retrier, name=name)
         else:
             return retrier
 
-    def __init__(self, *, timeouts, name=None):
+    def __init__(self, *, timeouts=None, policy=None, name=None, wheel=True):
         self.name = name
+        self.wheel = wheel
         self.timeouts = timeouts
 
-        self.timeout = None
-        self.timeout_item = None
+        if policy is None:
+            policy = Phased(timeouts)
+        self.policy = policy
+
+        self.durations = []
+        self._woken = None
+        self._wake_pending = False
+
+    def wake(self):
+        """Make the next attempt start straight away"""
+        if self._woken is not None and not self._woken.done():
+            self._woken.set_result(True)
+        else:
+            self._wake_pending = True
+
+    def _call_later(self, delay, callback):
+        if not self.wheel:
+            return asyncio.get_event_loop().call_later(delay, callback)
+
+        wheel = self.wheel
+        if wheel is True:
+            wheel = hp.timer_wheel()
+        return wheel.call_later(delay, callback)
+
+    async def _wait(self, scope, wait):
+        if self._wake_pending:
+            self._wake_pending = False
+            return
+
+        self._woken = hp.create_future(name=("ConnectionRetrier({})::_wait[woken]", self.name))
+
+        def woken():
+            if not self._woken.done():
+                self._woken.set_result(True)
+
+        handle = self._call_later(wait, woken)
+        try:
+            await hp.wait_for_first_future(
+                scope, self._woken, name=("ConnectionRetrier({})::_wait", self.name)
+            )
+        finally:
+            handle.cancel()
+            self._woken.cancel()
+            self._woken = None
 
     async def retry(self, determine, final_future, timeout, min_wait=0.1, progress=None):
-        timeouts = list(self.timeouts)
-        step, end = timeouts.pop(0)
-        ticker = hp.ATicker(
-            every=step,
-            final_future=final_future,
-            max_time=timeout,
-            min_wait=min_wait,
-            name=f"ConnectionRetrier({self.name})::tick[ticker]",
-        )
-
-        start = time.time()
-        final_time = time.time() + timeout
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        final_time = start + timeout
+
+        durations = self.durations = []
+        self._wake_pending = False
 
         error = None
+        attempt = 0
+        nxt = 0
+
+        with hp.CancelScope(
+            final_future,
+            name=("ConnectionRetrier({})::retry[final_future]", self.name),
+            deadline=final_time,
+        ) as scope:
+            while not scope.done():
+                now = loop.time()
+                remaining = final_time - now
+                if remaining <= 0 or (
+                    attempt and not self.policy.should_start(remaining, durations)
+                ):
+                    break
 
-        async with ticker as ticks:
-            async for _, nxt in ticks:
                 if error is not None:
                     Progress.add_to_progress(progress, logging.ERROR, "Failure", error=error)
                     error = None
 
-                now = time.time()
-
-                if end and now - start > end:
-                    if timeouts:
-                        step, end = timeouts.pop(0)
-                        ticker.change_after(step)
-                    else:
-                        end = None
-
+                attempt += 1
                 try:
-                    return await determine(round(final_time - now, 3), nxt)
+                    return await determine(round(remaining, 3), nxt)
                 except (KeyboardInterrupt, asyncio.CancelledError):
                     raise
                 except:
                     exc_info = sys.exc_info()
                     error = exc_info[1]
+                finally:
+                    took = loop.time() - now
+                    durations.append(took)
+                    Progress.attempt_finished(progress, attempt, took)
+
+                nxt = max([min_wait, self.policy.wait_after(attempt, loop.time() - start, took)])
+                await self._wait(scope, nxt)
 
         if error:
             raise error
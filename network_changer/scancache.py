@@ -0,0 +1,166 @@
+from network_changer.files import open_ours
+from network_changer.info import ScanInfo
+
+from types import ModuleType
+from typing import Optional
+from pathlib import Path
+import tempfile
+import logging
+import struct
+import json
+import mmap
+import time
+import os
+
+fcntl: Optional[ModuleType]
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger("network_changer.scancache")
+
+# sequence, when the scan finished, length of the data
+HEADER = struct.Struct("=QdI")
+
+
+def enabled():
+    return bool(os.environ.get("NETWORK_CHANGER_SHARE_SCANS"))
+
+
+def segment_path(interface):
+    """Return where the segment for ``interface`` lives, in /dev/shm if we can"""
+    folder = Path("/dev/shm")
+    if not folder.is_dir():
+        folder = Path(tempfile.gettempdir())
+    return folder / f"network_changer-scan-{interface}"
+
+
+class SharedScanCache:
+    """
+    The latest scan of ``interface`` shared between every process on the
+    machine that has ``NETWORK_CHANGER_SHARE_SCANS`` set, so a process can use
+    a scan another one just paid for.
+
+    .. code-block:: python
+
+        cache = SharedScanCache("wlan0")
+        cache.publish(found, channels=None)
+        found = cache.latest(within=5, channels=[1, 6, 11])
+
+    The scan is kept as json in a memory mapped file of ``size`` bytes with a
+    seqlock in front of it. Writers take a lock on the file between them and
+    make the sequence odd while they write. Readers don't lock, they copy the
+    data and try again if the sequence was odd or changed while they did.
+
+    A segment that isn't ours (see :func:`network_changer.files.open_ours`)
+    is ignored, so scans are only shared between processes of the same user.
+    """
+
+    def __init__(self, interface, *, size=256 * 1024, path=None):
+        self.size = size
+        self.interface = interface
+        self.path = path or segment_path(interface)
+
+        self.fd = None
+        self.map = None
+
+    def open(self):
+        if self.map is not None:
+            return True
+
+        try:
+            self.fd = open_ours(self.path, 0o644)
+            if os.fstat(self.fd).st_size < self.size:
+                os.ftruncate(self.fd, self.size)
+            self.map = mmap.mmap(self.fd, self.size)
+        except OSError as error:
+            log.debug(f"Failed to open the shared scan cache at {self.path}: {error}")
+            self.close()
+            return False
+
+        return True
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def read(self, tries=100):
+        """Return ``(at, data)`` for what's in the segment, or None"""
+        if not self.open():
+            return None
+
+        for _ in range(tries):
+            sequence, at, length = HEADER.unpack_from(self.map)
+            if sequence & 1 or HEADER.size + length > self.size:
+                time.sleep(0)
+                continue
+
+            data = self.map[HEADER.size : HEADER.size + length]
+            if HEADER.unpack_from(self.map)[0] == sequence:
+                return (at, data) if sequence else None
+
+        return None
+
+    def latest(self, within, channels=None):
+        """
+        Return a ScanInfo of the shared scan if it finished in the last
+        ``within`` seconds and covered ``channels``, otherwise None
+        """
+        found = self.read()
+        if found is None:
+            return None
+
+        at, data = found
+        if time.time() - at > within:
+            return None
+
+        try:
+            data = json.loads(data)
+        except ValueError:
+            return None
+
+        plan = data.get("channels")
+        if plan is not None and (channels is None or not set(channels) <= set(plan)):
+            return None
+
+        return ScanInfo.create(data.get("networks") or [])
+
+    def publish(self, found, channels=None):
+        """Share the networks ``found`` by a scan of ``channels``"""
+        if not self.open():
+            return
+
+        networks = [
+            {
+                "bssid": network.bssid,
+                "ssid": network.ssid,
+                "last_seen": network.last_seen,
+                "freq": network.freq,
+            }
+            for network in found
+        ]
+        data = json.dumps({"channels": channels, "networks": networks}).encode()
+        if HEADER.size + len(data) > self.size:
+            log.debug(f"Scan of {self.interface} is too big to share ({len(data)} bytes)")
+            return
+
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            (sequence,) = struct.unpack_from("=Q", self.map)
+            if sequence & 1:
+                # A writer died half way through
+                sequence += 1
+
+            struct.pack_into("=Q", self.map, 0, sequence + 1)
+            self.map[HEADER.size : HEADER.size + len(data)] = data
+            struct.pack_into("=dI", self.map, 8, time.time(), len(data))
+            struct.pack_into("=Q", self.map, 0, sequence + 2)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
@@ -0,0 +1,213 @@
+from network_changer.info import ScanInfo, freq_to_channel
+from network_changer import async_helpers as hp
+from network_changer.progress import Progress
+
+import asyncio
+import sys
+
+
+def covers(plan, wanted):
+    """
+    Return whether a scan of the channels in ``plan`` answers a request for
+    ``wanted``. A plan of None is a scan of every channel.
+    """
+    if plan is None:
+        return True
+    if wanted is None:
+        return False
+    return wanted <= plan
+
+
+def merge(plan, wanted):
+    if plan is None or wanted is None:
+        return None
+    return plan | wanted
+
+
+def narrow(found, wanted):
+    """
+    Return the networks in ``found`` on the ``wanted`` channels, keeping those
+    we don't know the frequency of
+    """
+    return ScanInfo(
+        [
+            network
+            for network in ScanInfo.create(found)
+            if not network.freq or freq_to_channel(network.freq)[0] in wanted
+        ]
+    )
+
+
+class ScanScheduler:
+    """
+    Runs the hardware scans for one interface.
+
+    Drivers and NetworkManager don't like scans being started back to back, so
+    requests go through this which:
+
+    * Gives a request the result of the scan in progress if that scan covers
+      the channels that were asked for
+    * Otherwise adds the request to the one queued scan, widening it's channels
+      as necessary. A request only gets back the networks on the channels it
+      asked for, even if the scan that answered it was wider
+    * Doesn't start a scan until ``min_interval`` seconds after the last one
+      finished
+
+    ``run(channels, progress)`` is what actually scans. ``channels`` is None
+    for every channel or a sorted list of channel numbers.
+    """
+
+    def __init__(self, run, *, min_interval=1, name=None):
+        self.run = run
+        self.name = name
+        self.min_interval = min_interval
+
+        self.worker = None
+        self.queued = None
+        self.running = None
+        self.last_finished = None
+
+    async def scan(self, channels=None, progress=None):
+        wanted = None if channels is None else frozenset(channels)
+
+        if self.running is not None and covers(self.running[0], wanted):
+            fut = self.running[1]
+        elif self.queued is not None:
+            self.queued[0] = merge(self.queued[0], wanted)
+            fut = self.queued[1]
+        else:
+            fut = hp.create_future(name=("ScanScheduler({})::scan[result]", self.name))
+            self.queued = [wanted, fut, progress]
+            if self.worker is None:
+                self.worker = hp.async_as_background(self._work(), silent=True)
+
+        plan, result = await asyncio.shield(fut)
+        if wanted is not None and plan != wanted:
+            result = narrow(result, wanted)
+        return result
+
+    async def _work(self):
+        loop = asyncio.get_event_loop()
+        try:
+            while self.queued is not None:
+                if self.last_finished is not None:
+                    wait = self.last_finished + self.min_interval - loop.time()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+
+                plan, fut, progress = self.queued
+                self.queued = None
+                self.running = (plan, fut)
+
+                try:
+                    result = await self.run(None if plan is None else sorted(plan), progress)
+                except asyncio.CancelledError:
+                    fut.cancel()
+                    raise
+                except Exception as error:
+                    if not fut.done():
+                        fut.set_exception(error)
+                else:
+                    if not fut.done():
+                        fut.set_result((plan, result))
+                finally:
+                    self.running = None
+                    self.last_finished = loop.time()
+        finally:
+            if self.queued is not None:
+                self.queued[1].cancel()
+                self.queued = None
+            self.worker = None
+
+
+class BackgroundScanner:
+    """
+    Scans an interface every ``every`` seconds while it's idle so that
+    ``changer.recently_seen()`` knows about networks before we want to join
+    them.
+
+    channels
+        Only scan these channels, for example the ones the networks we care
+        about are on. By default every channel is scanned
+
+    maximum
+        While a connect or disconnect is in progress the scan is put off, for
+        twice as long each time, up to ``maximum`` seconds. Defaults to four
+        times ``every``
+
+    A scan isn't started if anything else has scanned the interface in the
+    last ``every`` seconds.
+    """
+
+    def __init__(self, changer, *, every=30, channels=None, maximum=None, progress=None):
+        self.every = every
+        self.changer = changer
+        self.channels = channels
+        self.progress = progress
+        self.maximum = every * 4 if maximum is None else maximum
+
+        self.final_future = hp.CancelScope(
+            changer.final_future, name=("BackgroundScanner({})::final_future", changer.name)
+        )
+
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = hp.async_as_background(self.run())
+        return self
+
+    async def stop(self):
+        self.final_future.cancel()
+        if self.task is not None:
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def sleep(self, amount):
+        slept = hp.create_future(name=("BackgroundScanner({})::sleep", self.changer.name))
+
+        def done():
+            if not slept.done():
+                slept.set_result(True)
+
+        handle = hp.timer_wheel().call_later(amount, done)
+        try:
+            await hp.wait_for_first_future(
+                self.final_future,
+                slept,
+                name=("BackgroundScanner({})::sleep[wait]", self.changer.name),
+            )
+        finally:
+            handle.cancel()
+            slept.cancel()
+
+    async def run(self):
+        wait = 0
+        loop = asyncio.get_event_loop()
+
+        while not self.final_future.done():
+            if wait > 0:
+                await self.sleep(wait)
+                if self.final_future.done():
+                    break
+
+            if self.changer.busy:
+                wait = min([self.maximum, max([wait, self.every / 2]) * 2])
+                continue
+
+            scanned_at = self.changer.scanned_at
+            if scanned_at is not None and loop.time() - scanned_at < self.every:
+                wait = self.every - (loop.time() - scanned_at)
+                continue
+
+            try:
+                await self.changer.scan(channels=self.channels, progress=self.progress)
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                raise
+            except:
+                exc_info = sys.exc_info()
+                Progress.no_scan(self.progress, exc_info[1])
+
+            wait = self.every
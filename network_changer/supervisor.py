@@ -0,0 +1,199 @@
+from network_changer.retrier import ExponentialBackoff, Once
+from network_changer.errors import FailedToConnect
+from network_changer import async_helpers as hp
+from network_changer.progress import Progress
+from network_changer import netlink
+
+import asyncio
+import logging
+import sys
+
+log = logging.getLogger("network_changer.supervisor")
+
+
+class Supervisor:
+    """
+    Keeps a Changer connected to ``ssid``, and to ``bssid`` if that is given.
+
+    .. code-block:: python
+
+        supervisor = changer.supervise("my-network", progress=progress)
+        ...
+        await supervisor.stop()
+
+    The link is watched with netlink where that's available and checked every
+    ``poll`` seconds regardless. When the connection is lost we reconnect
+    straight away, only scanning every channel first if the network isn't in
+    ``changer.recently_seen()`` or ``changer.known``. Failed reconnects are retried with
+    ``retrier``, which defaults to exponential backoff up to 10 seconds, and
+    each attempt is given ``attempt_timeout`` seconds.
+
+    Once the network has been joined, the start and end of every outage is
+    reported to ``progress`` and the duration of each outage is added to
+    ``outages``.
+    """
+
+    def __init__(
+        self, changer, ssid, *, bssid=None, retrier=None, poll=10, attempt_timeout=30, progress=None
+    ):
+        self.ssid = ssid
+        self.poll = poll
+        self.bssid = bssid
+        self.changer = changer
+        self.progress = progress
+        self.attempt_timeout = attempt_timeout
+
+        if retrier is None:
+            retrier = ExponentialBackoff(0.5, maximum=10, budget_aware=False)
+        self.retrier = retrier
+
+        self.final_future = hp.CancelScope(
+            changer.final_future, name=("Supervisor({})::final_future", ssid)
+        )
+
+        self.task = None
+        self.outages = []
+        self.lost_at = None
+        self.established = False
+        self._changed = None
+
+    def start(self):
+        if self.task is None:
+            self.task = hp.async_as_background(self.run())
+        return self
+
+    async def stop(self):
+        self.final_future.cancel()
+        if self.task is not None:
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        try:
+            interface = await self.changer.resolve_interface()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            raise
+        except:
+            exc_info = sys.exc_info()
+            log.debug(f"Couldn't find the interface to watch, polling instead: {exc_info[1]}")
+            interface = None
+
+        listener = None
+        if interface is not None:
+            listener = netlink.link_listener(interface, self.link_changed)
+
+        try:
+            while not self.final_future.done():
+                if await self.connected():
+                    self.restored()
+                    if await self.wait_for_change() is None:
+                        # Nothing told us about a change, so don't trust a cached answer
+                        self.changer.forget_info()
+                    continue
+
+                self.lost()
+                try:
+                    await self.changer.retry(
+                        self.retrier,
+                        "supervise",
+                        self.reconnect,
+                        self.final_future,
+                        3600,
+                        progress=self.progress,
+                    )
+                except (KeyboardInterrupt, asyncio.CancelledError):
+                    raise
+                except:
+                    exc_info = sys.exc_info()
+                    Progress.no_connect(self.progress, exc_info[1])
+        finally:
+            if listener is not None:
+                listener.close()
+
+    def link_changed(self, up):
+        self.changer.forget_info()
+        if up:
+            self.changer.wake()
+
+        if self._changed is not None and not self._changed.done():
+            self._changed.set_result(up)
+
+    async def wait_for_change(self):
+        """Return whether the link is up if it changed, or None if we timed out"""
+        self._changed = hp.create_future(name=("Supervisor({})::wait_for_change", self.ssid))
+
+        def poll():
+            if not self._changed.done():
+                self._changed.set_result(None)
+
+        handle = hp.timer_wheel().call_later(self.poll, poll)
+        try:
+            await hp.wait_for_first_future(
+                self.final_future,
+                self._changed,
+                name=("Supervisor({})::wait_for_change[wait]", self.ssid),
+            )
+            if self._changed.done() and not self._changed.cancelled():
+                return self._changed.result()
+        finally:
+            handle.cancel()
+            self._changed.cancel()
+            self._changed = None
+
+    async def connected(self):
+        return await self.changer.check_connected(
+            self.ssid, bssid=self.bssid, progress=self.progress
+        )
+
+    def candidates(self, found):
+        """Return the networks in ``found`` we want, most recently seen first"""
+        want = []
+        for network in found:
+            if network.ssid != self.ssid:
+                continue
+            if self.bssid is not None and network.bssid != self.bssid:
+                continue
+            want.append(network)
+        return sorted(want, key=lambda network: network.last_seen, reverse=True)
+
+    async def reconnect(self, *args):
+        seen = self.candidates(self.changer.recently_seen(self.ssid))
+        if not seen and not self.changer.known.best(self.ssid):
+            # connect() pins to an access point we've seen, so give it something to see
+            await self.changer.scan(progress=self.progress)
+
+        Progress.add_to_progress(self.progress, logging.DEBUG, "Reconnecting", ssid=self.ssid)
+
+        await self.changer.connect(
+            self.ssid,
+            timeout=self.attempt_timeout,
+            progress=self.progress,
+            bssid=self.bssid,
+            check_before=False,
+            check_after=False,
+            retrier=Once(),
+        )
+
+        if not await self.connected():
+            raise FailedToConnect(
+                self.ssid,
+                self.changer.name,
+                self.changer.__class__,
+                error="Not connected after reconnecting",
+            )
+        return True
+
+    def lost(self):
+        if self.established and self.lost_at is None:
+            self.lost_at = asyncio.get_event_loop().time()
+            Progress.outage_started(self.progress, self.ssid)
+
+    def restored(self):
+        self.established = True
+        if self.lost_at is not None:
+            took = asyncio.get_event_loop().time() - self.lost_at
+            self.lost_at = None
+            self.outages.append(took)
+            Progress.outage_finished(self.progress, self.ssid, took)
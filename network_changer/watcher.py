@@ -0,0 +1,293 @@
+from network_changer import async_helpers as hp
+
+from typing import ClassVar, Optional
+import collections
+import asyncio
+import logging
+import sys
+
+log = logging.getLogger("network_changer.watcher")
+
+
+class StateEvent:
+    kind: ClassVar[Optional[str]] = None
+
+    def __init__(self, interface):
+        self.interface = interface
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.interface}>"
+
+
+class Associated(StateEvent):
+    """The interface joined the access point ``bssid`` on ``ssid``"""
+
+    kind = "associated"
+
+    def __init__(self, interface, ssid, bssid):
+        super().__init__(interface)
+        self.ssid = ssid
+        self.bssid = bssid
+
+    def __repr__(self):
+        return f"<Associated {self.interface} -> {self.ssid} ({self.bssid})>"
+
+
+class Disassociated(StateEvent):
+    """The interface left the access point ``bssid`` on ``ssid``"""
+
+    kind = "disassociated"
+
+    def __init__(self, interface, ssid, bssid):
+        super().__init__(interface)
+        self.ssid = ssid
+        self.bssid = bssid
+
+    def __repr__(self):
+        return f"<Disassociated {self.interface} -x {self.ssid} ({self.bssid})>"
+
+
+class IPAcquired(StateEvent):
+    """The interface has a new IPv4 ``address``"""
+
+    kind = "ip_acquired"
+
+    def __init__(self, interface, address):
+        super().__init__(interface)
+        self.address = address
+
+    def __repr__(self):
+        return f"<IPAcquired {self.interface} {self.address}>"
+
+
+class ScanDone(StateEvent):
+    """A scan of the interface finished and found ``networks``"""
+
+    kind = "scan_done"
+
+    def __init__(self, interface, networks):
+        super().__init__(interface)
+        self.networks = networks
+
+    def __repr__(self):
+        return f"<ScanDone {self.interface} {len(list(self.networks))} networks>"
+
+
+class Subscription:
+    """
+    An async iterator of the events from a :class:`StateWatcher`. Iteration
+    stops when the subscription is closed or the changer is finished.
+
+    Only the most recent ``keep`` events are kept for a consumer that falls
+    behind.
+    """
+
+    def __init__(self, watcher, keep=100):
+        self.watcher = watcher
+        self.events = collections.deque(maxlen=keep)
+        self.waiter = None
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self.events:
+            if self.closed or self.watcher.changer.final_future.done():
+                raise StopAsyncIteration
+
+            self.waiter = hp.create_future(name=("Subscription({})::waiter", self.watcher.name))
+            try:
+                await hp.wait_for_first_future(
+                    self.waiter,
+                    self.watcher.changer.final_future,
+                    name=("Subscription({})::__anext__", self.watcher.name),
+                )
+            finally:
+                self.waiter.cancel()
+                self.waiter = None
+
+        return self.events.popleft()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_typ, exc, tb):
+        self.close()
+
+    def add(self, event):
+        self.events.append(event)
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(True)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.watcher.unsubscribe(self)
+            if self.waiter is not None and not self.waiter.done():
+                self.waiter.set_result(True)
+
+
+class StateWatcher:
+    """
+    Turns what a changer knows about it's interface into events for any number
+    of :class:`Subscription` objects, which is what ``changer.watch()`` returns.
+
+    .. code-block:: python
+
+        async with changer.watch() as events:
+            async for event in events:
+                if event.kind == "associated":
+                    ...
+
+    All the subscriptions share one of these per changer, and so one
+    subscription to the backend. It only runs while something is subscribed.
+
+    Backends that can tell us about changes (see ``Changer.listen_for_changes``)
+    wake this up whenever something happens. For the rest the interface is
+    polled, every ``poll`` seconds after a change and then twice as long each
+    time nothing changes, up to ``maximum`` seconds.
+    """
+
+    def __init__(self, changer, *, poll=1, maximum=30):
+        self.poll = poll
+        self.changer = changer
+        self.maximum = maximum
+        self.name = changer.name
+
+        self.task = None
+        self.subscriptions = []
+        self.final_future = None
+        self._woken = None
+        self._dirty = False
+
+        self.network = None
+        self.addresses = None
+
+    def subscribe(self):
+        subscription = Subscription(self)
+        self.subscriptions.append(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+        if not self.subscriptions:
+            self.stop()
+
+    def start(self):
+        if self.task is None and not self.changer.final_future.done():
+            self.final_future = hp.CancelScope(
+                self.changer.final_future, name=("StateWatcher({})::final_future", self.name)
+            )
+            self.task = hp.async_as_background(self.run())
+
+    def stop(self):
+        if self.final_future is not None:
+            self.final_future.cancel()
+        self.task = None
+        self.network = None
+        self.addresses = None
+
+    def publish(self, event):
+        for subscription in list(self.subscriptions):
+            subscription.add(event)
+
+    def wake(self):
+        self._dirty = True
+        if self._woken is not None and not self._woken.done():
+            self._woken.set_result(True)
+
+    def scanned(self, networks):
+        if self.subscriptions:
+            self.publish(ScanDone(self.changer.interface, networks))
+
+    async def sleep(self, final_future, amount):
+        """Wait for ``amount`` seconds, or forever if it's None, or until woken"""
+        if self._dirty:
+            return
+
+        woken = self._woken = hp.create_future(name=("StateWatcher({})::sleep", self.name))
+
+        def done():
+            if not woken.done():
+                woken.set_result(True)
+
+        handle = None
+        if amount is not None:
+            handle = hp.timer_wheel().call_later(amount, done)
+
+        try:
+            await hp.wait_for_first_future(
+                final_future, woken, name=("StateWatcher({})::sleep[wait]", self.name)
+            )
+        finally:
+            if handle is not None:
+                handle.cancel()
+            woken.cancel()
+            if self._woken is woken:
+                self._woken = None
+
+    async def run(self):
+        final_future = self.final_future
+        interval = self.poll
+
+        while not final_future.done():
+            self._dirty = False
+            listening = self.changer.listening()
+            if not listening:
+                self.changer.forget_info()
+
+            changed = False
+            try:
+                state = await self.look()
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                raise
+            except:
+                exc_info = sys.exc_info()
+                log.debug(f"Failed to find the state of {self.changer.interface}: {exc_info[1]}")
+                listening = False
+            else:
+                if final_future.done():
+                    break
+                changed = self.compare(*state)
+
+            if listening:
+                await self.sleep(final_future, None)
+            else:
+                interval = self.poll if changed else min([interval * 2, self.maximum])
+                await self.sleep(final_future, interval)
+
+    async def look(self):
+        info = await self.changer.info()
+        network = (info.ssid, info.bssid) if info.ssid or info.bssid else None
+        return network, set(self.changer.addresses())
+
+    def compare(self, network, addresses):
+        """Publish what changed since we last looked and return whether anything did"""
+        interface = self.changer.interface
+
+        if self.network is None and self.addresses is None:
+            # The first look is what we compare against
+            self.network = network
+            self.addresses = addresses
+            return False
+
+        changed = False
+
+        if network != self.network:
+            changed = True
+            if self.network is not None:
+                self.publish(Disassociated(interface, *self.network))
+            if network is not None:
+                self.publish(Associated(interface, *network))
+            self.network = network
+
+        if addresses != self.addresses:
+            changed = True
+            for address in sorted(addresses - self.addresses):
+                self.publish(IPAcquired(interface, address))
+            self.addresses = addresses
+
+        return changed
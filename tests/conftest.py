@@ -0,0 +1,41 @@
+from network_changer.platforms.simulated import Simulated, SimulatedAP, SimulatedWorld
+from network_changer import async_helpers as hp
+
+import pytest
+
+
+@pytest.fixture()
+async def final_future():
+    fut = hp.create_future(name="tests::final_future")
+    try:
+        yield fut
+    finally:
+        fut.cancel()
+
+
+@pytest.fixture()
+def world():
+    return SimulatedWorld(
+        [
+            SimulatedAP("aa:bb:cc:dd:ee:01", "home", signal=-50, freq=2412),
+            SimulatedAP("aa:bb:cc:dd:ee:02", "home", signal=-40, freq=5180),
+            SimulatedAP("aa:bb:cc:dd:ee:03", "work", signal=-60, freq=2437),
+        ],
+        scan_latency=0.05,
+        association_delay=0.01,
+        dhcp_delay=0.01,
+        seed=1,
+    )
+
+
+@pytest.fixture()
+def make_changer(world, final_future):
+    kls = Simulated.using(world)
+
+    def make(name="sim0", **attrs):
+        changer = kls(final_future, name)
+        for key, value in attrs.items():
+            setattr(changer, key, value)
+        return changer
+
+    return make
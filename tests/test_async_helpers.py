@@ -0,0 +1,227 @@
+# coding: spec
+
+from network_changer import async_helpers as hp
+
+import asyncio
+import weakref
+import pytest
+import time
+import gc
+
+describe "TimerWheel":
+    async it "calls callbacks no earlier than they are due":
+        wheel = hp.TimerWheel(resolution=0.02)
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        called = {}
+
+        def make(name):
+            return lambda: called.__setitem__(name, loop.time() - start)
+
+        wheel.call_later(0.1, make("b"))
+        wheel.call_later(0.05, make("a"))
+        await asyncio.sleep(0.2)
+
+        assert sorted(called) == ["a", "b"]
+        assert 0.05 <= called["a"] < 0.05 + 0.06
+        assert 0.1 <= called["b"] < 0.1 + 0.06
+
+    async it "doesn't call cancelled callbacks":
+        wheel = hp.TimerWheel(resolution=0.02)
+        called = []
+        entry = wheel.call_later(0.03, lambda: called.append(1))
+        entry.cancel()
+        assert entry.cancelled()
+        await asyncio.sleep(0.08)
+        assert called == []
+
+    async it "shares one wheel per loop":
+        assert hp.timer_wheel() is hp.timer_wheel()
+
+    it "doesn't keep closed loops alive":
+        refs = []
+        for _ in range(3):
+            loop = asyncio.new_event_loop()
+
+            async def use():
+                async with hp.ATicker(0.01, max_iterations=2, wheel=True) as ticks:
+                    async for _ in ticks:
+                        pass
+
+            loop.run_until_complete(use())
+            loop.close()
+            refs.append(weakref.ref(loop))
+            del loop
+
+        gc.collect()
+        assert [ref() for ref in refs] == [None, None, None]
+
+describe "ATicker":
+    async it "ticks every so often on the shared wheel":
+        start = time.time()
+        found = []
+        async with hp.ATicker(0.05, max_iterations=4, wheel=True, min_wait=False) as ticks:
+            async for iteration, _ in ticks:
+                found.append((iteration, time.time() - start))
+
+        assert [iteration for iteration, _ in found] == [1, 2, 3, 4]
+        for iteration, took in found:
+            assert took >= (iteration - 1) * 0.05 - 0.01
+            assert took < (iteration - 1) * 0.05 + 0.08
+
+    async it "stops after max_time":
+        start = time.time()
+        async with hp.ATicker(0.02, max_time=0.1, wheel=True) as ticks:
+            async for _ in ticks:
+                pass
+        assert 0.09 <= time.time() - start < 0.3
+
+describe "TaskHolder":
+    async it "only runs limit tasks at a time", final_future:
+        running = []
+        most = []
+
+        async def work():
+            running.append(1)
+            most.append(len(running))
+            await asyncio.sleep(0.02)
+            running.pop()
+
+        async with hp.TaskHolder(final_future, limit=2) as ts:
+            for _ in range(6):
+                await ts.add_bounded(work())
+
+        assert len(most) == 6
+        assert max(most) == 2
+
+    async it "passes on a free slot when the woken caller is cancelled", final_future:
+        release = hp.create_future()
+        ran = []
+
+        async def hold():
+            await release
+
+        async def work(name):
+            ran.append(name)
+
+        ts = hp.TaskHolder(final_future, limit=1)
+        try:
+            await ts.add_bounded(hold())
+            first = hp.async_as_background(ts.add_bounded(work("first")))
+            second = hp.async_as_background(ts.add_bounded(work("second")))
+            await asyncio.sleep(0.01)
+
+            # The slot goes to first, but first is cancelled before it can use it
+            release.set_result(True)
+            first.cancel()
+            await asyncio.wait([first])
+            await asyncio.wait_for(second, timeout=1)
+            await asyncio.sleep(0.01)
+            assert ran == ["second"]
+        finally:
+            await ts.finish()
+
+    async it "closes the coroutine if cancelled while waiting", final_future:
+        release = hp.create_future()
+
+        async def hold():
+            await release
+
+        async def work():
+            pass
+
+        ts = hp.TaskHolder(final_future, limit=1)
+        try:
+            await ts.add_bounded(hold())
+            coro = work()
+            waiting = hp.async_as_background(ts.add_bounded(coro))
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            await asyncio.wait([waiting])
+            assert coro.cr_frame is None
+        finally:
+            release.set_result(True)
+            await ts.finish()
+
+    async it "can clean up finished tasks", final_future:
+        async with hp.TaskHolder(final_future) as ts:
+            ts.add(asyncio.sleep(0))
+            await asyncio.sleep(0.01)
+            await ts.clean()
+            assert not ts.ts
+
+describe "CancelScope":
+    async it "is cancelled when the parent is cancelled or gets a result":
+        for resolve in (lambda fut: fut.cancel(), lambda fut: fut.set_result(True)):
+            parent = hp.create_future()
+            scope = hp.CancelScope(parent)
+            child = hp.CancelScope(scope)
+            resolve(parent)
+            await asyncio.sleep(0)
+            assert scope.cancelled()
+            assert child.cancelled()
+
+    async it "gets the exception from the parent":
+        parent = hp.create_future()
+        scope = hp.CancelScope(hp.CancelScope(parent))
+        error = ValueError("nope")
+        parent.set_exception(error)
+        await asyncio.sleep(0)
+        assert scope.exception() is error
+        with pytest.raises(ValueError):
+            await scope
+
+    async it "doesn't affect the parent when it's cancelled":
+        parent = hp.create_future()
+        with hp.CancelScope(parent) as scope:
+            pass
+        assert scope.cancelled()
+        assert not parent.done()
+        parent.cancel()
+
+    async it "resolves every descendant straight away":
+        root = hp.CancelScope()
+        scope = root
+        for _ in range(50):
+            scope = hp.CancelScope(scope)
+        root.cancel()
+        assert scope.cancelled()
+        assert not root.children
+
+    async it "shares one done callback on a plain future":
+        parent = hp.create_future()
+        before = len(parent._callbacks)
+        scopes = [hp.CancelScope(parent) for _ in range(100)]
+        assert len(parent._callbacks) == before + 1
+
+        for scope in scopes:
+            scope.cancel()
+        assert not parent.done()
+        parent.cancel()
+
+    async it "is cancelled when it's deadline passes":
+        loop = asyncio.get_event_loop()
+        parent = hp.CancelScope(deadline=loop.time() + 0.05)
+        scope = hp.CancelScope(parent, timeout=1)
+        assert 0.9 > scope.remaining > 0.03
+
+        start = time.time()
+        await hp.wait_for_first_future(scope)
+        assert 0.04 < time.time() - start < 0.5
+        assert scope.cancelled()
+        assert parent.cancelled()
+
+    async it "follows a ResettableFuture after it's reset":
+        fut = hp.ResettableFuture()
+        first = hp.CancelScope(fut)
+        fut.cancel()
+        await asyncio.sleep(0)
+        assert first.cancelled()
+
+        fut.reset()
+        second = hp.CancelScope(fut)
+        assert not second.done()
+
+        fut.set_exception(ValueError("again"))
+        await asyncio.sleep(0)
+        assert isinstance(second.exception(), ValueError)
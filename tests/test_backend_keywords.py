@@ -0,0 +1,91 @@
+# coding: spec
+
+from network_changer.platforms.simulated import Simulated
+
+import time
+import pytest
+
+
+@pytest.fixture()
+def calls():
+    return []
+
+
+@pytest.fixture()
+def old_changer(world, final_future, calls):
+    class Old(Simulated.using(world)):
+        """A backend written before fields, channels, bssid and freq existed"""
+
+        def listen_for_changes(self, changed, stopped):
+            return None
+
+        async def do_info(self, progress=None):
+            calls.append(("info",))
+            return await super().do_info(progress=progress)
+
+        async def do_scan(self, request_scan=True, progress=None):
+            calls.append(("scan",))
+            return await super().do_scan(request_scan=request_scan, progress=progress)
+
+        async def do_connect(self, ssid, *, check_connected, progress=None):
+            calls.append(("connect", ssid))
+            return await super().do_connect(
+                ssid, check_connected=check_connected, progress=progress
+            )
+
+    return Old(final_future, "sim0")
+
+
+def errors(progress):
+    return [info["error"] for _, info in progress if "error" in info]
+
+
+describe "Backends without the newer keywords":
+    async it "checks the connection without asking for fields", old_changer, calls:
+        await old_changer.connect("work", timeout=5)
+
+        progress = []
+        assert await old_changer.check_connected("work", progress=progress)
+        assert await old_changer.check_connected(
+            "work", bssid="aa:bb:cc:dd:ee:03", progress=progress
+        )
+        assert errors(progress) == []
+        assert ("info",) in calls
+
+    async it "scans every channel when asked for some", old_changer, calls:
+        progress = []
+        found = await old_changer.scan(channels=[6], progress=progress)
+        assert errors(progress) == []
+        assert calls == [("scan",)]
+        assert sorted(network.bssid for network in found) == [
+            "aa:bb:cc:dd:ee:01",
+            "aa:bb:cc:dd:ee:02",
+            "aa:bb:cc:dd:ee:03",
+        ]
+
+    async it "doesn't pin the access point", world, old_changer, calls:
+        world.known.update([("work", "aa:bb:cc:dd:ee:03", 2437, time.time(), None)])
+
+        progress = []
+        await old_changer.connect("work", timeout=5, progress=progress)
+        assert errors(progress) == []
+        assert [call for call in calls if call[0] == "connect"] == [("connect", "work")]
+        assert (await old_changer.info()).bssid == "aa:bb:cc:dd:ee:03"
+
+describe "Backends with the newer keywords":
+    async it "are only asked for the fields check_connected needs", make_changer, calls:
+        changer = make_changer()
+        changer.listen_for_changes = lambda changed, stopped: None
+        do_info = changer.do_info
+
+        async def record(progress=None, fields=None):
+            calls.append(fields)
+            return await do_info(progress=progress, fields=fields)
+
+        changer.do_info = record
+        await changer.connect("work", timeout=5, check_after=False)
+        calls.clear()
+
+        assert await changer.check_connected("work")
+        assert await changer.check_connected("work", bssid="aa:bb:cc:dd:ee:03")
+        assert calls == [frozenset(["ssid"]), frozenset(["bssid"])]
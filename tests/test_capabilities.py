@@ -0,0 +1,78 @@
+# coding: spec
+
+from network_changer.capabilities import Capabilities
+from network_changer import capabilities
+
+from unittest import mock
+import pytest
+import json
+import os
+
+
+@pytest.fixture()
+def boot():
+    with mock.patch.object(capabilities, "boot_id", return_value="boot-1") as boot_id:
+        yield boot_id
+
+
+describe "Capabilities":
+    it "shares what it probed with other processes until a reboot", tmp_path, boot:
+        path = str(tmp_path / "capabilities")
+        probe = mock.Mock(return_value="yes")
+
+        assert Capabilities(path).system("thing", probe) == "yes"
+        Capabilities(path).remember("wlan0", "we_version", 22)
+
+        other = Capabilities(path)
+        assert other.system("thing", probe) == "yes"
+        assert other.lookup("wlan0", "we_version") == 22
+        assert len(probe.mock_calls) == 1
+        assert oct(os.stat(path).st_mode & 0o777) == oct(0o600)
+
+        boot.return_value = "boot-2"
+        rebooted = Capabilities(path)
+        assert rebooted.lookup("wlan0", "we_version") is None
+        assert rebooted.system("thing", probe) == "yes"
+        assert len(probe.mock_calls) == 2
+
+    it "ignores a file other users can change", tmp_path, boot:
+        path = tmp_path / "capabilities"
+        data = {"boot_id": "boot-1", "system": {"thing": "theirs"}, "interfaces": {}}
+        path.write_text(json.dumps(data))
+        path.chmod(0o666)
+
+        assert Capabilities(str(path)).system("thing", lambda: "ours") == "ours"
+
+    it "doesn't follow symlinks", tmp_path, boot:
+        target = tmp_path / "elsewhere"
+        data = {"boot_id": "boot-1", "system": {"thing": "theirs"}, "interfaces": {}}
+        target.write_text(json.dumps(data))
+        target.chmod(0o600)
+        os.symlink(target, tmp_path / "capabilities")
+
+        assert Capabilities(str(tmp_path / "capabilities")).system("thing", lambda: "ours") == "ours"
+        assert json.loads(target.read_text()) == data
+
+    it "only remembers in process without a boot id", tmp_path, boot:
+        boot.return_value = None
+        path = tmp_path / "capabilities"
+        Capabilities(str(path)).remember("wlan0", "we_version", 22)
+        assert not path.exists()
+
+    @pytest.mark.parametrize(
+        "system, nmcli, name, expected",
+        [
+            ("Darwin", True, None, "Airport"),
+            ("Windows", True, None, "Windows"),
+            ("Linux", True, None, "DBus"),
+            ("Linux", True, "<iw>", "IW"),
+            ("Linux", False, None, "IW"),
+        ],
+    )
+    it "chooses a backend", boot, system, nmcli, name, expected:
+        caps = Capabilities()
+        which = "/usr/bin/nmcli" if nmcli else None
+        with mock.patch("platform.system", return_value=system), mock.patch(
+            "shutil.which", return_value=which
+        ):
+            assert caps.backend(name) == expected
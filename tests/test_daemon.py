@@ -0,0 +1,153 @@
+# coding: spec
+
+from network_changer.daemon import Client, DaemonError, DaemonUnavailable, Server, LENGTH
+from network_changer.platforms.simulated import Simulated
+from network_changer.executor import NoDaemon, Task
+from network_changer import async_helpers as hp
+from network_changer import executor
+
+from unittest import mock
+import tempfile
+import argparse
+import asyncio
+import pytest
+import shutil
+import socket
+import stat
+import os
+
+
+@pytest.fixture()
+def socket_path():
+    # Unix socket paths have to be short, so not in tmp_path
+    folder = tempfile.mkdtemp(prefix="nc")
+    try:
+        yield os.path.join(folder, "d.sock")
+    finally:
+        shutil.rmtree(folder)
+
+
+@pytest.fixture()
+async def server(world, final_future, socket_path):
+    server = Server(final_future, socket_path, kls=Simulated.using(world))
+    task = hp.async_as_background(server.serve())
+    while not os.path.exists(socket_path):
+        await asyncio.sleep(0.01)
+    try:
+        yield server
+    finally:
+        task.cancel()
+        await asyncio.wait([task])
+
+
+describe "Server":
+    async it "answers requests from a Client", world, server, socket_path:
+        client = Client(socket_path, timeout=5)
+
+        found = await client.scan(interface="sim0")
+        assert sorted(network.bssid for network in found) == [
+            "aa:bb:cc:dd:ee:01",
+            "aa:bb:cc:dd:ee:02",
+            "aa:bb:cc:dd:ee:03",
+        ]
+
+        await client.connect("home", interface="sim0", bssid="aa:bb:cc:dd:ee:01")
+        assert world.connections["sim0"].bssid == "aa:bb:cc:dd:ee:01"
+
+        info = await client.info(interface="sim0")
+        assert (info.ssid, info.bssid) == ("home", "aa:bb:cc:dd:ee:01")
+
+        await client.disconnect(interface="sim0")
+        assert "sim0" not in world.connections
+
+    async it "scans with the changers it already has", server, socket_path:
+        client = Client(socket_path, timeout=5)
+        await client.info(interface="sim0")
+
+        found, errors = await client.scan_all()
+        assert errors == {}
+        assert len(list(found)) == 3
+        assert server.pool.changers["sim0"] is server.changers["sim0"]
+
+    async it "only lets us use the socket", server, socket_path:
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+
+    async it "replies with errors", server, socket_path:
+        client = Client(socket_path, timeout=5)
+        with pytest.raises(DaemonError) as error:
+            await client.request("nope")
+        assert "Unknown command: nope" in str(error.value)
+
+    async it "replies to messages it can't read", server, socket_path:
+        for message in (LENGTH.pack(1 << 30), LENGTH.pack(3) + b"{{{"):
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            try:
+                writer.write(message)
+                await writer.drain()
+                header = await asyncio.wait_for(reader.readexactly(LENGTH.size), timeout=5)
+                (length,) = LENGTH.unpack(header)
+                assert b'"error"' in await reader.readexactly(length)
+            finally:
+                writer.close()
+
+    async it "refuses to start if a daemon is already running", world, final_future, server, socket_path:
+        with pytest.raises(DaemonError, match="already listening"):
+            await Server(final_future, socket_path, kls=Simulated.using(world)).serve()
+        assert os.path.exists(socket_path)
+
+    async it "replaces a socket nothing is listening on", world, final_future, socket_path:
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(socket_path)
+        stale.close()
+
+        server = Server(final_future, socket_path, kls=Simulated.using(world))
+        task = hp.async_as_background(server.serve())
+        try:
+            await asyncio.sleep(0.05)
+            info = await Client(socket_path, timeout=5).info(interface="sim0")
+            assert info.ssid == ""
+        finally:
+            task.cancel()
+            await asyncio.wait([task])
+
+    async it "won't remove something that isn't a socket", final_future, socket_path:
+        open(socket_path, "w").close()
+        with pytest.raises(DaemonError, match="isn't a socket"):
+            await Server(final_future, socket_path).serve()
+
+describe "Client":
+    async it "gives up on a daemon that doesn't answer", socket_path:
+        async def ignore(reader, writer):
+            await asyncio.sleep(10)
+
+        server = await asyncio.start_unix_server(ignore, path=socket_path)
+        try:
+            # The daemon may still be connecting, so this isn't DaemonUnavailable
+            with pytest.raises(DaemonError, match="didn't answer") as error:
+                await Client(socket_path, timeout=0.1).connect("home")
+            assert not isinstance(error.value, DaemonUnavailable)
+        finally:
+            server.close()
+
+    async it "is unavailable when there's no daemon to connect to", socket_path:
+        with pytest.raises(DaemonUnavailable):
+            await Client(socket_path, timeout=1).info()
+
+describe "from_daemon":
+    async it "only does the work itself when there's no daemon", socket_path:
+        open(socket_path, "w").close()
+        args = argparse.Namespace(no_daemon=False, socket=socket_path)
+        found = await Task().from_daemon(args, lambda client: client.connect("home"))
+        assert found is NoDaemon
+
+        async def ignore(reader, writer):
+            await asyncio.sleep(10)
+
+        os.remove(socket_path)
+        server = await asyncio.start_unix_server(ignore, path=socket_path)
+        try:
+            with mock.patch.object(executor, "Client", lambda path: Client(path, timeout=0.1)):
+                with pytest.raises(DaemonError):
+                    await Task().from_daemon(args, lambda client: client.connect("home"))
+        finally:
+            server.close()
@@ -0,0 +1,51 @@
+# coding: spec
+
+import pytest
+
+pytest.importorskip("sdbus_async")
+
+from network_changer.platforms.dbus import DBus
+
+from unittest import mock
+
+describe "DBus":
+    describe "connecting":
+
+        class Activated(Exception):
+            pass
+
+        async def settings_for(self, final_future, **kwargs):
+            changer = DBus(final_future, "wlan0")
+            changer._interface = "wlan0"
+            changer._system_bus = mock.Mock(name="system_bus")
+            changer._settings = mock.Mock(name="settings")
+            changer._settings.add_connection_unsaved = mock.AsyncMock(return_value="/connection")
+            changer._nm = mock.Mock(name="nm")
+            changer._nm.activate_connection = mock.AsyncMock(side_effect=self.Activated())
+
+            device = mock.Mock(name="device", _remote_object_path="/device")
+            with mock.patch.object(changer, "do_disconnect", mock.AsyncMock()), mock.patch.object(
+                changer, "device", mock.AsyncMock(return_value=device)
+            ), mock.patch("network_changer.platforms.dbus.NetworkConnectionSettings"):
+                with pytest.raises(self.Activated):
+                    await changer.do_connect("home", check_connected=None, **kwargs)
+
+            changer._settings.add_connection_unsaved.assert_called_once()
+            return changer._settings.add_connection_unsaved.mock_calls[0].args[0]
+
+        async it "lets NetworkManager choose the access point", final_future:
+            settings = await self.settings_for(final_future)
+            assert settings["802-11-wireless"] == {
+                "ssid": ("ay", b"home"),
+                "mode": ("s", "infrastructure"),
+            }
+
+        async it "pins the bssid, band and channel", final_future:
+            settings = await self.settings_for(final_future, bssid="aa:bb:cc:dd:ee:01", freq=5180)
+            assert settings["802-11-wireless"] == {
+                "ssid": ("ay", b"home"),
+                "mode": ("s", "infrastructure"),
+                "bssid": ("ay", bytes([0xAA, 0xBB, 0xCC, 0xDD, 0xEE, 0x01])),
+                "band": ("s", "a"),
+                "channel": ("u", 36),
+            }
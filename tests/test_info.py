@@ -0,0 +1,71 @@
+# coding: spec
+
+from network_changer.platforms.simulated import Simulated
+from network_changer.executor import commands
+from network_changer.info import ScanInfo
+from network_changer import pool
+
+from unittest import mock
+import argparse
+
+describe "ScanInfo.merge":
+    it "has one entry per bssid seen by any interface":
+        merged = ScanInfo.merge(
+            {
+                "wlan0": [{"bssid": "aa:bb:cc:dd:ee:01", "ssid": "home", "last_seen": 10}],
+                "wlan1": [
+                    {"bssid": "aa:bb:cc:dd:ee:01", "ssid": "home", "last_seen": 5},
+                    {"bssid": "aa:bb:cc:dd:ee:02", "ssid": "work", "last_seen": 5},
+                ],
+            }
+        )
+        found = {network.bssid: network for network in merged}
+        assert sorted(found) == ["aa:bb:cc:dd:ee:01", "aa:bb:cc:dd:ee:02"]
+        assert found["aa:bb:cc:dd:ee:01"].interfaces == {"wlan0", "wlan1"}
+        assert found["aa:bb:cc:dd:ee:02"].interfaces == {"wlan1"}
+
+    it "keeps what was seen most recently":
+        merged = ScanInfo.merge(
+            {
+                "wlan0": [
+                    {"bssid": "aa:bb:cc:dd:ee:01", "ssid": "old", "last_seen": 5, "freq": 2412}
+                ],
+                "wlan1": [
+                    {"bssid": "aa:bb:cc:dd:ee:01", "ssid": "new", "last_seen": 10, "freq": None}
+                ],
+                "wlan2": [
+                    {"bssid": "aa:bb:cc:dd:ee:01", "ssid": "older", "last_seen": 1, "freq": 5180}
+                ],
+            }
+        )
+        (network,) = list(merged)
+        assert (network.ssid, network.last_seen, network.freq) == ("new", 10, 2412)
+        assert network.interfaces == {"wlan0", "wlan1", "wlan2"}
+
+    it "doesn't change the scans it merges":
+        scan = ScanInfo.create([{"bssid": "aa:bb:cc:dd:ee:01", "ssid": "home", "last_seen": 1}])
+        ScanInfo.merge({"wlan0": scan, "wlan1": scan})
+        assert [network.interfaces for network in scan] == [set()]
+
+describe "scan --all-interfaces":
+    async it "prints what every interface saw", world, final_future, capsys:
+        world.interfaces = ["sim0", "sim1"]
+        args = argparse.Namespace(
+            all_interfaces=True,
+            no_daemon=True,
+            debug=False,
+            filter_bssid=None,
+            filter_ssid="work",
+            interface=None,
+            socket=None,
+        )
+
+        task = commands["scan"]()
+        task._final_future = final_future
+        with mock.patch.object(pool, "platform_kls", return_value=Simulated.using(world)):
+            await task.execute_task(args)
+
+        out = capsys.readouterr().out
+        assert "BSSID: aa:bb:cc:dd:ee:03" in out
+        assert "SEEN: sim0, sim1" in out
+        assert "aa:bb:cc:dd:ee:01" not in out
@@ -0,0 +1,91 @@
+# coding: spec
+
+import asyncio
+import pytest
+
+
+@pytest.fixture()
+def fetches():
+    return []
+
+
+@pytest.fixture()
+def changer(make_changer, fetches):
+    changer = make_changer()
+    # Pretend the backend can't tell us about changes
+    changer.listen_for_changes = lambda changed, stopped: None
+
+    async def do_info(progress=None, fields=None):
+        fetches.append(fields)
+        ssid = f"home{len(fetches)}"
+        await asyncio.sleep(0.02)
+        return {"bssid": "aa:bb:cc:dd:ee:01", "ssid": ssid}
+
+    changer.do_info = do_info
+    return changer
+
+
+describe "Changer.info":
+    async it "asks the backend every time by default", changer, fetches:
+        assert (await changer.info()).ssid == "home1"
+        assert (await changer.info()).ssid == "home2"
+        assert fetches == [None, None]
+
+    async it "shares one request between concurrent callers", changer, fetches:
+        found = await asyncio.gather(*[changer.info() for _ in range(5)])
+        assert [info.ssid for info in found] == ["home1"] * 5
+        assert fetches == [None]
+
+    async it "answers a request for some fields with a request for everything", changer, fetches:
+        everything = asyncio.ensure_future(changer.info())
+        await asyncio.sleep(0)
+        some = await changer.info(fields=["ssid"])
+        assert some is await everything
+        assert fetches == [None]
+
+        await changer.info(fields=["ssid"])
+        assert fetches == [None, frozenset(["ssid"])]
+
+    async it "reuses a result for info_freshness seconds", changer, fetches:
+        changer.info_freshness = 0.1
+        assert (await changer.info()).ssid == "home1"
+        assert (await changer.info()).ssid == "home1"
+        await asyncio.sleep(0.1)
+        assert (await changer.info()).ssid == "home2"
+
+    async it "doesn't use a request that started before forget_info", changer, fetches:
+        changer.info_freshness = 10
+        first = asyncio.ensure_future(changer.info())
+        await asyncio.sleep(0.01)
+
+        changer.forget_info()
+        second = await changer.info()
+        assert (await first).ssid == "home1"
+        assert second.ssid == "home2"
+
+        # And the old request doesn't end up in the cache
+        assert (await changer.info()).ssid == "home2"
+        assert len(fetches) == 2
+
+    async it "reuses a result until the backend says something changed", make_changer, world:
+        changer = make_changer()
+        await changer.connect("work", timeout=5)
+        assert changer.listening()
+
+        calls = []
+        original = changer.do_info
+
+        async def do_info(progress=None, fields=None):
+            calls.append(fields)
+            return await original(progress=progress, fields=fields)
+
+        changer.do_info = do_info
+        changer.forget_info()
+
+        assert (await changer.info()).ssid == "work"
+        assert (await changer.info(fields=["bssid"])).ssid == "work"
+        assert calls == [None]
+
+        world.drop("sim0")
+        assert (await changer.info()).ssid == ""
+        assert calls == [None, None]
@@ -0,0 +1,222 @@
+# coding: spec
+
+from network_changer.platforms.iw import IW, IWContext, SIOCGIWNAME, SIOCGIWAP
+from network_changer import netlink
+
+from ctypes import addressof
+from unittest import mock
+import asyncio
+import pytest
+
+describe "IWContext":
+
+    @pytest.fixture()
+    def opened(self):
+        sockets = []
+
+        def open_socket():
+            sock = mock.Mock(name="socket")
+            sock.fileno.return_value = 100 + len(sockets)
+            sockets.append(sock)
+            return sock
+
+        with mock.patch("network_changer.platforms.wext.open_socket", open_socket):
+            yield sockets
+
+    @pytest.fixture()
+    def ioctls(self):
+        made = []
+
+        def ioctl(fd, request, wrq):
+            made.append((fd, request, bytes(wrq.ifr_ifrn.ifrn_name).rstrip(b"\0"), addressof(wrq)))
+            return 0
+
+        with mock.patch("network_changer.platforms.iw.fcntl.ioctl", ioctl):
+            yield made
+
+    it "opens one socket and keeps using it", opened, ioctls:
+        context = IWContext("wlan0")
+        assert opened == []
+
+        context.ioctl(SIOCGIWNAME)
+        context.ioctl(SIOCGIWAP)
+        assert len(opened) == 1
+        assert [(fd, request) for fd, request, _, _ in ioctls] == [
+            (100, SIOCGIWNAME),
+            (100, SIOCGIWAP),
+        ]
+
+        context.close()
+        opened[0].close.assert_called_once_with()
+        assert context.socket is None
+
+        context.ioctl(SIOCGIWNAME)
+        assert len(opened) == 2
+        assert ioctls[-1][0] == 101
+
+    it "reuses one request filled in from the template", opened, ioctls:
+        context = IWContext("wlan0")
+
+        first = context.request(reuse=True)
+        first.u.essid.length = 20
+        second = context.request(reuse=True)
+        assert second is first
+        assert second.u.essid.length == 0
+
+        context.ioctl(SIOCGIWNAME)
+        context.ioctl(SIOCGIWAP)
+        assert [(name, address) for _, _, name, address in ioctls] == [
+            (b"wlan0", addressof(first)),
+            (b"wlan0", addressof(first)),
+        ]
+
+    it "copies the template for requests that are kept", opened:
+        context = IWContext("wlan0")
+
+        kept = context.request()
+        assert kept is not context.request()
+        assert kept is not context.request(reuse=True)
+        assert bytes(kept.ifr_ifrn.ifrn_name).rstrip(b"\0") == b"wlan0"
+
+        kept.u.essid.length = 20
+        assert context.template.u.essid.length == 0
+        assert context.request(reuse=True).u.essid.length == 0
+
+    it "truncates long interface names", opened:
+        context = IWContext("a" * 20)
+        assert bytes(context.request().ifr_ifrn.ifrn_name) == b"a" * 15 + b"\0"
+
+describe "IW":
+    async it "closes its socket when the changer is closed", final_future:
+        sock = mock.Mock(name="socket")
+        with mock.patch("network_changer.platforms.wext.open_socket", return_value=sock):
+            changer = IW(final_future, "wlan0")
+            changer.context.sock
+            final_future.cancel()
+            await asyncio.sleep(0)
+
+        sock.close.assert_called_once_with()
+        assert changer.context.socket is None
+
+    describe "connecting":
+
+        @pytest.fixture()
+        def changer(self, final_future):
+            changer = IW(final_future, "wlan0")
+            try:
+                yield changer
+            finally:
+                changer.close()
+
+        async def connect(self, changer, ssid, **kwargs):
+            run_command = mock.AsyncMock(name="run_command")
+            do_disconnect = mock.AsyncMock(name="do_disconnect")
+            with mock.patch("network_changer.platforms.iw.Commands.run_command", run_command):
+                with mock.patch.object(changer, "do_disconnect", do_disconnect):
+                    await changer.do_connect(ssid, check_connected=None, **kwargs)
+
+            do_disconnect.assert_called_once_with(progress=None)
+            assert len(run_command.mock_calls) == 1
+            return run_command.mock_calls[0].args[0]
+
+        async it "lets iw choose the access point", changer:
+            assert await self.connect(changer, "home") == ["iw", "dev", "wlan0", "connect", "home"]
+
+        async it "joins the access point it was given", changer:
+            cmd = await self.connect(changer, "home", bssid="aa:bb:cc:dd:ee:01", freq=2412)
+            assert cmd == ["iw", "dev", "wlan0", "connect", "home", "2412", "aa:bb:cc:dd:ee:01"]
+
+        async it "can be given only a frequency", changer:
+            cmd = await self.connect(changer, "home", freq=5180)
+            assert cmd == ["iw", "dev", "wlan0", "connect", "home", "5180"]
+
+describe "IW listening for changes":
+
+    class FakeListener:
+        def __init__(self, kind, callback):
+            self.kind = kind
+            self.closed = False
+            self.on_error = None
+            self.callback = callback
+
+        def close(self):
+            self.closed = True
+
+    @pytest.fixture()
+    def listeners(self):
+        made = {}
+
+        def fake(kind):
+            def make(interface, callback):
+                made[kind] = self.FakeListener(kind, callback)
+                return made[kind]
+
+            return make
+
+        with mock.patch.multiple(
+            "network_changer.platforms.iw.netlink",
+            mlme_listener=fake("mlme"),
+            link_listener=fake("link"),
+            address_listener=fake("address"),
+        ):
+            yield made
+
+    @pytest.fixture()
+    def changer(self, final_future, listeners):
+        changer = IW(final_future, "wlan0")
+        changer.fetches = 0
+
+        async def do_info(progress=None, fields=None):
+            changer.fetches += 1
+            return {"ssid": "home", "bssid": "aa:bb:cc:dd:ee:01"}
+
+        changer.do_info = do_info
+        try:
+            yield changer
+        finally:
+            changer.close()
+
+    @pytest.mark.parametrize(
+        "kind, args",
+        [
+            ("mlme", (netlink.NL80211_CMD_ROAM,)),
+            ("link", (True,)),
+            ("address", ("10.0.0.5",)),
+        ],
+    )
+    async it "forgets cached info on every kind of event", changer, listeners, kind, args:
+        await changer.info()
+        await changer.info()
+        assert changer.fetches == 1
+        assert sorted(listeners) == ["address", "link", "mlme"]
+
+        with mock.patch.object(changer, "forget_info", wraps=changer.forget_info) as forget:
+            listeners[kind].callback(*args)
+            forget.assert_called_once_with()
+
+        await changer.info()
+        assert changer.fetches == 2
+
+    async it "forgets cached info when messages may have been dropped", changer, listeners:
+        await changer.info()
+        listeners["link"].on_error(OSError(105, "No buffer space available"))
+        await changer.info()
+        assert changer.fetches == 2
+
+    async it "closes the listeners with the changer", changer, listeners:
+        await changer.info()
+        changer.close()
+        assert all(listener.closed for listener in listeners.values())
+
+    it "falls back to polling without any listeners", final_future:
+        with mock.patch.multiple(
+            "network_changer.platforms.iw.netlink",
+            mlme_listener=lambda interface, callback: None,
+            link_listener=lambda interface, callback: None,
+            address_listener=lambda interface, callback: None,
+        ):
+            changer = IW(final_future, "wlan0")
+            try:
+                assert not changer.listening()
+            finally:
+                changer.close()
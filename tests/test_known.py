@@ -0,0 +1,87 @@
+# coding: spec
+
+from network_changer.errors import FailedToConnect
+from network_changer.known import KnownNetworks
+
+import time
+import os
+
+describe "KnownNetworks":
+    it "shares what it knows through the file", tmp_path:
+        path = str(tmp_path / "known")
+        KnownNetworks(path).connected("home", "aa:bb:cc:dd:ee:01", 2412, 1.5)
+
+        known = KnownNetworks(path)
+        assert [(n.ssid, n.bssid, n.freq, n.latency) for n in known.best("home")] == [
+            ("home", "aa:bb:cc:dd:ee:01", 2412, 1.5)
+        ]
+        assert known.fd is not None
+
+    it "doesn't follow symlinks", tmp_path:
+        target = tmp_path / "elsewhere"
+        target.write_bytes(b"")
+        os.symlink(target, tmp_path / "known")
+
+        known = KnownNetworks(str(tmp_path / "known"))
+        known.connected("home", "aa:bb:cc:dd:ee:01", 2412, 1.5)
+        assert known.fd is None
+        assert target.read_bytes() == b""
+
+    it "doesn't use a file other users can change", tmp_path:
+        path = tmp_path / "known"
+        path.write_bytes(b"")
+        path.chmod(0o666)
+
+        known = KnownNetworks(str(path))
+        known.connected("home", "aa:bb:cc:dd:ee:01", 2412, 1.5)
+        assert known.fd is None
+        assert path.read_bytes() == b""
+        assert len(known.best("home")) == 1
+
+describe "pinning":
+    async it "uses an access point it saw recently without scanning", world, make_changer:
+        changer = make_changer()
+        world.known.update([("work", "aa:bb:cc:dd:ee:03", 2437, time.time(), None)])
+
+        assert await changer.pin("work") == ("aa:bb:cc:dd:ee:03", 2437)
+        assert changer.scanned_at is None
+
+    async it "only scans the channels it knows about", world, make_changer:
+        changer = make_changer()
+        world.known.update([("work", "aa:bb:cc:dd:ee:03", 2437, time.time() - 3600, None)])
+
+        progress = []
+        assert await changer.pin("work", progress=progress) == ("aa:bb:cc:dd:ee:03", 2437)
+        assert [info["channels"] for _, info in progress if "channels" in info] == [[6]]
+        assert [network.bssid for network in changer.recently_seen()] == ["aa:bb:cc:dd:ee:03"]
+
+    async it "prefers the access point it has joined before", world, make_changer:
+        changer = make_changer()
+        await changer.scan()
+        world.known.update([("home", "aa:bb:cc:dd:ee:01", 2412, time.time(), 0.5)])
+
+        assert await changer.pin("home") == ("aa:bb:cc:dd:ee:01", 2412)
+
+    async it "lets the backend choose when it knows nothing", make_changer:
+        assert await make_changer().pin("home") == (None, None)
+
+    async it "remembers how long joining took", world, make_changer:
+        await make_changer().connect("work", timeout=5)
+        (network,) = world.known.best("work")
+        assert network.bssid == "aa:bb:cc:dd:ee:03"
+        assert network.latency is not None
+
+    async it "lets the backend choose when it can't join what it saw", world, make_changer:
+        changer = make_changer()
+        await changer.scan()
+        world.known.update([("work", "aa:bb:cc:dd:ee:03", 2437, time.time(), None)])
+        world.inject("connect", FailedToConnect("work", "sim0", None, error="pinned"))
+
+        progress = []
+        await changer.connect("work", timeout=5, progress=progress)
+        assert [
+            info["bssid"]
+            for _, info in progress
+            if info["msg"] == "Couldn't join the access point we saw, letting the backend choose"
+        ] == ["aa:bb:cc:dd:ee:03"]
+        assert (await changer.info()).ssid == "work"
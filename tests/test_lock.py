@@ -0,0 +1,182 @@
+# coding: spec
+
+from network_changer import async_helpers as hp
+from network_changer import lock
+
+from unittest import mock
+import asyncio
+import pytest
+import stat
+import os
+
+
+@pytest.fixture()
+def folder(tmp_path, monkeypatch):
+    folder = tmp_path / "locks"
+    monkeypatch.setattr(lock, "lock_folder", lambda: lock.private_folder(folder))
+    return folder
+
+
+async def hold(interface_lock, priority, release, order, name, **kwargs):
+    async def make():
+        order.append(name)
+        return await release
+
+    return await interface_lock.run(priority, make, **kwargs)
+
+
+describe "InterfaceLock":
+    async it "runs connects before waiting scans":
+        interface_lock = lock.InterfaceLock("wlan0", across_processes=False)
+        release = hp.create_future()
+        order = []
+
+        async def note(name):
+            order.append(name)
+            return name
+
+        first = hp.async_as_background(hold(interface_lock, lock.CONNECT, release, order, "hold"))
+        await asyncio.sleep(0.01)
+        scan = hp.async_as_background(interface_lock.run(lock.SCAN, lambda: note("scan")))
+        connect = hp.async_as_background(interface_lock.run(lock.CONNECT, lambda: note("connect")))
+        await asyncio.sleep(0.01)
+
+        release.set_result(True)
+        assert await asyncio.gather(first, scan, connect) == [True, "scan", "connect"]
+        assert order == ["hold", "connect", "scan"]
+
+    async it "puts a preemptible scan back in the queue for a connect":
+        interface_lock = lock.InterfaceLock("wlan0", across_processes=False)
+        order = []
+
+        async def scan():
+            order.append("scan")
+            await asyncio.sleep(0.05)
+            return "scanned"
+
+        async def connect():
+            order.append("connect")
+            return "connected"
+
+        scanning = hp.async_as_background(interface_lock.run(lock.SCAN, scan, preemptible=True))
+        await asyncio.sleep(0.01)
+        assert await interface_lock.run(lock.CONNECT, connect) == "connected"
+        assert await scanning == "scanned"
+        assert order == ["scan", "connect", "scan"]
+
+    async it "shares one run between callers with the same key":
+        interface_lock = lock.InterfaceLock("wlan0", across_processes=False)
+        release = hp.create_future()
+        order = []
+
+        first = hp.async_as_background(
+            hold(interface_lock, lock.CONNECT, release, order, "hold", key="k")
+        )
+        await asyncio.sleep(0.01)
+        second = hp.async_as_background(
+            hold(interface_lock, lock.CONNECT, release, order, "other", key="k")
+        )
+        third = hp.async_as_background(
+            hold(interface_lock, lock.SCAN, release, order, "scan", key="s")
+        )
+        fourth = hp.async_as_background(
+            hold(interface_lock, lock.SCAN, release, order, "again", key="s")
+        )
+        await asyncio.sleep(0.01)
+
+        release.set_result(True)
+        await asyncio.gather(first, second, third, fourth)
+        assert order == ["hold", "other", "scan"]
+
+    async it "takes turns with other processes", folder:
+        mine = lock.InterfaceLock("wlan0", poll=0.01)
+        theirs = lock.InterfaceLock("wlan0", poll=0.01)
+        release = hp.create_future()
+        order = []
+
+        first = hp.async_as_background(hold(theirs, lock.CONNECT, release, order, "theirs"))
+        await asyncio.sleep(0.02)
+        second = hp.async_as_background(hold(mine, lock.SCAN, release, order, "mine"))
+        await asyncio.sleep(0.05)
+        assert order == ["theirs"]
+
+        release.set_result(True)
+        await asyncio.gather(first, second)
+        assert order == ["theirs", "mine"]
+
+        for name in ("wlan0.lock", "wlan0.intent"):
+            assert stat.S_IMODE(os.stat(folder / name).st_mode) == 0o600
+        assert stat.S_IMODE(os.stat(folder).st_mode) == 0o700
+
+        mine.close()
+        theirs.close()
+
+    async it "gives up waiting for other processes when the caller does", folder:
+        mine = lock.InterfaceLock("wlan0", poll=0.01)
+        theirs = lock.InterfaceLock("wlan0", poll=0.01)
+        release = hp.create_future()
+        order = []
+
+        def intent_held():
+            fd = os.open(folder / "wlan0.intent", os.O_RDWR)
+            try:
+                if not mine.try_lock(fd, lock.fcntl.LOCK_EX):
+                    return True
+                lock.fcntl.flock(fd, lock.fcntl.LOCK_UN)
+                return False
+            finally:
+                os.close(fd)
+
+        first = hp.async_as_background(hold(theirs, lock.CONNECT, release, order, "theirs"))
+        await asyncio.sleep(0.02)
+        second = hp.async_as_background(hold(mine, lock.CONNECT, release, order, "mine"))
+        await asyncio.sleep(0.05)
+        assert order == ["theirs"]
+        assert intent_held()
+
+        second.cancel()
+        await asyncio.sleep(0.05)
+        assert not intent_held()
+        assert mine.dispatcher is None
+
+        release.set_result(True)
+        await first
+        await asyncio.sleep(0.05)
+        assert order == ["theirs"]
+        with pytest.raises(asyncio.CancelledError):
+            await second
+
+        mine.close()
+        theirs.close()
+
+describe "lock_folder":
+    it "won't use a folder other users can use", tmp_path:
+        folder = tmp_path / "locks"
+        folder.mkdir()
+        folder.chmod(0o777)
+        with pytest.raises(OSError):
+            lock.private_folder(folder)
+
+    it "won't follow a symlink to a folder", tmp_path:
+        target = tmp_path / "elsewhere"
+        target.mkdir(mode=0o700)
+        os.symlink(target, tmp_path / "locks")
+        with pytest.raises(OSError):
+            lock.private_folder(tmp_path / "locks")
+
+describe "for_interface":
+    async it "keeps locks within a process apart from those across processes":
+        assert lock.for_interface("wlan0") is lock.for_interface("wlan0")
+        assert lock.for_interface("wlan0") is not lock.for_interface(
+            "wlan0", across_processes=False
+        )
+
+    async it "needs an interface":
+        with pytest.raises(ValueError):
+            lock.for_interface(None)
+
+    async it "is used for the interface the backend resolves", make_changer:
+        changer = make_changer()
+        with mock.patch.object(changer, "resolve_interface", mock.AsyncMock(return_value="wlan9")):
+            interface_lock = await changer.interface_lock()
+        assert (interface_lock.interface, interface_lock.across_processes) == ("wlan9", False)
@@ -0,0 +1,90 @@
+# coding: spec
+
+from network_changer import netlink
+
+import asyncio
+import socket
+import struct
+
+IFLA_IFNAME = 3
+IFLA_OPERSTATE = 16
+
+
+def message(msg_type, payload):
+    header = netlink.NLMSG_HEADER.pack(netlink.NETLINK_HEADER_SIZE + len(payload), msg_type, 0, 1, 0)
+    data = header + payload
+    return data + b"\0" * (netlink.align(len(data)) - len(data))
+
+
+def newlink(index, flags):
+    payload = netlink.IFINFOMSG.pack(socket.AF_UNSPEC, 1, index, flags, 0)
+    return payload + netlink.pack_attribute(IFLA_IFNAME, b"wlan0\0")
+
+
+describe "parsing":
+    it "parses an RTM_NEWLINK message":
+        # wlan0 at index 3 after it's brought up but before it associates
+        data = bytes.fromhex(
+            "34000000100000000000000000000000"
+            "00000100030000000310000000000000"
+            "0a000300776c616e300000000500100002000000"
+        )
+        ((msg_type, _, seq, payload),) = list(netlink.parse_messages(data))
+        assert (msg_type, seq) == (netlink.RTM_NEWLINK, 0)
+
+        index, flags = netlink.parse_link(payload)
+        assert index == 3
+        assert flags & netlink.IFF_UP
+        assert not flags & netlink.IFF_LOWER_UP
+
+        # The operstate is still IF_OPER_DOWN, which is why set_link looks at IFF_UP
+        attrs = netlink.parse_attributes(payload, netlink.IFINFOMSG.size)
+        assert attrs == {IFLA_IFNAME: b"wlan0\0", IFLA_OPERSTATE: b"\x02"}
+
+    it "parses several messages in one read":
+        data = message(netlink.RTM_NEWLINK, newlink(3, 0x1)) + message(
+            netlink.RTM_DELLINK, newlink(4, 0)
+        )
+        parsed = [
+            (msg_type, netlink.parse_link(payload))
+            for msg_type, _, _, payload in netlink.parse_messages(data)
+        ]
+        assert parsed == [(netlink.RTM_NEWLINK, (3, 0x1)), (netlink.RTM_DELLINK, (4, 0))]
+
+    it "parses an RTM_NEWADDR message":
+        payload = netlink.IFADDRMSG.pack(socket.AF_INET, 24, 0, 0, 3)
+        payload += netlink.pack_attribute(netlink.IFA_LOCAL, socket.inet_aton("10.0.0.5"))
+        assert netlink.parse_address(payload) == (3, socket.AF_INET, 24, "10.0.0.5")
+
+    it "stops at a truncated attribute":
+        payload = netlink.pack_attribute(IFLA_IFNAME, b"wlan0\0") + struct.pack("=HH", 2, 16)
+        assert netlink.parse_attributes(payload) == {IFLA_IFNAME: b"wlan0\0"}
+
+describe "listening":
+    async it "stops reading once a callback closes the socket", final_future:
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        ours.setblocking(False)
+
+        nl = netlink.RTNetlink()
+        nl.sock = ours
+
+        got = []
+
+        def changed(msg_type, payload):
+            got.append(netlink.parse_link(payload))
+            nl.close()
+
+        try:
+            nl.listen(changed)
+            theirs.send(
+                message(netlink.RTM_NEWLINK, newlink(3, 0x1))
+                + message(netlink.RTM_NEWLINK, newlink(3, 0x0))
+            )
+            theirs.send(message(netlink.RTM_NEWLINK, newlink(3, 0x1)))
+
+            await asyncio.sleep(0.05)
+            assert got == [(3, 0x1)]
+            assert nl.sock is None
+        finally:
+            nl.close()
+            theirs.close()
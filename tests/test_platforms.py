@@ -0,0 +1,38 @@
+# coding: spec
+
+from network_changer.errors import UnsupportedPlatform
+from network_changer import platforms
+
+import subprocess
+import pytest
+import sys
+import os
+
+describe "platforms":
+    it "aren't imported until they are used":
+        code = "\n".join(
+            [
+                "import network_changer.executor, sys",
+                "print(' '.join(m for m in sys.modules if m.startswith('network_changer.platforms.')))",
+            ]
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        out = subprocess.check_output([sys.executable, "-c", code], cwd=root, text=True)
+        assert out.strip() == ""
+
+    it "imports a platform when it's asked for":
+        kls = platforms.Simulated
+        assert "network_changer.platforms.simulated" in sys.modules
+        assert kls.__module__ == "network_changer.platforms.simulated"
+        assert vars(platforms)["Simulated"] is kls
+        assert platforms.load("Simulated") is kls
+
+    async it "explains why a platform can't be used", final_future:
+        kls = platforms.Windows
+        assert issubclass(kls, platforms.Unsupported)
+        with pytest.raises(UnsupportedPlatform, match="No implementation for Windows"):
+            await kls(final_future, None).scan()
+
+    it "doesn't make up platforms":
+        with pytest.raises(AttributeError):
+            platforms.Nope
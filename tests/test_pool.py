@@ -0,0 +1,65 @@
+# coding: spec
+
+from network_changer.platforms.simulated import Simulated
+from network_changer.pool import ChangerPool
+
+import asyncio
+import pytest
+
+
+@pytest.fixture()
+def pool(world, final_future):
+    world.interfaces = ["sim0", "sim1", "sim2"]
+    return ChangerPool(final_future, kls=Simulated.using(world))
+
+
+describe "ChangerPool":
+    async it "finds a changer for every interface", pool:
+        assert sorted(await pool.discover()) == ["sim0", "sim1", "sim2"]
+
+    async it "keeps a failure on one interface from the others", pool:
+        async def action(name, ch):
+            if name == "sim1":
+                raise ValueError("nope")
+            return ch.name
+
+        results, errors = await pool.run(action)
+        assert results == {"sim0": "sim0", "sim2": "sim2"}
+        assert list(errors) == ["sim1"]
+        assert isinstance(errors["sim1"], ValueError)
+
+    async it "gives up on an interface that takes too long", pool:
+        async def action(name, ch):
+            if name == "sim2":
+                await asyncio.sleep(5)
+            return True
+
+        start = asyncio.get_event_loop().time()
+        results, errors = await pool.run(action, timeout=0.1)
+        assert asyncio.get_event_loop().time() - start < 1
+        assert results == {"sim0": True, "sim1": True}
+        assert isinstance(errors["sim2"], asyncio.TimeoutError)
+
+    async it "only works on limit interfaces at once", pool:
+        pool.limit = 2
+        running = []
+        most = []
+
+        async def action(name, ch):
+            running.append(name)
+            most.append(len(running))
+            await asyncio.sleep(0.02)
+            running.remove(name)
+            return True
+
+        results, errors = await pool.run(action)
+        assert len(results) == 3 and not errors
+        assert max(most) == 2
+
+    async it "connects each interface to it's own network", world, pool:
+        results, errors = await pool.connect({"sim0": "home", "sim2": "work"}, timeout=5)
+        assert not errors
+        assert {name: ap.ssid for name, ap in world.connections.items()} == {
+            "sim0": "home",
+            "sim2": "work",
+        }
@@ -0,0 +1,84 @@
+# coding: spec
+
+from network_changer.retrier import ConnectionRetrier, ExponentialBackoff, Phased
+import asyncio
+import pytest
+import time
+
+describe "Phased":
+    it "isn't budget aware by default":
+        assert not Phased([(1, 10)]).budget_aware
+        assert Phased([(1, 10)]).should_start(0.1, [5, 5])
+        assert not Phased([(1, 10)], budget_aware=True).should_start(0.1, [5, 5])
+
+    it "waits for the step that covers the elapsed time":
+        policy = Phased([(1, 10), (5, 30)])
+        assert policy.wait_after(1, 2, 0.25) == 0.75
+        assert policy.wait_after(1, 20, 1) == 4
+        assert policy.wait_after(1, 2, 3) == 0
+
+describe "ConnectionRetrier":
+    async it "starts the next attempt straight away when woken", final_future:
+        retrier = ConnectionRetrier(policy=ExponentialBackoff(10, jitter=0))
+        attempts = []
+
+        async def determine(remaining, nxt):
+            attempts.append(time.time())
+            if len(attempts) == 1:
+                asyncio.get_event_loop().call_later(0.05, retrier.wake)
+                raise ValueError("not yet")
+            return "done"
+
+        start = time.time()
+        assert await retrier.retry(determine, final_future, 5) == "done"
+        assert len(attempts) == 2
+        assert time.time() - start < 1
+
+    async it "remembers a wake that arrives before it waits", final_future:
+        retrier = ConnectionRetrier(policy=ExponentialBackoff(10, jitter=0))
+        attempts = []
+
+        async def determine(remaining, nxt):
+            attempts.append(1)
+            if len(attempts) == 1:
+                retrier.wake()
+                raise ValueError("not yet")
+            return "done"
+
+        start = time.time()
+        assert await retrier.retry(determine, final_future, 5) == "done"
+        assert time.time() - start < 1
+
+    async it "reports how long each attempt took", final_future:
+        retrier = ConnectionRetrier(timeouts=[(0.01, 0)])
+        progress = []
+
+        async def determine(remaining, nxt):
+            await asyncio.sleep(0.02)
+            if len(retrier.durations) < 2:
+                raise ValueError("not yet")
+            return "done"
+
+        assert await retrier.retry(determine, final_future, 5, progress=progress) == "done"
+
+        assert len(retrier.durations) == 3
+        assert all(0.02 <= took < 0.2 for took in retrier.durations)
+
+        finished = [info for _, info in progress if info["msg"] == "Attempt finished"]
+        assert [info["attempt"] for info in finished] == [1, 2, 3]
+        assert [info["took"] for info in finished] == [round(t, 3) for t in retrier.durations]
+
+        failures = [info for _, info in progress if info["msg"] == "Failure"]
+        assert len(failures) == 2
+        assert all(isinstance(info["error"], ValueError) for info in failures)
+
+    async it "raises the last error when it runs out of time", final_future:
+        retrier = ConnectionRetrier(timeouts=[(0.05, 0)])
+
+        async def determine(remaining, nxt):
+            raise ValueError("never")
+
+        start = time.time()
+        with pytest.raises(ValueError, match="never"):
+            await retrier.retry(determine, final_future, 0.2)
+        assert 0.15 <= time.time() - start < 0.5
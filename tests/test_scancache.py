@@ -0,0 +1,82 @@
+# coding: spec
+
+from network_changer.scancache import SharedScanCache
+from network_changer.info import ScanInfo
+from network_changer import scancache
+
+from unittest import mock
+import pytest
+import time
+import os
+
+
+@pytest.fixture()
+def shared(tmp_path, monkeypatch):
+    monkeypatch.setenv("NETWORK_CHANGER_SHARE_SCANS", "1")
+    monkeypatch.setattr(scancache, "segment_path", lambda interface: tmp_path / f"scan-{interface}")
+    return tmp_path
+
+
+def networks(*bssids):
+    return ScanInfo.create(
+        [{"bssid": bssid, "ssid": "home", "freq": 2412, "last_seen": time.time()} for bssid in bssids]
+    )
+
+
+describe "SharedScanCache":
+    it "shares the latest scan", tmp_path:
+        path = tmp_path / "segment"
+        SharedScanCache("wlan0", path=path).publish(networks("aa:bb:cc:dd:ee:01"))
+
+        found = SharedScanCache("wlan0", path=path).latest(within=5)
+        assert [network.bssid for network in found] == ["aa:bb:cc:dd:ee:01"]
+
+    it "only shares scans that are recent and cover the channels", tmp_path:
+        cache = SharedScanCache("wlan0", path=tmp_path / "segment")
+        assert cache.latest(within=5) is None
+
+        cache.publish(networks("aa:bb:cc:dd:ee:01"), channels=[1, 6])
+        assert cache.latest(within=5, channels=[1]) is not None
+        assert cache.latest(within=5, channels=[11]) is None
+        assert cache.latest(within=5) is None
+
+        with mock.patch.object(time, "time", return_value=time.time() + 10):
+            assert cache.latest(within=5, channels=[1]) is None
+
+    it "doesn't follow symlinks", tmp_path:
+        target = tmp_path / "elsewhere"
+        target.write_bytes(b"")
+        os.symlink(target, tmp_path / "segment")
+
+        cache = SharedScanCache("wlan0", path=tmp_path / "segment")
+        cache.publish(networks("aa:bb:cc:dd:ee:01"))
+        assert cache.latest(within=5) is None
+        assert target.read_bytes() == b""
+
+    it "ignores a segment other users can change", tmp_path:
+        path = tmp_path / "segment"
+        SharedScanCache("wlan0", path=path).publish(networks("aa:bb:cc:dd:ee:01"))
+        path.chmod(0o666)
+        assert SharedScanCache("wlan0", path=path).latest(within=5) is None
+
+describe "sharing scans between changers":
+    async it "uses a scan another changer just did", shared, make_changer:
+        first = make_changer()
+        second = make_changer()
+
+        await first.scan()
+
+        progress = []
+        found = await second.scan(progress=progress)
+        assert len(list(found)) == 3
+        assert [info["msg"] for _, info in progress] == ["Using a scan from another process"]
+
+    async it "uses the interface the backend resolves", shared, make_changer:
+        changer = make_changer()
+        with mock.patch.object(changer, "resolve_interface", mock.AsyncMock(return_value="wlan9")):
+            cache = await changer.shared_scans()
+        assert cache.path == shared / "scan-wlan9"
+
+    async it "doesn't share scans unless asked to", monkeypatch, make_changer:
+        monkeypatch.delenv("NETWORK_CHANGER_SHARE_SCANS", raising=False)
+        assert await make_changer().shared_scans() is None
@@ -0,0 +1,144 @@
+# coding: spec
+
+from network_changer.scheduler import BackgroundScanner, ScanScheduler
+from network_changer.info import ScanInfo
+from network_changer import async_helpers as hp
+
+import asyncio
+import pytest
+
+NETWORKS = [
+    {"bssid": "aa:bb:cc:dd:ee:01", "ssid": "one", "freq": 2412},
+    {"bssid": "aa:bb:cc:dd:ee:06", "ssid": "six", "freq": 2437},
+    {"bssid": "aa:bb:cc:dd:ee:0b", "ssid": "eleven", "freq": 2462},
+    {"bssid": "aa:bb:cc:dd:ee:ff", "ssid": "unknown", "freq": None},
+]
+
+
+@pytest.fixture()
+def runs():
+    return []
+
+
+@pytest.fixture()
+def scheduler(runs):
+    async def run(channels, progress):
+        runs.append((asyncio.get_event_loop().time(), channels))
+        await asyncio.sleep(0.05)
+        return ScanInfo.create(NETWORKS)
+
+    return ScanScheduler(run, min_interval=0.1, name="test")
+
+
+def ssids(found):
+    return sorted(network.ssid for network in found)
+
+
+describe "ScanScheduler":
+    async it "gives concurrent requests one scan", scheduler, runs:
+        found = await asyncio.gather(*[scheduler.scan() for _ in range(3)])
+        assert [len(list(f)) for f in found] == [4, 4, 4]
+        assert [channels for _, channels in runs] == [None]
+
+    async it "answers from a running scan that covers the request", scheduler, runs:
+        everything = hp.async_as_background(scheduler.scan())
+        await asyncio.sleep(0.01)
+        some = await scheduler.scan(channels=[6])
+        assert ssids(some) == ["six", "unknown"]
+        assert len(list(await everything)) == 4
+        assert [channels for _, channels in runs] == [None]
+
+    async it "widens the queued scan but only answers what was asked", scheduler, runs:
+        running = hp.async_as_background(scheduler.scan(channels=[6]))
+        await asyncio.sleep(0.01)
+
+        one, eleven = await asyncio.gather(
+            scheduler.scan(channels=[1]), scheduler.scan(channels=[11])
+        )
+        await running
+
+        assert [channels for _, channels in runs] == [[6], [1, 11]]
+        assert ssids(one) == ["one", "unknown"]
+        assert ssids(eleven) == ["eleven", "unknown"]
+
+    async it "leaves min_interval between scans", scheduler, runs:
+        await scheduler.scan()
+        await scheduler.scan()
+        await scheduler.scan(channels=[1])
+
+        (first, _), (second, _), (third, _) = runs
+        assert second - first >= 0.05 + 0.1 - 0.01
+        assert third - second >= 0.05 + 0.1 - 0.01
+
+    async it "gives every waiting request the error", runs:
+        async def run(channels, progress):
+            runs.append(channels)
+            await asyncio.sleep(0.02)
+            raise ValueError("nope")
+
+        scheduler = ScanScheduler(run, min_interval=0)
+        found = await asyncio.gather(
+            scheduler.scan(), scheduler.scan(channels=[1]), return_exceptions=True
+        )
+        assert [type(error) for error in found] == [ValueError, ValueError]
+        assert runs == [None]
+
+
+class FakeChanger:
+    def __init__(self, final_future):
+        self.name = "fake"
+        self.busy = 0
+        self.scans = []
+        self.scanned_at = None
+        self.final_future = final_future
+
+    async def scan(self, channels=None, progress=None):
+        self.scans.append(channels)
+        self.scanned_at = asyncio.get_event_loop().time()
+        return ScanInfo.create([])
+
+
+describe "BackgroundScanner":
+    async it "puts off scans for longer each time while the changer is busy", final_future:
+        changer = FakeChanger(final_future)
+        changer.busy = 1
+        scanner = BackgroundScanner(changer, every=0.04, maximum=0.16, channels=[1])
+        waits = []
+
+        async def sleep(amount):
+            waits.append(round(amount, 3))
+            if len(waits) == 5:
+                changer.busy = 0
+            if len(waits) == 7:
+                scanner.final_future.cancel()
+            await asyncio.sleep(0)
+
+        scanner.sleep = sleep
+        await scanner.start().task
+
+        assert waits[:6] == [0.04, 0.08, 0.16, 0.16, 0.16, 0.04]
+        assert changer.scans == [[1]]
+
+    async it "doesn't scan when something else scanned recently", final_future:
+        changer = FakeChanger(final_future)
+        changer.scanned_at = asyncio.get_event_loop().time()
+        scanner = BackgroundScanner(changer, every=0.1).start()
+
+        await asyncio.sleep(0.05)
+        assert changer.scans == []
+        await asyncio.sleep(0.1)
+        assert changer.scans == [None]
+        await scanner.stop()
+
+    async it "stops", final_future:
+        changer = FakeChanger(final_future)
+        scanner = BackgroundScanner(changer, every=0.02).start()
+        await asyncio.sleep(0.05)
+        await scanner.stop()
+
+        assert scanner.task.done()
+        count = len(changer.scans)
+        assert count >= 1
+        await asyncio.sleep(0.05)
+        assert len(changer.scans) == count
+        assert not final_future.done()
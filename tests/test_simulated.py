@@ -0,0 +1,132 @@
+# coding: spec
+
+from network_changer.platforms.simulated import SimulatedProblem, sample
+from network_changer.errors import FailedToConnect
+from network_changer.retrier import Once
+from network_changer.platforms import base
+
+from unittest import mock
+import ipaddress
+import asyncio
+import random
+import pytest
+import time
+
+describe "sample":
+    it "understands numbers, ranges and callables":
+        rand = random.Random(1)
+        assert sample(None, rand) == 0
+        assert sample(2, rand) == 2
+        assert 1 <= sample((1, 2), rand) <= 2
+        assert sample(lambda r: 7, rand) == 7
+
+describe "Simulated":
+    async it "scans the access points in the world", make_changer:
+        found = await make_changer().scan()
+        assert sorted(network.bssid for network in found) == [
+            "aa:bb:cc:dd:ee:01",
+            "aa:bb:cc:dd:ee:02",
+            "aa:bb:cc:dd:ee:03",
+        ]
+
+    async it "only scans the channels it's asked for", make_changer:
+        found = await make_changer().scan(channels=[1])
+        assert [network.bssid for network in found] == ["aa:bb:cc:dd:ee:01"]
+
+    async it "connects to the strongest access point for the ssid", world, make_changer:
+        changer = make_changer()
+        await changer.connect("home", timeout=5)
+        assert world.connections["sim0"].bssid == "aa:bb:cc:dd:ee:02"
+
+        info = await changer.info()
+        assert (info.ssid, info.bssid) == ("home", "aa:bb:cc:dd:ee:02")
+
+    async it "connects to a particular access point", world, make_changer:
+        await make_changer().connect("home", timeout=5, bssid="aa:bb:cc:dd:ee:01")
+        assert world.connections["sim0"].bssid == "aa:bb:cc:dd:ee:01"
+
+    async it "disconnects", world, make_changer:
+        changer = make_changer()
+        await changer.connect("work", timeout=5)
+        await changer.disconnect()
+        assert "sim0" not in world.connections
+        assert (await changer.info()).ssid == ""
+
+    async it "fails to connect to networks that aren't there", make_changer:
+        with pytest.raises(FailedToConnect):
+            await make_changer().connect("nope", timeout=5, retrier=Once())
+
+    async it "raises injected failures", world, make_changer:
+        changer = make_changer()
+
+        # Info failures are reported to progress and look like no network
+        progress = []
+        world.inject("info", SimulatedProblem("nope"))
+        assert (await changer.info(progress=progress)).ssid == ""
+        assert isinstance(progress[0][1]["error"], SimulatedProblem)
+
+        world.inject("connect", FailedToConnect("home", "sim0", None, error="injected"))
+        with pytest.raises(FailedToConnect):
+            await changer.connect("home", timeout=5, retrier=Once())
+
+    async it "drops connections to access points that go away", world, make_changer:
+        changer = make_changer()
+        await changer.connect("work", timeout=5)
+
+        ap = [ap for ap in world.aps if ap.ssid == "work"][0]
+        ap.signal = world.min_signal - 10
+
+        changer.forget_info()
+        assert (await changer.info()).ssid == ""
+        assert "sim0" not in world.connections
+
+describe "check_connected":
+    async it "stops waiting for an address as soon as netlink sees one", make_changer:
+        changer = make_changer()
+        await changer.connect("work", timeout=5, check_after=False)
+
+        addresses = {base.netifaces.AF_INET: [{"addr": "192.168.0.2"}]}
+        listeners = []
+
+        def address_listener(interface, on_address):
+            listeners.append(on_address)
+
+        def arrive():
+            addresses[base.netifaces.AF_INET].append({"addr": "10.1.0.2"})
+            listeners[0]("10.1.0.2")
+
+        asyncio.get_event_loop().call_later(0.1, arrive)
+
+        start = time.time()
+        interfaces = mock.patch.object(base.netifaces, "interfaces", return_value=["sim0"])
+        ifaddresses = mock.patch.object(base.netifaces, "ifaddresses", return_value=addresses)
+        listener = mock.patch.object(base.netlink, "address_listener", address_listener)
+
+        with interfaces, ifaddresses, listener:
+            found = await changer.check_connected(
+                "work", expected_subnet=ipaddress.ip_network("10.1.0.0/16")
+            )
+
+        assert found is True
+        assert time.time() - start < 1
+
+    async it "connects when the address is in the wrong subnet", make_changer:
+        changer = make_changer(address_wait=0.2)
+        await changer.connect("work", timeout=5)
+
+        addresses = {base.netifaces.AF_INET: [{"addr": "192.168.0.2"}]}
+        interfaces = mock.patch.object(base.netifaces, "interfaces", return_value=["sim0"])
+        ifaddresses = mock.patch.object(base.netifaces, "ifaddresses", return_value=addresses)
+        do_connect = mock.patch.object(changer, "do_connect", wraps=changer.do_connect)
+
+        progress = []
+        with interfaces, ifaddresses, do_connect as connecting:
+            assert not await changer.check_connected(
+                "work", progress=progress, expected_subnet=ipaddress.ip_network("10.1.0.0/16")
+            )
+            assert isinstance(progress[-1][1]["error"], base.NoIPInRange)
+
+            await changer.connect(
+                "work", timeout=5, expected_subnet=ipaddress.ip_network("10.1.0.0/16")
+            )
+            assert len(connecting.mock_calls) == 1
@@ -0,0 +1,71 @@
+# coding: spec
+
+from network_changer.retrier import ExponentialBackoff
+from network_changer.errors import FailedToConnect
+from network_changer.supervisor import Supervisor
+from network_changer import netlink
+
+from unittest import mock
+import asyncio
+import pytest
+
+
+async def wait_until(check, timeout=5):
+    start = asyncio.get_event_loop().time()
+    while not check():
+        assert asyncio.get_event_loop().time() - start < timeout
+        await asyncio.sleep(0.01)
+
+
+describe "Supervisor":
+    async it "reconnects when the connection is lost", world, make_changer:
+        changer = make_changer()
+        progress = []
+        supervisor = changer.supervise("work", poll=0.05, progress=progress)
+        try:
+            await wait_until(lambda: "sim0" in world.connections)
+            await wait_until(lambda: supervisor.established)
+
+            world.drop("sim0")
+            await wait_until(lambda: supervisor.outages)
+
+            assert world.connections["sim0"].ssid == "work"
+            assert [info["msg"] for _, info in progress if "network" in info["msg"]] == [
+                "Lost connection to the network",
+                "Reconnected to the network",
+            ]
+        finally:
+            await supervisor.stop()
+
+    async it "fails a reconnect that doesn't leave us connected", make_changer:
+        changer = make_changer()
+        supervisor = Supervisor(changer, "work")
+
+        with mock.patch.object(changer, "check_connected", mock.AsyncMock(return_value=False)):
+            with pytest.raises(FailedToConnect, match="Not connected after reconnecting"):
+                await supervisor.reconnect()
+
+    async it "backs off when reconnects don't work", make_changer:
+        changer = make_changer()
+        retrier = ExponentialBackoff(0.1, jitter=0)
+        supervisor = Supervisor(changer, "nope", retrier=retrier)
+        attempts = []
+
+        async def reconnect(*args):
+            attempts.append(asyncio.get_event_loop().time())
+            raise FailedToConnect("nope", "sim0", None, error="nope")
+
+        with mock.patch.object(supervisor, "reconnect", reconnect):
+            supervisor.start()
+            await asyncio.sleep(0.8)
+            await supervisor.stop()
+
+        gaps = [after - before for before, after in zip(attempts, attempts[1:])]
+        assert 3 <= len(attempts) <= 5
+        assert all(after > before * 1.5 for before, after in zip(gaps, gaps[1:]))
+
+describe "netlink listeners":
+    it "don't mind an interface that isn't known yet":
+        assert netlink.link_listener(None, lambda up: None) is None
+        assert netlink.address_listener(None, lambda address: None) is None
+        assert netlink.mlme_listener(None, lambda cmd: None) is None
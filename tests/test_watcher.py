@@ -0,0 +1,146 @@
+# coding: spec
+
+from network_changer.watcher import StateWatcher
+
+from unittest import mock
+import asyncio
+import pytest
+
+
+class FakeListener:
+    """Stands in for what listen_for_changes returns so tests say when things change"""
+
+    def __init__(self, changed, stopped):
+        self.closed = False
+        self.changed = changed
+        self.stopped = stopped
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture()
+def state():
+    return {"network": None, "addresses": []}
+
+
+@pytest.fixture()
+def changer(make_changer, state):
+    changer = make_changer()
+    changer.listeners = []
+
+    def listen_for_changes(changed, stopped):
+        changer.listeners.append(FakeListener(changed, stopped))
+        return changer.listeners[-1]
+
+    async def do_info(progress=None, fields=None):
+        ssid, bssid = state["network"] or ("", "")
+        return {"ssid": ssid, "bssid": bssid}
+
+    changer.listen_for_changes = listen_for_changes
+    changer.do_info = do_info
+    changer.addresses = lambda: list(state["addresses"])
+    return changer
+
+
+async def started(watcher):
+    while watcher.addresses is None:
+        await asyncio.sleep(0.001)
+
+
+async def next_events(events, count):
+    return [
+        repr(await asyncio.wait_for(events.__anext__(), timeout=1)) for _ in range(count)
+    ]
+
+
+describe "StateWatcher":
+    async it "publishes what changed when the listener says so", changer, state:
+        async with changer.watch() as events:
+            await started(changer._state_watcher)
+            (listener,) = changer.listeners
+
+            state["network"] = ("home", "aa:bb:cc:dd:ee:01")
+            state["addresses"] = ["10.0.0.5"]
+            with mock.patch.object(changer, "forget_info", wraps=changer.forget_info) as forget:
+                listener.changed()
+                forget.assert_called_once_with()
+
+            assert await next_events(events, 2) == [
+                "<Associated sim0 -> home (aa:bb:cc:dd:ee:01)>",
+                "<IPAcquired sim0 10.0.0.5>",
+            ]
+
+            # A roam to another access point on the same network
+            state["network"] = ("home", "aa:bb:cc:dd:ee:02")
+            listener.changed()
+            assert await next_events(events, 2) == [
+                "<Disassociated sim0 -x home (aa:bb:cc:dd:ee:01)>",
+                "<Associated sim0 -> home (aa:bb:cc:dd:ee:02)>",
+            ]
+
+            state["network"] = None
+            state["addresses"] = []
+            listener.changed()
+            assert await next_events(events, 1) == [
+                "<Disassociated sim0 -x home (aa:bb:cc:dd:ee:02)>"
+            ]
+
+    async it "waits for the listener rather than polling", changer, state:
+        changer._state_watcher = StateWatcher(changer, poll=0.01)
+        async with changer.watch() as events:
+            await started(changer._state_watcher)
+
+            state["network"] = ("home", "aa:bb:cc:dd:ee:01")
+            await asyncio.sleep(0.05)
+            assert not events.events
+
+            changer.listeners[0].changed()
+            assert await next_events(events, 1) == ["<Associated sim0 -> home (aa:bb:cc:dd:ee:01)>"]
+
+    async it "polls once the listener stops", changer, state:
+        changer._state_watcher = StateWatcher(changer, poll=0.01)
+        async with changer.watch() as events:
+            await started(changer._state_watcher)
+            (listener,) = changer.listeners
+
+            listener.stopped()
+            assert listener.closed
+            assert not changer.listening()
+
+            with mock.patch.object(changer, "forget_info", wraps=changer.forget_info) as forget:
+                state["network"] = ("work", "aa:bb:cc:dd:ee:03")
+                assert await next_events(events, 1) == [
+                    "<Associated sim0 -> work (aa:bb:cc:dd:ee:03)>"
+                ]
+                assert forget.called
+
+    async it "publishes scans", changer:
+        async with changer.watch() as events:
+            await changer.scan()
+            (event,) = [await asyncio.wait_for(events.__anext__(), timeout=1)]
+            assert event.kind == "scan_done"
+            assert sorted(network.bssid for network in event.networks) == [
+                "aa:bb:cc:dd:ee:01",
+                "aa:bb:cc:dd:ee:02",
+                "aa:bb:cc:dd:ee:03",
+            ]
+
+    async it "shares one watcher and stops when nothing is subscribed", changer, state:
+        first = changer.watch()
+        second = changer.watch()
+        watcher = changer._state_watcher
+        assert watcher.subscriptions == [first, second]
+        await started(watcher)
+
+        first.close()
+        assert watcher.task is not None
+
+        state["network"] = ("home", "aa:bb:cc:dd:ee:01")
+        changer.listeners[0].changed()
+        assert await next_events(second, 1) == ["<Associated sim0 -> home (aa:bb:cc:dd:ee:01)>"]
+        assert [event async for event in first] == []
+
+        second.close()
+        assert watcher.task is None
+        assert watcher.final_future.done()
@@ -0,0 +1,87 @@
+# coding: spec
+
+from network_changer.platforms import iwlib, wext
+
+import pytest
+
+# An access point, frequency and essid event as SIOCGIWSCAN returns them
+AP = bytes.fromhex("1400158b" "0100aabbccddee01" "0000000000000000")
+FREQ = bytes.fromhex("0c00058b" "806b600e01000000")
+ESSID = bytes.fromhex("0c001b8b" "04000000" "686f6d65")
+
+describe "events":
+    it "yields each event in a scan":
+        assert list(wext.events(AP + FREQ + ESSID)) == [
+            (wext.SIOCGIWAP, bytes.fromhex("0100aabbccddee01") + b"\0" * 8),
+            (wext.SIOCGIWFREQ, bytes.fromhex("806b600e01000000")),
+            (wext.SIOCGIWESSID, b"home"),
+        ]
+
+    @pytest.mark.parametrize(
+        "data, expected",
+        [
+            (b"", []),
+            (AP[:3], []),
+            (AP[:10], []),
+            (AP + FREQ[:6], [wext.SIOCGIWAP]),
+            (bytes.fromhex("0400058b") + AP, []),
+            (bytes.fromhex("06001b8b" "0400") + AP, [wext.SIOCGIWAP]),
+        ],
+        ids=["empty", "short header", "short event", "short last event", "empty event", "short point"],
+    )
+    it "stops at or skips events that are cut short", data, expected:
+        assert [cmd for cmd, _ in wext.events(data)] == expected
+
+    it "only uses as much of a point event as it says it has":
+        essid = bytes.fromhex("10001b8b" "02000000" "686f6d65" "00000000")
+        assert list(wext.events(essid)) == [(wext.SIOCGIWESSID, b"ho")]
+
+describe "parse_bssid":
+
+    @pytest.mark.parametrize(
+        "payload, expected",
+        [
+            (bytes.fromhex("0100aabbccddee01") + b"\0" * 8, "aa:bb:cc:dd:ee:01"),
+            (bytes.fromhex("0100000000000000") + b"\0" * 8, ""),
+            (bytes.fromhex("0100aabbcc"), ""),
+            (b"", ""),
+        ],
+        ids=["bssid", "not associated", "truncated", "empty"],
+    )
+    it "returns the bssid from the sockaddr", payload, expected:
+        assert wext.parse_bssid(payload) == expected
+
+describe "parse_freq":
+
+    @pytest.mark.parametrize(
+        "payload, expected",
+        [
+            (bytes.fromhex("806b600e01000000"), 2412000000),
+            (bytes.fromhex("6c09000006000000"), 2412000000),
+            (bytes.fromhex("0600000000000000"), 6),
+            (bytes.fromhex("806b600e"), None),
+            (b"", None),
+        ],
+        ids=["from iw_float2freq", "in MHz", "channel", "truncated", "empty"],
+    )
+    it "returns the frequency or channel", payload, expected:
+        assert wext.parse_freq(payload) == expected
+
+describe "float_to_freq":
+
+    # What iw_float2freq in libiw gives for each value
+    @pytest.mark.parametrize(
+        "value, m, e",
+        [
+            (2.412e9, 241200000, 1),
+            (5.18e9, 518000000, 1),
+            (2412, 2412, 0),
+            (6, 6, 0),
+            (0, 0, 0),
+        ],
+    )
+    it "matches iw_float2freq", value, m, e:
+        freq = iwlib.struct_iw_freq()
+        wext.float_to_freq(value, freq)
+        assert (freq.m, freq.e) == (m, e)
+        assert wext.freq_to_float(freq.m, freq.e) == value
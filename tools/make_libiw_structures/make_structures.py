@@ -1,20 +1,57 @@
 #!/usr/bin/env python
+"""
+Generate network_changer/platforms/iwlib.py from linux/wireless.h
+
+    ./make_structures.py
+    ./make_structures.py --target arm-linux-gnueabihf
+
+The structures are laid out for the machine this is run on unless a clang
+``--target`` triple is given.
+"""
 
 from pathlib import Path
+import subprocess
+import argparse
 import sys
-import os
 
 here = Path(__file__).absolute().parent
 destination = here / ".." / ".." / "network_changer" / "platforms" / "iwlib.py"
 
-__import__("venvstarter").manager(
-    [
-        "clang2py",
-        "--clang-args=-I/usr/lib/clang/7/include/",
-        "-l",
-        "/usr/lib/aarch64-linux-gnu/libiw.so",
-        "-o",
-        destination,
-        here / "file.c",
+
+def clang_includes():
+    """Return the newest clang include directory we can find"""
+    found = [
+        *Path("/usr/lib").glob("clang/*/include"),
+        *Path("/usr/lib").glob("llvm-*/lib/clang/*/include"),
     ]
-).add_pypi_deps("ctypeslib2==2.3.2").run()
+    if not found:
+        sys.exit("Couldn't find the clang include directory, is clang installed?")
+
+    def version(path):
+        return [int(part) if part.isdigit() else 0 for part in path.parent.name.split(".")]
+
+    return max(found, key=version)
+
+
+def host_target():
+    try:
+        return subprocess.check_output(["gcc", "-dumpmachine"]).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", default=host_target())
+    args = parser.parse_args(argv)
+
+    cmd = ["clang2py", f"--clang-args=-I{clang_includes()}/"]
+    if args.target:
+        cmd.extend(["--target", args.target])
+    cmd.extend(["-o", destination, here / "file.c"])
+
+    __import__("venvstarter").manager(cmd).add_pypi_deps("ctypeslib2==2.3.2").run()
+
+
+if __name__ == "__main__":
+    main()